@@ -1,6 +1,5 @@
 import uvicorn
 
-from api.main import app
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -4,7 +4,6 @@ load_dotenv()
 
 import cmd
 from components.agents.chat_agent import ChatAgent
-from components.services.chat_appllcation import ChatApplication
 from logger_config import setup_logging, getLogger
 
 
@@ -13,7 +12,6 @@ class MainChat(cmd.Cmd):
         super().__init__()
         self.logging = getLogger(__name__)
         self.prompt = ">  "
-        self.app = ChatApplication()
         self.agent = ChatAgent()
 
     def default(self, line:str):
@@ -21,7 +19,7 @@ class MainChat(cmd.Cmd):
             response = self.agent.chat(
                 line
             )
-        self.logging.info(response)
+            self.logging.info(response)
 
     def do_exit(self, line:str):
         return True
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+from dotenv import load_dotenv
+load_dotenv()
+
+import signal
+import sys
+
+from components.services.job_worker import JobWorker
+from logger_config import setup_logging
+
+# background jobs (watch, summarize, insights) queued by the API.  python MainWorker.py [kind ...]
+if __name__ == '__main__':
+    setup_logging()
+    worker = JobWorker(kinds=sys.argv[1:] or None)
+    # finish the jobs in progress on Ctrl-C or on a deploy
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    worker.run()
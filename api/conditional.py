@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+
+# Conditional GET.  ETags are built from workspace versions (WorkspaceRepository), so checking them costs a primary
+# key read and the large columns are only read when the client's copy is out of date.
+
+def etag(*parts) -> str:
+    return 'W/"' + '-'.join(str(part) for part in parts) + '"'
+
+
+def not_modified(request: Request, response: Response, tag: str, last_modified: datetime = None) -> Response | None:
+    """
+    sets ETag and Last-Modified on the response.  returns a 304 when If-None-Match (or, without it,
+    If-Modified-Since) says the client's copy is current, None when the resource has to be sent
+    """
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = "no-cache"      # cacheable, but revalidated on every use
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # weak comparison, If-None-Match takes precedence over If-Modified-Since
+        current = _opaque(tag)
+        if if_none_match.strip() == "*" or any(_opaque(candidate) == current for candidate in if_none_match.split(",")):
+            return _not_modified_response(response)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        # Last-Modified has second precision, a write within the same second is only caught by the ETag
+        if since.tzinfo is not None and last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since:
+            return _not_modified_response(response)
+    return None
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _not_modified_response(response: Response) -> Response:
+    headers = {name: value for name, value in response.headers.items() if name in ("etag", "last-modified", "cache-control")}
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,107 @@
+import time
+
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from components.services.video_fetcher import VideoFetcher
+from components.tool_result_cache import ToolResultCache
+from domain.services.admission import AdmissionController
+from domain.services.agent_cache import AgentCache
+from infrastructure.metrics import (HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT, HTTP_REQUEST_QUERIES,
+                                    HTTP_REQUEST_DB_SECONDS, RequestStats, request_stats, prompt_cache_stats)
+from infrastructure.orm_database import get_pool_stats
+
+
+class MetricsMiddleware:
+    """
+    Request latency per method, route template and status, and the SQL statements each request ran.  Requests that
+    match no route are labelled unmatched, so scanners probing random paths do not add label values
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500        # unless a response is started, the request failed
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            request_stats.reset(token)
+            # the router puts the matched route into the scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, status).observe(seconds)
+            HTTP_REQUEST_QUERIES.labels(route).observe(stats.queries)
+            HTTP_REQUEST_DB_SECONDS.labels(route).observe(stats.db_seconds)
+
+
+class AppCollector:
+    """
+    Numbers the application already keeps (admission, agent, tool result and prompt caches, connection pools, YouTube fetches), read when
+    /metrics is scraped instead of being updated on the hot path
+    """
+    def collect(self):
+        admission = AdmissionController.shared()
+        yield GaugeMetricFamily('agent_turns_in_flight', 'chat turns running', value=admission.in_flight)
+        yield GaugeMetricFamily('agent_turns_queued', 'chat turns waiting for admission', value=admission.queued)
+        yield CounterMetricFamily('agent_turns_admitted', 'chat turns started', value=admission.admitted)
+        yield CounterMetricFamily('agent_turns_rejected', 'chat turns answered with 429',
+                                  value=admission.rejected + admission.timed_out)
+        yield CounterMetricFamily('agent_turns_wait_seconds', 'time admitted turns waited to start',
+                                  value=admission.wait_seconds_total)
+
+        hits = CounterMetricFamily('cache_hits', 'cache lookups that found an entry', labels=['cache'])
+        misses = CounterMetricFamily('cache_misses', 'cache lookups that found nothing', labels=['cache'])
+        ratio = GaugeMetricFamily('cache_hit_ratio', 'hits / lookups since the process started', labels=['cache'])
+        entries = GaugeMetricFamily('cache_entries', 'entries held', labels=['cache'])
+        agent_cache = AgentCache.shared()
+        if agent_cache is not None:
+            cache_stats = agent_cache.stats()
+            hits.add_metric(['agent'], cache_stats['hits'])
+            misses.add_metric(['agent'], cache_stats['misses'])
+            ratio.add_metric(['agent'], cache_stats['hit_ratio'])
+            entries.add_metric(['agent'], cache_stats['entries'])
+        tool_results = ToolResultCache.totals()
+        hits.add_metric(['tool_result'], tool_results['hits'])
+        misses.add_metric(['tool_result'], tool_results['misses'])
+        ratio.add_metric(['tool_result'], tool_results['hit_ratio'])
+        entries.add_metric(['tool_result'], tool_results['entries'])
+        invalidations = CounterMetricFamily('cache_invalidations', 'entries dropped because what they cached changed', labels=['cache'])
+        invalidations.add_metric(['tool_result'], tool_results['invalidations'])
+        # Anthropic's prompt cache, by input tokens.  the token counts are in anthropic_tokens
+        for model, tokens in prompt_cache_stats()['models'].items():
+            if tokens['hit_ratio'] is not None:
+                ratio.add_metric([f'anthropic_prompt:{model}'], tokens['hit_ratio'])
+        yield from (hits, misses, ratio, entries, invalidations)
+
+        checked_out = GaugeMetricFamily('db_pool_checked_out', 'connections in use', labels=['engine'])
+        size = GaugeMetricFamily('db_pool_size', 'pool_size, connections kept open', labels=['engine'])
+        checkouts = CounterMetricFamily('db_pool_checkouts', 'connections handed out', labels=['engine'])
+        wait = CounterMetricFamily('db_pool_wait_seconds', 'time spent waiting for a connection', labels=['engine'])
+        for engine, pool_stats in get_pool_stats().items():
+            checked_out.add_metric([engine], pool_stats['checked_out'])
+            size.add_metric([engine], pool_stats['size'])
+            checkouts.add_metric([engine], pool_stats.get('checkouts', 0))
+            wait.add_metric([engine], pool_stats.get('wait_ms_total', 0.0) / 1000)
+        yield from (checked_out, size, checkouts, wait)
+
+        yield GaugeMetricFamily('youtube_fetches_in_flight', 'videos being fetched from YouTube',
+                                value=VideoFetcher.shared().flights.in_flight())
+
+
+REGISTRY.register(AppCollector())
@@ -1,11 +1,15 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from sqlalchemy.exc import OperationalError
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
+from api.compression import CompressionMiddleware
+from api.instrumentation import MetricsMiddleware
 from api.models import Base
 from infrastructure.orm_database import engine
-from api.routes import workspaces, health, videos, messages, users
+from api.routes import workspaces, health, videos, messages, users, search, jobs, metrics
+from api.routes.health_check import HealthProber
 from logger_config import setup_logging, getLogger
 
 setup_logging()
@@ -28,16 +32,19 @@ async def lifespan(app: FastAPI):
         logger.error("\nMake sure PostgreSQL is running")
         logger.error(e)
         raise SystemExit(1)  # Exit cleanly instead of showing stack trace
+    HealthProber.shared().start()
     yield
 
     # Shutdown: Clean up resources if needed
     # e.g., close database connections, etc.
+    HealthProber.shared().stop()
 
 app = FastAPI(
     title="YouTube Research Tool",
     description="AI-powered research tool for YouTube video content",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse       # response models are rendered by orjson
 )
 
 # CORS middleware configuration
@@ -48,6 +55,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+app.add_middleware(MetricsMiddleware)     # outermost, the latency includes compression
 
 # Exception handlers
 @app.exception_handler(Exception)
@@ -73,9 +82,14 @@ PATH_WORKSPACES = "/api/v1/workspaces"
 PATH_WORKSPACE = f"{PATH_WORKSPACES}/{{workspace_id}}"
 PATH_VIDEOS = f"{PATH_WORKSPACE}/videos"
 PATH_MESSAGES = f"{PATH_WORKSPACE}/messages"
+PATH_SEARCH = "/api/v1/search"
+PATH_JOBS = "/api/v1/jobs"
 
 app.include_router(users.router, prefix=PATH_USERS)
 app.include_router(workspaces.router, prefix=PATH_WORKSPACES)
 app.include_router(videos.router, prefix=PATH_VIDEOS)
 app.include_router(health.router, prefix=PATH_HEALTH)
 app.include_router(messages.router, prefix=PATH_MESSAGES)
+app.include_router(search.router, prefix=PATH_SEARCH)
+app.include_router(jobs.router, prefix=PATH_JOBS)
+app.include_router(metrics.router)
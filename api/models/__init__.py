@@ -4,5 +4,9 @@ from .message_model import MessageModel
 from .workspace_video import WorkspaceVideoModel
 from .user_model import UserModel
 from .workspace_model import WorkspaceModel
+from .video_lsh_bucket import VideoLshBucketModel
+from .agent_span_model import AgentSpanModel
+from .transcript_segment import TranscriptSegmentModel
+from .job_model import JobModel
 
-__all__ = ['Base', 'VideoModel', 'MessageModel', 'WorkspaceVideoModel', 'UserModel', 'WorkspaceModel']
\ No newline at end of file
+__all__ = ['Base', 'VideoModel', 'MessageModel', 'WorkspaceVideoModel', 'UserModel', 'WorkspaceModel', 'VideoLshBucketModel', 'AgentSpanModel', 'TranscriptSegmentModel', 'JobModel']
\ No newline at end of file
@@ -0,0 +1,67 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import UUID
+
+from .base import Base
+
+class AgentSpanModel(Base):
+    """
+    One LLM round trip or tool execution of an agent turn.  A turn is identified by the user message that started it.
+
+    CREATE TABLE public.agent_spans (
+        span_id serial4 NOT NULL,
+        workspace_id uuid NOT NULL,
+        message_id int4 NULL,
+        seq int4 NOT NULL,
+        "type" varchar(20) NOT NULL,
+        "name" varchar(255) NOT NULL,
+        started_at timestamp NOT NULL,
+        latency_ms float8 NOT NULL,
+        ...
+        CONSTRAINT agent_spans_pkey PRIMARY KEY (span_id)
+    );
+    """
+    __tablename__ = 'agent_spans'
+
+    # Columns
+    span_id = Column(Integer, primary_key=True, autoincrement=True)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey('workspaces.workspace_id', ondelete='CASCADE'), nullable=False)
+    message_id = Column(Integer, ForeignKey('messages.message_id', ondelete='CASCADE'), nullable=True)
+    seq = Column(Integer, nullable=False)       # order of the span within the turn
+    type = Column(String(20), nullable=False)
+    name = Column(String(255), nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    latency_ms = Column(Float, nullable=False)
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    cache_creation_input_tokens = Column(Integer, nullable=True)
+    cache_read_input_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Float, nullable=True)
+    stop_reason = Column(String(50), nullable=True)
+    result_size = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=True, server_default=func.now())
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_agent_spans_workspace_id_message_id', 'workspace_id', 'message_id'),
+    )
+
+    def __repr__(self):
+        return f"AgentSpanModel Id={self.span_id} MessageId={self.message_id} Type={self.type} Name={self.name} LatencyMs={self.latency_ms}"
+
+    def to_dict(self) -> dict:
+        return {
+            'span_id': self.span_id,
+            'message_id': self.message_id,
+            'seq': self.seq,
+            'type': self.type,
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'latency_ms': self.latency_ms,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cache_creation_input_tokens': self.cache_creation_input_tokens,
+            'cache_read_input_tokens': self.cache_read_input_tokens,
+            'cost_usd': self.cost_usd,
+            'stop_reason': self.stop_reason,
+            'result_size': self.result_size
+        }
@@ -1,3 +1,10 @@
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import declarative_base
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def utcnow() -> datetime:
+    """the current UTC time without tzinfo.  the columns are TIMESTAMP WITHOUT TIME ZONE, asyncpg rejects aware datetimes"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,80 @@
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, Text, DateTime, ForeignKey, Index, func, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+from .base import Base
+
+class JobModel(Base):
+    """
+    Background work (watching a video, summarizing it, workspace insights) queued for the worker processes.
+    Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, see JobRepository.
+
+    CREATE TABLE public.jobs (
+        job_id bigserial NOT NULL,
+        kind varchar(32) NOT NULL,
+        workspace_id uuid NULL,
+        payload jsonb NOT NULL,
+        status varchar(16) DEFAULT 'queued' NOT NULL,
+        priority int2 DEFAULT 0 NOT NULL,
+        attempts int4 DEFAULT 0 NOT NULL,
+        max_attempts int4 DEFAULT 3 NOT NULL,
+        idempotency_key varchar(255) NULL,
+        run_after timestamp DEFAULT now() NOT NULL,
+        locked_by varchar(64) NULL,
+        locked_at timestamp NULL,
+        result jsonb NULL,
+        error text NULL,
+        ...
+        CONSTRAINT jobs_pkey PRIMARY KEY (job_id),
+        CONSTRAINT jobs_idempotency_key_key UNIQUE (idempotency_key)
+    );
+    """
+    __tablename__ = 'jobs'
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    # Columns
+    job_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String(32), nullable=False)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey('workspaces.workspace_id', ondelete='CASCADE'), nullable=True)
+    payload = Column(JSONB, nullable=False)
+    status = Column(String(16), nullable=False, server_default=QUEUED)
+    priority = Column(SmallInteger, nullable=False, server_default='0')     # higher runs first
+    attempts = Column(Integer, nullable=False, server_default='0')
+    max_attempts = Column(Integer, nullable=False, server_default='3')
+    idempotency_key = Column(String(255), nullable=True, unique=True)
+    run_after = Column(DateTime, nullable=False, server_default=func.now())  # retries are pushed back with a backoff
+    locked_by = Column(String(64), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    result = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    # Indexes
+    __table_args__ = (
+        # only the queued jobs, in the order workers claim them
+        Index('idx_jobs_queued', text('priority DESC'), 'run_after', 'job_id', postgresql_where=text("status = 'queued'")),
+        Index('idx_jobs_running_locked_at', 'locked_at', postgresql_where=text("status = 'running'")),
+    )
+
+    def __repr__(self):
+        return f"JobModel Id={self.job_id} Kind={self.kind} Status={self.status} Attempts={self.attempts}"
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'workspace_id': str(self.workspace_id) if self.workspace_id else None,
+            'payload': self.payload,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
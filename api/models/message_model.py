@@ -1,8 +1,6 @@
-from datetime import datetime, timezone
-
 from sqlalchemy import Column, Integer, String, DateTime, func, Index, ForeignKey, JSON
 from sqlalchemy.dialects.postgresql import UUID
-from .base import Base
+from .base import Base, utcnow
 
 class MessageModel(Base):
     __tablename__ = 'messages'
@@ -17,15 +15,24 @@ class MessageModel(Base):
 
     # Indexes
     __table_args__ = (
-        Index('idx_messages_created_at', 'created_at'),
-        Index('idx_messages_workspace_id', 'workspace_id'),
+        # history is read per workspace in message_id order, pages seek on (workspace_id, message_id)
+        Index('idx_messages_workspace_id_message_id', 'workspace_id', 'message_id'),
     )
 
     def __init__(self, workspace_id: str, role:str, content: str):
         self.workspace_id = workspace_id
         self.role = role
         self.content = content
-        self.created_at = datetime.now(timezone.utc)
+        self.created_at = utcnow()
 
     def __repr__(self):
         return f"MessageModel Id={self.message_id} WorkspaceId={self.workspace_id} Role={self.role} Content={self.content}"
+
+    def to_dict(self):
+        return {
+            'message_id': self.message_id,
+            'workspace_id': str(self.workspace_id),
+            'role': self.role,
+            'content': self.content,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
+
+
+# Response schemas.  Routes declare them as response_model: FastAPI validates the ORM objects or dicts with
+# pydantic-core and the result is rendered by orjson, instead of going through jsonable_encoder reflection.
+
+class MessageResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    message_id: int
+    workspace_id: UUID
+    role: str
+    content: Any
+    created_at: datetime | None
+
+
+class WorkspaceResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    workspace_id: UUID
+    user_id: int
+    name: str
+    created_at: datetime | None
+    version: int
+    updated_at: datetime | None
+
+
+class WorkspaceListResponse(BaseModel):
+    workspaces: list[WorkspaceResponse]
+
+
+class VideoListItem(BaseModel):
+    video_id: int
+    title: str | None
+    author: str | None
+    has_summary: bool
+
+
+class VideoListResponse(BaseModel):
+    videos: list[VideoListItem]
+
+
+class JobResponse(BaseModel):
+    job_id: int
+    kind: str
+    workspace_id: UUID | None
+    payload: dict
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    result: dict | None
+    error: str | None
+    created_at: datetime | None
+    finished_at: datetime | None
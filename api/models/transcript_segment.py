@@ -0,0 +1,43 @@
+from sqlalchemy import Column, Integer, Text, ForeignKey, Index, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+
+from .base import Base
+
+class TranscriptSegmentModel(Base):
+    """
+    Transcripts split into windows of captions for full text search, see domain/services/transcript_segments.py.
+    tsv is generated by Postgres and indexed with GIN.
+
+    CREATE TABLE public.transcript_segments (
+        segment_id serial4 NOT NULL,
+        video_id int4 NOT NULL,
+        start_seconds int4 NOT NULL,
+        "text" text NOT NULL,
+        tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', text)) STORED,
+        CONSTRAINT transcript_segments_pkey PRIMARY KEY (segment_id)
+    );
+    ALTER TABLE public.transcript_segments ADD CONSTRAINT transcript_segments_video_id_fkey FOREIGN KEY (video_id) REFERENCES public.videos(video_id) ON DELETE CASCADE;
+    """
+    __tablename__ = 'transcript_segments'
+
+    # Columns
+    segment_id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(Integer, ForeignKey('videos.video_id', ondelete='CASCADE'), nullable=False)
+    start_seconds = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('english', text)", persisted=True)))
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_transcript_segments_video_id', 'video_id'),
+        Index('idx_transcript_segments_tsv', 'tsv', postgresql_using='gin'),
+    )
+
+    def __init__(self, video_id: int, start_seconds: int, text: str):
+        self.video_id = video_id
+        self.start_seconds = start_seconds
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"TranscriptSegmentModel(id={self.segment_id}, video_id={self.video_id}, start={self.start_seconds})"
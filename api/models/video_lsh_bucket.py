@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, ForeignKey, Index
+
+from .base import Base
+
+class VideoLshBucketModel(Base):
+    """
+    LSH index over the MinHash signatures of video transcripts.  Two videos sharing a (band, bucket) pair are
+    near-duplicate candidates.
+
+    CREATE TABLE public.video_lsh_buckets (
+        band int2 NOT NULL,
+        bucket int8 NOT NULL,
+        video_id int4 NOT NULL,
+        CONSTRAINT video_lsh_buckets_pkey PRIMARY KEY (band, bucket, video_id)
+    );
+    ALTER TABLE public.video_lsh_buckets ADD CONSTRAINT video_lsh_buckets_video_id_fkey FOREIGN KEY (video_id) REFERENCES public.videos(video_id) ON DELETE CASCADE;
+    """
+    __tablename__ = 'video_lsh_buckets'
+
+    # Columns
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    video_id = Column(Integer, ForeignKey('videos.video_id', ondelete='CASCADE'), primary_key=True)
+
+    # Indexes
+    __table_args__ = (
+        Index('idx_video_lsh_buckets_video_id', 'video_id'),
+    )
+
+    def __init__(self, band: int, bucket: int, video_id: int):
+        self.band = band
+        self.bucket = bucket
+        self.video_id = video_id
+
+    def __repr__(self) -> str:
+        return f"VideoLshBucketModel(band={self.band}, bucket={self.bucket}, video_id={self.video_id})"
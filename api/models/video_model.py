@@ -1,31 +1,65 @@
-from datetime import datetime, timezone
 from typing import Optional
 
-from sqlalchemy import Column, Integer, Text, String, DateTime, Index,func
+from sqlalchemy import Column, Integer, Text, String, DateTime, Index, LargeBinary, func, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 
-from .base import Base
+from domain.services.transcript_codec import transcript_codec
+from domain.services.youtube_ids import canonical_video_id
+from .base import Base, utcnow
 
 class VideoModel(Base):
     __tablename__ = 'videos'
+    PREVIEW_LENGTH = 100
 
     # Columns
     video_id = Column(Integer, primary_key=True, autoincrement=True)
     url = Column(Text, nullable=False, unique=True)     # the unique constraint ensures we do not have a duplicate value in the DB.
-    transcript = Column(Text, nullable=False)
+    youtube_id = Column(String(11), nullable=True)      # canonical video id, the same video under another url form has the same one
+    # transcripts are stored compressed in transcript_z, rows written before that keep the text in transcript
+    # until database/migrate_transcripts.py converts them.  read and write them through the transcript property
+    transcript_text = Column('transcript', Text, nullable=True)
+    transcript_z = Column(LargeBinary, nullable=True)
+    transcript_preview = Column(Text, nullable=True)    # start of the transcript, listings read it instead of decompressing
     title = Column(String(500), nullable=False)
     channel = Column(String(255), nullable=False)
+    minhash = Column(LargeBinary, nullable=True)        # MinHash signature of the transcript, see domain/services/minhash.py
     created_at = Column(DateTime, nullable=True, server_default=func.now())
+    # title and channel for full text search, generated by Postgres.  transcripts are searched per segment
+    search_tsv = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(channel, '')), 'B')",
+        persisted=True)))
 
     # Indexes
     __table_args__ = (
+        Index('idx_videos_search_tsv', 'search_tsv', postgresql_using='gin'),
+        Index('idx_videos_youtube_id', 'youtube_id'),
     )
 
-    def __init__(self, url:str, transcript:str, title:str, channel: str) -> None:
+    def __init__(self, url:str, transcript:str, title:str, channel: str, minhash: Optional[bytes] = None) -> None:
         self.url = url
+        self.youtube_id = canonical_video_id(url)
         self.transcript = transcript
         self.title = title
         self.channel = channel
-        self.created_at = datetime.now(timezone.utc)
+        self.minhash = minhash
+        self.created_at = utcnow()
+
+    @property
+    def transcript(self) -> str | None:
+        if self.transcript_z is None:
+            return self.transcript_text
+        decoded = self.__dict__.get('_transcript')
+        if decoded is None or decoded[0] is not self.transcript_z:
+            decoded = (self.transcript_z, transcript_codec.decompress(self.transcript_z))
+            self.__dict__['_transcript'] = decoded       # decompressed once per loaded row
+        return decoded[1]
+
+    @transcript.setter
+    def transcript(self, transcript: str):
+        self.transcript_z = transcript_codec.compress(transcript)
+        self.transcript_preview = transcript[:self.PREVIEW_LENGTH]
+        self.transcript_text = None
 
     def __repr__(self) -> str:
         """debug string"""
@@ -1,10 +1,9 @@
-from datetime import timezone, datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, func, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 
-from .base import Base
+from .base import Base, utcnow
 
 class WorkspaceModel(Base):
     """
@@ -13,6 +12,8 @@ class WorkspaceModel(Base):
 	user_id int4 NULL,
 	"name" varchar(255) NOT NULL,
 	created_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	"version" int8 DEFAULT 0 NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
 	CONSTRAINT workspaces_pkey PRIMARY KEY (workspace_id)
 );
     -- public.workspaces foreign keys
@@ -27,6 +28,9 @@ class WorkspaceModel(Base):
     user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
     name = Column(String(255), nullable=False)
     created_at = Column(DateTime, nullable=True, server_default=func.now())
+    # bumped with every write to the workspace, its messages or its videos.  drives ETag / Last-Modified
+    version = Column(BigInteger, nullable=False, server_default='0')
+    updated_at = Column(DateTime, nullable=True, server_default=func.now())
 
     # Indexes
     # none
@@ -34,7 +38,9 @@ class WorkspaceModel(Base):
     def __init__(self, user_id: Integer, name:str):
         self.user_id = user_id
         self.name = name
-        self.created_at = datetime.now(timezone.utc)
+        self.created_at = utcnow()
+        self.version = 0
+        self.updated_at = self.created_at
 
     def __repr__(self):
         return f"Workspace UserId={self.user_id} Name={self.name} CreationDate={self.created_at}"
@@ -1,11 +1,10 @@
-from datetime import datetime, timezone
 from uuid import uuid4
 
 from sqlalchemy import Column, String, ForeignKey, Integer, DateTime, func, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
-from .base import Base
+from .base import Base, utcnow
 
 class WorkspaceVideoModel(Base):
     """
@@ -38,7 +37,7 @@ ALTER TABLE public.workspace_videos ADD CONSTRAINT workspace_videos_workspace_id
     def __init__(self, workspace_id:str, video_id:Integer, summary:str=None):
         self.workspace_id = workspace_id
         self.video_id = video_id
-        self.added_at = datetime.now(timezone.utc)
+        self.added_at = utcnow()
         self.summary = summary
 
     def to_dict(self):
@@ -1,10 +1,32 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 
-from api.routes.health_check import HealthCheck
+from api.routes.health_check import HealthProber
+from domain.services.admission import AdmissionController
+from infrastructure.metrics import prompt_cache_stats
+from infrastructure.orm_database import get_pool_stats
 
 router = APIRouter()
 
 # HEALTH CHECK ENDPOINT
+# the results of the background checks, 503 when the database is down so load balancers take the node out
 @router.get("/health")
-def health():
-    return HealthCheck.execute()
+async def health(response: Response):
+    snapshot = HealthProber.shared().snapshot()
+    if snapshot["health"] == HealthProber.ERROR:
+        response.status_code = 503
+    return snapshot
+
+# connection pool usage and checkout wait times
+@router.get("/pool")
+def pool():
+    return get_pool_stats()
+
+# chat turns running and waiting, and how long they waited to start
+@router.get("/admission")
+async def admission():
+    return AdmissionController.shared().stats()
+
+# input tokens read from Anthropic's prompt cache, written to it and not cached, and the hit ratio
+@router.get("/prompt-cache")
+async def prompt_cache():
+    return prompt_cache_stats()
@@ -1,64 +1,174 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from infrastructure.orm_database import SessionLocal
+from infrastructure.orm_database import engine
 from logger_config import  getLogger
 
 logger = getLogger(__name__)
 
 
 class HealthCheck:
+    """one check per dependency, each returns (healthy, details).  run by HealthProber, not per request"""
+    _youtube = None
+    _claude = None
+
     @staticmethod
     def check_health_db() -> tuple[bool, str]:
-        db: Session | None = None
+        # a pooled connection is enough, no session or transaction needed
         try:
-            db = SessionLocal()
-            db.execute(text("SELECT 1")).scalar()
-            engine = db.get_bind()
-
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1")).scalar()
             return True, f"connected to {engine.url.database} on {engine.url.host}"
         except Exception as e:
             logger.error(e)
             return False, "error connecting to DB"
-        finally:
-            if db: db.close()
 
     @staticmethod
     def check_health_youtube() -> tuple[bool, str]:
-        return True, "connected to YouTube API OK"
+        try:
+            if HealthCheck._youtube is None:
+                from components.services.youtube_service import YouTubeService
+                HealthCheck._youtube = YouTubeService()
+            HealthCheck._youtube.test()
+            return True, "connected to YouTube API OK"
+        except Exception as e:
+            logger.error(f"YouTube health check failed: {e}")
+            return False, "error calling the YouTube API"
 
     @staticmethod
     def check_health_anthropic() -> tuple[bool, str]:
-        return True, "connected anthropic API OK"
-
-    @staticmethod
-    def execute():
         try:
-            is_ok_db, details_db = HealthCheck.check_health_db()
-            is_ok_youtube, details_youtube = HealthCheck.check_health_youtube()
-            is_ok_anthropic, details_anthropic = HealthCheck.check_health_anthropic()
-
-            if is_ok_db and is_ok_youtube and is_ok_anthropic:
-                health = "OK"
-            else:
-                health = "ERROR"
-
-
-            return     {
-                "health":  health,
-                "details": {
-                    "database": {
-                        "health": is_ok_db,
-                        "details": details_db
-                    },
-                    "youtube": {
-                        "health": "OK",
-                        "details": "connected to yt"
-                    },
-                    "anthropic": {
-                        "health": "OK",
-                        "details": "connected to claude"
-                    }
-                }
-            }
+            if HealthCheck._claude is None:
+                from components.anthropic.anthropic_service import Claude
+                HealthCheck._claude = Claude()
+            if HealthCheck._claude.is_healthy():
+                return True, "connected anthropic API OK"
+            return False, "error calling the anthropic API"
         except Exception as e:
-            return { "status": "ERROR", "error": str(e) }
+            logger.error(f"anthropic health check failed: {e}")
+            return False, "error calling the anthropic API"
+
+
+@dataclass
+class Probe:
+    """a dependency's check and its last result"""
+    name: str
+    check: Callable[[], tuple[bool, str]]
+    interval: float                     # seconds between checks
+    slow_ms: float                      # slower than this is DEGRADED
+    critical: bool                      # the API can not serve anything without it
+    healthy: bool | None = None         # None until checked
+    details: str = "not checked yet"
+    latency_ms: float | None = None
+    checked_at: float | None = None     # time.monotonic()
+    checked_at_utc: str | None = None
+
+    def run(self):
+        start = time.perf_counter()
+        healthy, details = self.check()
+        self.latency_ms = round((time.perf_counter() - start) * 1000, 3)
+        self.healthy, self.details = healthy, details
+        self.checked_at = time.monotonic()
+        self.checked_at_utc = datetime.now(timezone.utc).isoformat()
+
+    def status(self, now: float) -> str:
+        if self.healthy is None:
+            return HealthProber.DEGRADED
+        if not self.healthy:
+            return HealthProber.ERROR
+        if now - self.checked_at > self.interval * HealthProber.STALE_INTERVALS or self.latency_ms > self.slow_ms:
+            return HealthProber.DEGRADED
+        return HealthProber.OK
+
+
+class HealthProber:
+    """
+    Checks the database, YouTube and Anthropic in the background, each on its own thread and interval, and keeps the
+    results.  The health endpoint serves the last results, so load balancer probes cost no database or API calls.
+
+    A dependency is DEGRADED when its check is slower than its threshold, or its last result is older than
+    STALE_INTERVALS intervals (the check hangs), ERROR when the check fails.  The API is ERROR when the database is,
+    DEGRADED when anything else is not OK.  YouTube and Anthropic are checked rarely, the YouTube check costs quota.
+    """
+    OK, DEGRADED, ERROR = "OK", "DEGRADED", "ERROR"
+
+    PROBE_SECONDS = float(os.getenv('HEALTH_PROBE_SECONDS', 10))
+    PROBE_EXTERNAL_SECONDS = float(os.getenv('HEALTH_PROBE_EXTERNAL_SECONDS', 300))
+    DB_SLOW_MS = float(os.getenv('HEALTH_DB_SLOW_MS', 100))
+    YOUTUBE_SLOW_MS = float(os.getenv('HEALTH_YOUTUBE_SLOW_MS', 2000))
+    ANTHROPIC_SLOW_MS = float(os.getenv('HEALTH_ANTHROPIC_SLOW_MS', 3000))
+    STALE_INTERVALS = 3
+
+    _shared: 'HealthProber | None' = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.probes = [
+            Probe("database", HealthCheck.check_health_db, self.PROBE_SECONDS, self.DB_SLOW_MS, critical=True),
+            Probe("youtube", HealthCheck.check_health_youtube, self.PROBE_EXTERNAL_SECONDS, self.YOUTUBE_SLOW_MS, critical=False),
+            Probe("anthropic", HealthCheck.check_health_anthropic, self.PROBE_EXTERNAL_SECONDS, self.ANTHROPIC_SLOW_MS, critical=False),
+        ]
+        self.stopping = threading.Event()
+        self.threads: list[threading.Thread] = []
+
+    @classmethod
+    def shared(cls) -> 'HealthProber':
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def start(self):
+        """checks the database right away, the slower external checks start in the background"""
+        if self.threads:
+            return
+        self.stopping.clear()
+        self.probes[0].run()
+        for probe in self.probes:
+            thread = threading.Thread(target=self._loop, args=(probe, probe is not self.probes[0]), name=f"health-{probe.name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopping.set()
+        self.threads = []
+
+    def _loop(self, probe: Probe, run_first: bool):
+        if not run_first and self.stopping.wait(probe.interval):
+            return
+        while not self.stopping.is_set():
+            try:
+                probe.run()
+            except Exception as e:
+                logger.error(f"health probe {probe.name} failed: {e}")
+            if probe.healthy is False:
+                logger.warning(f"health: {probe.name} is down, {probe.details}")
+            self.stopping.wait(probe.interval)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        statuses = {probe.name: probe.status(now) for probe in self.probes}
+        if any(statuses[probe.name] == self.ERROR for probe in self.probes if probe.critical):
+            health = self.ERROR
+        elif all(status == self.OK for status in statuses.values()):
+            health = self.OK
+        else:
+            health = self.DEGRADED
+
+        return {
+            "health": health,
+            "details": {
+                probe.name: {
+                    "health": statuses[probe.name],
+                    "details": probe.details,
+                    "latency_ms": probe.latency_ms,
+                    "checked_at": probe.checked_at_utc,
+                    "age_seconds": round(now - probe.checked_at, 3) if probe.checked_at is not None else None
+                } for probe in self.probes
+            }
+        }
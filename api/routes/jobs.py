@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from api.models.schemas import JobResponse
+from domain.repositories.job_repository import JobRepository
+from infrastructure.orm_database import get_session
+
+router = APIRouter()
+
+# status of background work queued with 202 Accepted: queued, running, succeeded (with its result) or failed
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job(job_id: int, s: Session = Depends(get_session)):
+    job = JobRepository(s).get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job {job_id} not found")
+    return job
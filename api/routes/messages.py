@@ -1,31 +1,162 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query, Request, Response, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from api.models import MessageModel
-from components.agents.chat_agent import ChatAgent
-from components.anthropic.chat_message import ChatMessage
-from components.anthropic.content import Content
+from api.conditional import etag, not_modified
+from api.models.schemas import MessageResponse
 from domain.models.agent_event import AgentEvent
-from domain.repositories.message_repository import MessageRepository
-from domain.repositories.video_repository import VideoRepository
-from domain.services.workspace_service import WorkspaceService
-from infrastructure.orm_database import get_session
+from domain.repositories.message_repository import MessageRepository, AsyncMessageRepository
+from domain.repositories.span_repository import SpanRepository, AsyncSpanRepository
+from domain.repositories.video_repository import VideoRepository, AsyncVideoRepository
+from domain.repositories.workspace_repository import WorkspaceRepository, AsyncWorkspaceRepository
+from domain.services.admission import AdmissionController, AdmissionRejected, Ticket
+from domain.services.turn_stream import TurnStream, TurnStreams
+from domain.services.workspace_service import WorkspaceService, AsyncWorkspaceService
+from infrastructure.orm_database import get_session, get_async_session, SessionLocal, AsyncSessionLocal
+from logger_config import getLogger
 
 router = APIRouter()
+logger = getLogger(__name__)
 
 # Summary: HTTP routing, request/response
 
-@router.get("/")
-def get_messages(workspace_id: str, cursor: int= None, session: Session = Depends(get_session)):
+# the whole history, or a page of it when limit, cursor, before or after is given (limit defaults to PAGE_SIZE).
+# keyset pagination: pass the X-Next-Cursor header back as after (or cursor) for the following page,
+# X-Prev-Cursor as before for older messages
+PAGE_SIZE = 100
+
+@router.get("/", response_model=list[MessageResponse])
+def get_messages(workspace_id: str, request: Request, response: Response, cursor: int= None, limit: int = Query(None, ge=1, le=1000),
+                 before: int = None, after: int = None, session: Session = Depends(get_session)):
+    after = after if after is not None else cursor
+    paged = limit is not None or before is not None or after is not None
+    if paged:
+        limit = limit or PAGE_SIZE
+
+    version = WorkspaceRepository(session).get_version(workspace_id)
+    if version is not None:
+        # every page has its own tag, a cached page is never answered for another
+        page = (limit, before, after) if paged else ()
+        cached = not_modified(request, response, etag("messages", workspace_id, version[0], *page), version[1])
+        if cached: return cached
+
     mr = MessageRepository(session)
     vr = VideoRepository(session)
     ws = WorkspaceService(mr, vr)
-    messages = ws.getMessages(workspace_id, cursor)
+    if not paged:
+        return ws.getMessages(workspace_id)
+
+    messages = ws.getMessages(workspace_id, limit, before=before, after=after)
+    if len(messages) == limit:
+        if before is not None and after is None:
+            response.headers["X-Prev-Cursor"] = str(messages[0].message_id)
+        else:
+            response.headers["X-Next-Cursor"] = str(messages[-1].message_id)
     return messages
 
+# the whole history as JSON lines, streamed from a server side cursor
+@router.get("/export")
+def export_messages(workspace_id: str):
+    return StreamingResponse(export_lines(workspace_id), media_type="application/x-ndjson")
+
+def export_lines(workspace_id: str):
+    # the request session is closed before the response is streamed, the export needs its own
+    session = SessionLocal()
+    try:
+        for message in MessageRepository(session).stream_messages(workspace_id):
+            yield json.dumps(message.to_dict()) + "\n"
+    finally:
+        session.close()
+
+# async end to end: the turn awaits Claude and the database instead of holding a threadpool thread.
+# turns go through admission control first, 429 with Retry-After when too many are waiting
 @router.post("/")
-def send_message(workspace_id:str, message: str, session: Session = Depends(get_session)):
+async def send_message(workspace_id:str, message: str, session: AsyncSession = Depends(get_async_session)):
+    ticket = await enqueue_turn(workspace_id, session)
+    mr = AsyncMessageRepository(session)
+    vr = AsyncVideoRepository(session)
+    sr = AsyncSpanRepository(session)
+    ws = AsyncWorkspaceService(mr, vr, sr)
+    try:
+        async with ticket:
+            return await ws.send_message(workspace_id, message)
+    except AdmissionRejected as e:
+        raise too_many_turns(e)
+
+async def enqueue_turn(workspace_id: str, session: AsyncSession) -> Ticket:
+    user_id = await AsyncWorkspaceRepository(session).get_user_id(workspace_id)
+    # end the read so the connection goes back to the pool while the turn waits
+    await session.commit()
+    if user_id is None:
+        raise HTTPException(status_code=404, detail=f"workspace {workspace_id} not found")
+    try:
+        return AdmissionController.shared().enqueue(user_id, workspace_id)
+    except AdmissionRejected as e:
+        raise too_many_turns(e)
+
+def too_many_turns(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+# the turn as Server-Sent Events: tool use, videos watched and summarized, spans and text deltas as they happen,
+# then done (or error).  the turn runs in the background and is saved whether or not the client stays connected.
+# reconnect with GET /stream/{X-Turn-Id} and the Last-Event-ID header to receive the events missed
+KEEPALIVE_SECONDS = 15
+
+@router.post("/stream")
+async def send_message_stream(workspace_id:str, message: str, session: AsyncSession = Depends(get_async_session)):
+    ticket = await enqueue_turn(workspace_id, session)
+    stream = TurnStreams.shared().create()
+    stream.task = asyncio.create_task(run_turn(workspace_id, message, stream, ticket))
+    return event_stream_response(stream, -1)
+
+@router.get("/stream/{turn_id}")
+async def resume_message_stream(workspace_id:str, turn_id: str, last_event_id: str = Header(None)):
+    stream = TurnStreams.shared().get(turn_id)
+    if stream is None:
+        # ended long ago or ran on another API process, the turn is in the saved messages
+        raise HTTPException(status_code=404, detail=f"turn {turn_id} not found")
+    return event_stream_response(stream, int(last_event_id) if last_event_id else -1)
+
+async def run_turn(workspace_id: str, message: str, stream: TurnStream, ticket: Ticket):
+    try:
+        async with ticket, AsyncSessionLocal() as session:
+            ws = AsyncWorkspaceService(AsyncMessageRepository(session), AsyncVideoRepository(session), AsyncSpanRepository(session))
+            final_response = await ws.send_message(workspace_id, message, listener=stream.publish)
+            stream.publish(AgentEvent('done', datetime.now().isoformat(), { 'final_response': final_response }))
+    except AdmissionRejected as e:
+        stream.publish(AgentEvent('error', datetime.now().isoformat(), { 'detail': str(e), 'retry_after': e.retry_after }))
+    except Exception as e:
+        logger.error(f"streamed turn {stream.turn_id} failed: {e}")
+        stream.publish(AgentEvent('error', datetime.now().isoformat(), { 'detail': 'the turn failed' }))
+    finally:
+        stream.close()
+
+def event_stream_response(stream: TurnStream, after: int) -> StreamingResponse:
+    return StreamingResponse(sse_lines(stream, after), media_type="text/event-stream",
+                             headers={"X-Turn-Id": stream.turn_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def sse_lines(stream: TurnStream, after: int):
+    # each line is awaited by the server, a client that reads slowly slows only its own stream
+    async for item in stream.subscribe(after, KEEPALIVE_SECONDS):
+        if item is None:
+            yield ": keepalive\n\n"
+            continue
+        event_id, event = item
+        data = event.data
+        if event.type == 'video_watched':
+            data = { key: value for key, value in data.items() if key != 'transcript' }
+        yield f"id: {event_id}\nevent: {event.type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# latency and cost breakdown of the turn started by a user message
+@router.get("/{message_id}/spans")
+def get_spans(workspace_id:str, message_id:int, session: Session = Depends(get_session)):
     mr = MessageRepository(session)
     vr = VideoRepository(session)
-    ws = WorkspaceService(mr, vr)
-    return ws.send_message(workspace_id, message)
+    sr = SpanRepository(session)
+    ws = WorkspaceService(mr, vr, sr)
+    return { "spans": ws.get_spans(workspace_id, message_id) }
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from domain.repositories.search_repository import SearchRepository
+from infrastructure.orm_database import get_session
+
+router = APIRouter()
+
+# full text search over every stored video: transcript passages with timestamps and snippets, and matching titles
+@router.get("/")
+def search(q: str = Query(..., min_length=1, max_length=500), limit: int = Query(20, ge=1, le=100),
+           offset: int = Query(0, ge=0, le=1000), s: Session = Depends(get_session)):
+    repository = SearchRepository(s)
+    return {
+        "query": q,
+        "results": repository.search_segments(q, limit=limit, offset=offset),
+        "videos": repository.search_videos(q) if offset == 0 else []
+    }
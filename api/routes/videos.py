@@ -1,25 +1,42 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 
+from api.conditional import etag, not_modified
 from api.models import VideoModel, WorkspaceVideoModel
+from api.models.schemas import VideoListResponse, JobResponse
 from components.services.youtube_service import YouTubeService
+from domain.repositories.job_repository import JobRepository
 from domain.repositories.video_repository import VideoRepository
+from domain.repositories.workspace_repository import WorkspaceRepository
 from infrastructure.orm_database import get_session
 
 router = APIRouter()
 
 # get all videos for a workspace
-@router.get("/")
-def get_videos(workspace_id:str, s:Session = Depends(get_session)):
-
-    retval = { "videos": [] }
-    # retval["videos"].append(workspace_videos)
+@router.get("/", response_model=VideoListResponse)
+def get_videos(workspace_id:str, request: Request, response: Response, s:Session = Depends(get_session)):
+    version = WorkspaceRepository(s).get_version(workspace_id)
+    if version is not None:
+        cached = not_modified(request, response, etag("videos", workspace_id, version[0]), version[1])
+        if cached: return cached
 
     video_repository = VideoRepository(s)
-    video_repository.get_videos(workspace_id)
-    return retval
+    return { "videos": video_repository.list_videos(workspace_id) }
 
 # get a single video
 @router.get("/{video_id}")
 def get_video(workspace_id:str, video_id:int):
     return { "val" : "not implemented"}
+
+# watching a video fetches it from YouTube, a worker does it (MainWorker.py).  poll the job at Location
+@router.post("/", status_code=202, response_model=JobResponse)
+def watch_video(workspace_id:str, url:str, response: Response, s:Session = Depends(get_session)):
+    job = JobRepository(s).enqueue_watch(workspace_id, url)
+    response.headers["Location"] = f"/api/v1/jobs/{job['job_id']}"
+    return job
+
+@router.post("/{video_id}/summary", status_code=202, response_model=JobResponse)
+def summarize_video(workspace_id:str, video_id:int, response: Response, s:Session = Depends(get_session)):
+    job = JobRepository(s).enqueue_summarize(workspace_id, video_id)
+    response.headers["Location"] = f"/api/v1/jobs/{job['job_id']}"
+    return job
@@ -1,7 +1,16 @@
-from fastapi import APIRouter, Depends
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from api.conditional import etag, not_modified
 from api.models import WorkspaceModel
-from infrastructure.orm_database import get_session
+from api.models.schemas import WorkspaceResponse, WorkspaceListResponse, JobResponse
+from domain.repositories.job_repository import JobRepository
+from domain.repositories.workspace_repository import WorkspaceRepository
+from domain.services.workspace_transfer import WorkspaceTransfer, gzip_lines, read_lines
+from infrastructure.orm_database import get_session, SessionLocal
 
 router = APIRouter()
 
@@ -23,6 +32,7 @@ def create_workspace(user_id:int, name:str = None, workspace_id:str = None, s:Se
             workspace = s.query(WorkspaceModel).filter_by(workspace_id=workspace_id).one_or_none()
             workspace.name = name
             s.add(workspace)
+            WorkspaceRepository(s).touch(workspace_id)
             s.commit()
             retval["workspace_id"] = workspace.workspace_id
     else:
@@ -33,17 +43,71 @@ def create_workspace(user_id:int, name:str = None, workspace_id:str = None, s:Se
         retval["created_at"] = workspace.created_at
     return retval
 
-@router.get("/{workspace_id}")
-def get_workspace(workspace_id:str, s:Session = Depends(get_session)):
+@router.get("/{workspace_id}", response_model=WorkspaceResponse | None)
+def get_workspace(workspace_id:str, request: Request, response: Response, s:Session = Depends(get_session)):
+    version = WorkspaceRepository(s).get_version(workspace_id)
+    if version is not None:
+        cached = not_modified(request, response, etag("workspace", workspace_id, version[0]), version[1])
+        if cached: return cached
+
     workspace = s.query(WorkspaceModel).filter_by(workspace_id=workspace_id).one_or_none()
     retval = workspace
     return retval
 
-@router.get("/")
-def get_workspaces(s:Session = Depends(get_session)):
+@router.get("/", response_model=WorkspaceListResponse)
+def get_workspaces(request: Request, response: Response, s:Session = Depends(get_session)):
+    version, updated_at = WorkspaceRepository(s).get_list_version()
+    cached = not_modified(request, response, etag("workspaces", version), updated_at)
+    if cached: return cached
 
     workspaces = s.query(WorkspaceModel).order_by(WorkspaceModel.created_at.desc()).all()
-    retval = { "workspaces": [] }
+    return { "workspaces": workspaces }
 
-    retval["workspaces"].append(workspaces)
-    return retval
+# insights across the summaries of the workspace, produced by a worker.  the result is on the job at Location
+@router.post("/{workspace_id}/insights", status_code=202, response_model=JobResponse)
+def create_insights(workspace_id: str, response: Response, idempotency_key: str = Header(None),
+                    s: Session = Depends(get_session)):
+    job = JobRepository(s).enqueue_insights(workspace_id, idempotency_key)
+    response.headers["Location"] = f"/api/v1/jobs/{job['job_id']}"
+    return job
+
+# the workspace, its videos and its messages as JSON lines, gzipped with compress=gzip
+@router.get("/{workspace_id}/export")
+def export_workspace(workspace_id: str, compress: str = None, s: Session = Depends(get_session)):
+    if s.get(WorkspaceModel, workspace_id) is None:
+        raise HTTPException(status_code=404, detail=f"workspace {workspace_id} not found")
+    filename = f"workspace-{workspace_id}.jsonl"
+    if compress == "gzip":
+        return StreamingResponse(gzip_lines(export_lines(workspace_id)), media_type="application/gzip",
+                                 headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'})
+    return StreamingResponse(export_lines(workspace_id), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+def export_lines(workspace_id: str):
+    # the request session is closed before the response is streamed, the export needs its own
+    session = SessionLocal()
+    try:
+        yield from WorkspaceTransfer(session).export_lines(workspace_id)
+    finally:
+        session.close()
+
+# body: an export, plain or gzipped.  spooled to disk past SPOOL_BYTES so large imports do not sit in memory
+SPOOL_BYTES = 8 * 1024 * 1024
+
+@router.post("/import")
+async def import_workspace(request: Request, user_id: int = None, workspace_id: str = None):
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as file:
+        async for chunk in request.stream():
+            file.write(chunk)
+        file.seek(0)
+        try:
+            return await run_in_threadpool(import_file, file, user_id, workspace_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+def import_file(file, user_id: int, workspace_id: str) -> dict:
+    session = SessionLocal()
+    try:
+        return WorkspaceTransfer(session).import_lines(read_lines(file), user_id=user_id, workspace_id=workspace_id)
+    finally:
+        session.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Cold start of the API and the command line programs: wall time of importing each entry point in a fresh
+interpreter, and the modules that take the most of it (python -X importtime, cumulative microseconds).
+
+Run it from a shell with the app's environment (.env is loaded by the entry points, LOG_LEVEL must be set).
+
+Some of what api.main imports stays eager on purpose, the first requests would pay for it otherwise: FastAPI and
+SQLAlchemy, asyncpg (the async engine is built at import), prometheus_client (metrics register at import) and numpy
+(every stored video is MinHashed).
+
+Usage:
+    python benchmarks/import_time.py                        # api.main, MainChat, MainWorker, MainCli, 5 runs each
+    python benchmarks/import_time.py --runs 10 --top 25 api.main
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+ENTRY_POINTS = ['api.main', 'MainChat', 'MainWorker', 'MainCli']
+
+
+def import_once(module: str) -> tuple[float, dict[str, int]]:
+    """wall seconds of `import module` in a new interpreter, and the cumulative import time of every module"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, env=os.environ.copy())
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, total, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(total)
+    return elapsed, cumulative
+
+
+def report(module: str, runs: int, top: int):
+    walls = []
+    samples: dict[str, list[int]] = {}
+    for _ in range(runs):
+        wall, cumulative = import_once(module)
+        walls.append(wall)
+        for name, total in cumulative.items():
+            samples.setdefault(name, []).append(total)
+
+    medians = {name: statistics.median(totals) for name, totals in samples.items()}
+    print(f"\n{module}: {statistics.median(walls) * 1000:.0f} ms wall (median of {runs}, "
+          f"min {min(walls) * 1000:.0f}), {medians.get(module, 0) / 1000:.0f} ms importing, {len(medians)} modules")
+    if top:
+        print(f"{'module':<60}{'cumulative ms':>15}")
+    for name, total in sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{name:<60}{total / 1000:>15.1f}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="import time of the entry points")
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help="modules to list per entry point")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    for module in args.modules:
+        report(module, args.runs, args.top)
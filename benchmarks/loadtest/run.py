@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Load test of the API: starts the stubs (stubs.py), the API (uvicorn api.main:app) and a job worker against the
+Postgres of DATABASE_URL, then sends a mix of requests at a target rate and writes a report.
+
+Requests arrive open loop (Poisson arrivals at --rps), so a slow API builds a backlog instead of slowing the load
+down, as real users would.  The mix, by weight:
+
+    create      POST /workspaces                            a new workspace for a user
+    watch       POST /workspaces/{id}/videos                queues a watch job, urls come from a pool of --videos ids
+    summarize   POST /workspaces/{id}/videos/{id}/summary   queues a summary job for a watched video
+    chat        POST /workspaces/{id}/messages              a chat turn: watch a url, summarize a video, or a question
+    history     GET  /workspaces/{id}/messages              the last 50 messages
+
+The report has throughput, latency percentiles and error rates per kind of request, connection pool and
+admission samples taken every second, and the prompt cache hit ratio of the chat turns.  Pool numbers are those of the API process that answered the sample, run
+with --api-workers 1 for exact figures.  The test writes to the database, use a scratch one.
+
+Usage:
+    python benchmarks/loadtest/run.py                                       # 5 rps for 60 s
+    python benchmarks/loadtest/run.py --rps 20 --duration 300 --users 50
+    python benchmarks/loadtest/run.py --mix chat=60,history=30,watch=10 --anthropic-latency 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent.parent.parent
+REPORTS = Path(__file__).parent / 'reports'
+
+DEFAULT_MIX = "create=5,watch=10,summarize=10,chat=35,history=40"
+QUESTIONS = ("what are the main points?", "who is the speaker?", "compare the videos", "what should I watch next?")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="load test of the API with stubbed YouTube and Anthropic")
+    parser.add_argument('--rps', type=float, default=5, help="requests per second")
+    parser.add_argument('--duration', type=float, default=60, help="seconds of load")
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--videos', type=int, default=50, help="distinct videos watched")
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--api-port', type=int, default=8200)
+    parser.add_argument('--api-workers', type=int, default=1)
+    parser.add_argument('--stub-port', type=int, default=8100)
+    parser.add_argument('--anthropic-latency', type=float, default=0.5)
+    parser.add_argument('--youtube-latency', type=float, default=0.3)
+    parser.add_argument('--no-job-worker', action='store_true', help="do not start MainWorker.py, e.g. one runs already")
+    parser.add_argument('--report', help="report file, default benchmarks/loadtest/reports/<time>.json")
+    return parser.parse_args(argv)
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight)
+    unknown = set(weights) - set(LoadTest.OPERATIONS)
+    if unknown:
+        raise SystemExit(f"unknown request kinds in --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def start_processes(args) -> list[subprocess.Popen]:
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    env = dict(os.environ,
+               ANTHROPIC_BASE_URL=f"{stub_url}/anthropic",
+               ANTHROPIC_API_KEY="stub",                # never reach the real API
+               YOUTUBE_STUB_URL=f"{stub_url}/youtube",
+               YOUTUBE_API_KEY="stub")
+    processes = [subprocess.Popen([sys.executable, str(Path(__file__).parent / 'stubs.py'), '--port', str(args.stub_port),
+                                   '--anthropic-latency', str(args.anthropic_latency), '--youtube-latency', str(args.youtube_latency)],
+                                  cwd=ROOT, env=env)]
+    # the API and the worker fetch videos from the stub through stub_youtube.py
+    processes.append(subprocess.Popen([sys.executable, '-m', 'uvicorn', 'benchmarks.loadtest.stubbed_api:app', '--port', str(args.api_port),
+                                       '--workers', str(args.api_workers), '--log-level', 'warning'], cwd=ROOT, env=env))
+    if not args.no_job_worker:
+        processes.append(subprocess.Popen([sys.executable, str(Path(__file__).parent / 'stub_youtube.py')], cwd=ROOT, env=env))
+    return processes
+
+
+def stop_processes(processes: list[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get('/api/v1/health/health')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit("the API did not come up, check DATABASE_URL")
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class LoadTest:
+    OPERATIONS = ('create', 'watch', 'summarize', 'chat', 'history')
+
+    def __init__(self, client: httpx.AsyncClient, args, mix: dict[str, float]):
+        self.client = client
+        self.args = args
+        self.kinds = list(mix)
+        self.weights = list(mix.values())
+        self.video_ids = [''.join(random.choices(string.ascii_letters + string.digits, k=11)) for _ in range(args.videos)]
+        self.users: list[int] = []
+        self.workspaces: list[str] = []
+        self.results: list[tuple[str, float, int, float]] = []     # kind, start offset, status (0: no response), seconds
+        self.samples: list[dict] = []
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    async def setup(self):
+        for _ in range(self.args.users):
+            user = (await self.client.post('/api/v1/users/')).json()
+            self.users.append(user['user_id'])
+            await self.create_workspace(user['user_id'])
+
+    async def create_workspace(self, user_id: int) -> str:
+        response = await self.client.post('/api/v1/workspaces/', params={'user_id': user_id, 'name': 'load test'})
+        response.raise_for_status()
+        workspace_id = str(response.json()['workspace_id'])
+        self.workspaces.append(workspace_id)
+        return workspace_id
+
+    def url(self) -> str:
+        # a few videos are much more popular than the rest
+        return f"https://www.youtube.com/watch?v={self.video_ids[min(int(random.expovariate(5 / len(self.video_ids))), len(self.video_ids) - 1)]}"
+
+    async def request(self, kind: str):
+        workspace_id = random.choice(self.workspaces)
+        base = f"/api/v1/workspaces/{workspace_id}"
+        match kind:
+            case 'create':
+                return await self.client.post('/api/v1/workspaces/', params={'user_id': random.choice(self.users), 'name': 'load test'})
+            case 'watch':
+                return await self.client.post(f"{base}/videos/", params={'url': self.url()})
+            case 'summarize':
+                videos = (await self.client.get(f"{base}/videos/")).json()['videos']
+                if not videos:
+                    return await self.client.post(f"{base}/videos/", params={'url': self.url()})
+                return await self.client.post(f"{base}/videos/{random.choice(videos)['video_id']}/summary")
+            case 'chat':
+                roll = random.random()
+                message = random.choice(QUESTIONS)
+                if roll < 0.3:
+                    message = f"watch {self.url()}"
+                elif roll < 0.5:
+                    videos = (await self.client.get(f"{base}/videos/")).json()['videos']
+                    if videos:
+                        message = f"summarize video {random.choice(videos)['video_id']}"
+                return await self.client.post(f"{base}/messages/", params={'message': message})
+            case 'history':
+                return await self.client.get(f"{base}/messages/", params={'limit': 50})
+
+    async def timed_request(self, kind: str):
+        started = time.perf_counter()
+        try:
+            response = await self.request(kind)
+            status = response.status_code
+            if kind == 'create' and status == 200:
+                self.workspaces.append(str(response.json()['workspace_id']))
+        except httpx.HTTPError:
+            status = 0
+        self.results.append((kind, started - self.start, status, time.perf_counter() - started))
+
+    async def sample(self, stop: asyncio.Event):
+        while not stop.is_set():
+            try:
+                pool = (await self.client.get('/api/v1/health/pool')).json()
+                admission = (await self.client.get('/api/v1/health/admission')).json()
+                prompt_cache = (await self.client.get('/api/v1/health/prompt-cache')).json()
+                self.samples.append({'t': round(time.perf_counter() - self.start, 3), 'pool': pool, 'admission': admission,
+                                     'prompt_cache': prompt_cache})
+            except httpx.HTTPError:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        stop = asyncio.Event()
+        self.start = time.perf_counter()
+        sampler = asyncio.create_task(self.sample(stop))
+        tasks = []
+        next_at = 0.0
+        while next_at < self.args.duration:
+            delay = self.start + next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = random.choices(self.kinds, self.weights)[0]
+            tasks.append(asyncio.create_task(self.timed_request(kind)))
+            next_at += random.expovariate(self.args.rps)
+        print(f"sent {len(tasks)} requests, waiting for the answers")
+        await asyncio.gather(*tasks)
+        self.elapsed = time.perf_counter() - self.start
+        stop.set()
+        await sampler
+
+    def report(self) -> dict:
+        kinds = {}
+        for kind in self.kinds + ['all']:
+            results = [r for r in self.results if kind == 'all' or r[0] == kind]
+            if not results:
+                continue
+            ok = [seconds for _, _, status, seconds in results if 200 <= status < 400]
+            kinds[kind] = {
+                'requests': len(results),
+                'throughput_rps': round(len(ok) / self.elapsed, 3),
+                'error_rate': round(1 - len(ok) / len(results), 4),
+                'rejected_429': sum(1 for r in results if r[2] == 429),
+                'statuses': {str(status): sum(1 for r in results if r[2] == status) for status in sorted({r[2] for r in results})},
+                'latency_ms': {name: round(percentile(ok, p) * 1000, 1) for name, p in (('p50', .5), ('p90', .9), ('p99', .99), ('max', 1))},
+                'latency_ms_mean': round(statistics.fmean(ok) * 1000, 1) if ok else 0.0,
+            }
+        return {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'settings': {key: value for key, value in vars(self.args).items() if key != 'report'},
+            'elapsed_seconds': round(self.elapsed, 3),
+            'requests': kinds,
+            'pool': self.pool_report(),
+            'admission': self.samples[-1]['admission'] if self.samples else None,
+            'prompt_cache': self.samples[-1]['prompt_cache'] if self.samples else None,
+            'samples': self.samples,
+        }
+
+    def pool_report(self) -> dict:
+        report = {}
+        capacity = int(os.getenv('DB_POOL_SIZE', 5)) + int(os.getenv('DB_MAX_OVERFLOW', 10))
+        for engine in ('sync', 'async'):
+            stats = [sample['pool'][engine] for sample in self.samples if engine in sample['pool']]
+            if not stats:
+                continue
+            checked_out = [s['checked_out'] for s in stats]
+            report[engine] = {
+                'checked_out_max': max(checked_out),
+                'checked_out_mean': round(statistics.fmean(checked_out), 2),
+                'saturation_max': round(max(checked_out) / capacity, 3),     # 1.0: requests wait for connections
+                'wait_ms_avg': stats[-1].get('wait_ms_avg'),
+                'wait_ms_max': stats[-1].get('wait_ms_max'),
+                'slow_checkouts': stats[-1].get('slow_checkouts'),
+            }
+        return report
+
+
+def print_report(report: dict):
+    print(f"\n{'request':<11}{'count':>7}{'ok rps':>9}{'errors':>8}{'429':>6}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for kind, stats in report['requests'].items():
+        latency = stats['latency_ms']
+        print(f"{kind:<11}{stats['requests']:>7}{stats['throughput_rps']:>9.2f}{stats['error_rate']:>8.1%}{stats['rejected_429']:>6}"
+              f"{latency['p50']:>9.1f}{latency['p90']:>9.1f}{latency['p99']:>9.1f}{latency['max']:>9.1f}")
+    for engine, stats in report['pool'].items():
+        print(f"pool {engine}: up to {stats['checked_out_max']} connections checked out ({stats['saturation_max']:.0%} of the pool), "
+              f"checkout wait avg {stats['wait_ms_avg']} ms, max {stats['wait_ms_max']} ms")
+    if report['admission']:
+        admission = report['admission']
+        print(f"admission: {admission['admitted']} turns admitted, {admission['rejected']} rejected, "
+              f"wait avg {admission['wait_ms_avg']} ms, p95 {admission['wait_ms_p95']} ms")
+    if report['prompt_cache'] and report['prompt_cache']['hit_ratio'] is not None:
+        cache = report['prompt_cache']
+        print(f"prompt cache: {cache['hit_ratio']:.1%} of input tokens read from the cache, {cache['cache_read']:,} read, "
+              f"{cache['cache_write']:,} written, {cache['input']:,} not cached")
+
+
+async def main(args):
+    mix = parse_mix(args.mix)
+    processes = start_processes(args)
+    try:
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", limits=limits, timeout=300) as client:
+            await wait_until_up(client)
+            test = LoadTest(client, args, mix)
+            await test.setup()
+            print(f"{args.users} users, {args.rps} rps for {args.duration} s, mix {args.mix}")
+            await test.run()
+            report = test.report()
+    finally:
+        stop_processes(processes)
+
+    print_report(report)
+    path = Path(args.report) if args.report else REPORTS / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    print(f"\nreport written to {path}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args(sys.argv[1:])))
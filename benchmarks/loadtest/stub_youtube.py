@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+YouTube for the load test: YouTubeService fetches videos from the stub server (stubs.py) at YOUTUBE_STUB_URL
+instead of YouTube.  run.py starts the API and the job worker with it installed, the app itself has no stub path.
+
+Usage:
+    YOUTUBE_STUB_URL=http://127.0.0.1:8100/youtube python -m uvicorn benchmarks.loadtest.stubbed_api:app
+    YOUTUBE_STUB_URL=http://127.0.0.1:8100/youtube python benchmarks/loadtest/stub_youtube.py     # MainWorker.py
+"""
+
+import os
+import runpy
+import sys
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from components.services.youtube_service import YouTubeService, YouTubeVideo, get_video_id
+from infrastructure.metrics import timed, YOUTUBE_SECONDS, YOUTUBE_ERRORS
+
+
+def get_video(self, url) -> YouTubeVideo:
+    """the video served by the stub"""
+    with timed(YOUTUBE_SECONDS, YOUTUBE_ERRORS, 'stub'):
+        response = httpx.get(f"{os.environ['YOUTUBE_STUB_URL']}/videos/{get_video_id(url)}", timeout=60)
+        response.raise_for_status()
+    video = response.json()
+    return YouTubeVideo(url=url, transcript=video["transcript"], title=video["title"], author=video["author"],
+                        publish_date=video["publish_date"], video_duration=video["duration"])
+
+
+def test(self):
+    httpx.get(f"{os.environ['YOUTUBE_STUB_URL']}/health", timeout=10).raise_for_status()
+
+
+def install():
+    """every YouTubeService of the process fetches from the stub"""
+    YouTubeService.get_video = get_video
+    YouTubeService.test = test
+
+
+if __name__ == '__main__':
+    install()
+    sys.argv = ['MainWorker.py'] + sys.argv[1:]
+    runpy.run_path(str(ROOT / 'MainWorker.py'), run_name='__main__')
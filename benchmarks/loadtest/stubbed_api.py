@@ -0,0 +1,6 @@
+"""the API with YouTube stubbed (stub_youtube.py), run.py starts it as uvicorn benchmarks.loadtest.stubbed_api:app"""
+from benchmarks.loadtest.stub_youtube import install
+
+install()
+
+from api.main import app    # noqa: E402
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Stand-ins for YouTube and Anthropic with configurable latency, so a load test measures the API and the database
+instead of the upstream services (and costs no quota or tokens).
+
+    /youtube/videos/{id}        a generated video, fetched by the app started through stub_youtube.py
+    /anthropic/v1/messages      Messages API answers, the app calls it when ANTHROPIC_BASE_URL=<stub>/anthropic
+
+The Anthropic stub plays a plausible conversation: a message with a YouTube url gets a watch_video tool call,
+"summarize video N" a summarize_videos call, a tool result or any other message a text answer.  Requests without
+tools (the summary bot) get a summary.  Latency is base + output tokens / tokens per second, with jitter.
+
+Prompt caching is played too: a prefix ending at a cache_control block is cached for 5 minutes from its last use,
+and usage reports the tokens read from and written to the cache as the API would (tokens are characters / 4).
+
+Usage:
+    python benchmarks/loadtest/stubs.py                     # port 8100
+    python benchmarks/loadtest/stubs.py --port 8100 --anthropic-latency 0.5 --youtube-latency 0.3
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import sys
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+WORDS = ("so the thing about this is that we really want to look at how the model behaves when you give it "
+         "more data and you know it turns out that actually it just keeps getting better which is kind of "
+         "surprising if you think about it right").split()
+
+URL_PATTERN = re.compile(r'https?://(?:www\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[0-9A-Za-z_-]{11}')
+SUMMARIZE_PATTERN = re.compile(r'summar\w* video (\d+)', re.IGNORECASE)
+
+
+class StubSettings:
+    def __init__(self, anthropic_latency: float = 0.5, tokens_per_second: float = 200, youtube_latency: float = 0.3,
+                 transcript_minutes: int = 20, jitter: float = 0.2):
+        self.anthropic_latency = anthropic_latency
+        self.tokens_per_second = tokens_per_second
+        self.youtube_latency = youtube_latency
+        self.transcript_minutes = transcript_minutes
+        self.jitter = jitter
+
+    def delay(self, seconds: float) -> float:
+        return max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+def words(count: int, seed=None) -> str:
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def transcript(video_id: str, minutes: int) -> str:
+    rng = random.Random(video_id)
+    lines = []
+    for second in range(0, minutes * 60, 4):
+        lines.append(f"[{second // 60:02d}:{second % 60:02d}] {words(rng.randint(6, 14), rng.random())}")
+    return '\n'.join(lines)
+
+
+def text_content(content) -> str:
+    if isinstance(content, str):
+        return content
+    return ' '.join(block.get('text', '') for block in content if isinstance(block, dict))
+
+
+def reply(body: dict) -> tuple[list[dict], str, int]:
+    """content blocks, stop reason and output tokens of the answer to a Messages API request"""
+    last = body['messages'][-1]
+    if not body.get('tools'):
+        summary = words(300)
+        return [{'type': 'text', 'text': summary}], 'end_turn', 400
+
+    content = last['content']
+    is_tool_result = isinstance(content, list) and any(isinstance(block, dict) and block.get('type') == 'tool_result' for block in content)
+    if not is_tool_result:
+        text = text_content(content)
+        url = URL_PATTERN.search(text)
+        if url:
+            return [tool_use('watch_video', {'url': url.group(0)})], 'tool_use', 40
+        summarize = SUMMARIZE_PATTERN.search(text)
+        if summarize:
+            return [tool_use('summarize_videos', {'id': int(summarize.group(1))})], 'tool_use', 30
+    answer = words(random.randint(40, 160))
+    return [{'type': 'text', 'text': answer}], 'end_turn', len(answer.split()) * 4 // 3
+
+
+def tool_use(name: str, tool_input: dict) -> dict:
+    return {'type': 'tool_use', 'id': f"toolu_{uuid.uuid4().hex[:24]}", 'name': name, 'input': tool_input}
+
+
+class PromptCache:
+    """prefixes of tools + system that end at a cache_control block, kept TTL seconds from their last use"""
+    TTL = 300
+
+    def __init__(self):
+        self.expires: dict[str, float] = {}
+
+    def usage(self, body: dict) -> tuple[int, int, int]:
+        """input tokens not cached, read from the cache and written to it"""
+        tools = json.dumps(body.get('tools') or [], sort_keys=True)
+        system = body.get('system') or []
+        if isinstance(system, str):
+            system = [{'type': 'text', 'text': system}]
+
+        prefix = hashlib.sha256(tools.encode())
+        tokens = len(tools) // 4
+        breakpoints = []
+        for block in system:
+            prefix.update(block.get('text', '').encode())
+            tokens += len(block.get('text', '')) // 4
+            if block.get('cache_control'):
+                breakpoints.append((prefix.hexdigest(), tokens))
+
+        now = time.monotonic()
+        read = max((prefix_tokens for key, prefix_tokens in breakpoints if self.expires.get(key, 0) > now), default=0)
+        written = max(breakpoints[-1][1] - read, 0) if breakpoints else 0
+        for key, _ in breakpoints:
+            self.expires[key] = now + self.TTL
+        messages = sum(len(text_content(message['content'])) for message in body['messages']) // 4
+        return tokens - read - written + messages, read, written
+
+
+def create_app(settings: StubSettings) -> Starlette:
+    prompt_cache = PromptCache()
+
+    async def youtube_video(request: Request):
+        video_id = request.path_params['video_id']
+        await asyncio.sleep(settings.delay(settings.youtube_latency))
+        return JSONResponse({
+            'video_id': video_id,
+            'title': f"Stub video {video_id}",
+            'author': "Stub Channel",
+            'publish_date': "2024-01-01T00:00:00Z",
+            'duration': settings.transcript_minutes * 60,
+            'transcript': transcript(video_id, settings.transcript_minutes)
+        })
+
+    async def youtube_health(request: Request):
+        return JSONResponse({'status': 'ok'})
+
+    async def messages(request: Request):
+        body = await request.json()
+        if body.get('stream'):
+            return JSONResponse({'type': 'error', 'error': {'type': 'invalid_request_error', 'message': 'the stub does not stream'}}, status_code=400)
+        content, stop_reason, output_tokens = reply(body)
+        await asyncio.sleep(settings.delay(settings.anthropic_latency + output_tokens / settings.tokens_per_second))
+        input_tokens, cache_read, cache_write = prompt_cache.usage(body)
+        return JSONResponse({
+            'id': f"msg_{uuid.uuid4().hex[:24]}",
+            'type': 'message',
+            'role': 'assistant',
+            'model': body['model'],
+            'content': content,
+            'stop_reason': stop_reason,
+            'stop_sequence': None,
+            'usage': {'input_tokens': input_tokens, 'output_tokens': output_tokens,
+                      'cache_creation_input_tokens': cache_write, 'cache_read_input_tokens': cache_read}
+        })
+
+    async def models(request: Request):
+        return JSONResponse({'data': [{'type': 'model', 'id': 'stub', 'display_name': 'stub', 'created_at': '2024-01-01T00:00:00Z'}],
+                             'has_more': False, 'first_id': 'stub', 'last_id': 'stub'})
+
+    return Starlette(routes=[
+        Route('/youtube/videos/{video_id}', youtube_video),
+        Route('/youtube/health', youtube_health),
+        Route('/anthropic/v1/messages', messages, methods=['POST']),
+        Route('/anthropic/v1/models', models),
+    ])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="YouTube and Anthropic stubs for load tests")
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--anthropic-latency', type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument('--tokens-per-second', type=float, default=200)
+    parser.add_argument('--youtube-latency', type=float, default=0.3)
+    parser.add_argument('--transcript-minutes', type=int, default=20)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    settings = StubSettings(args.anthropic_latency, args.tokens_per_second, args.youtube_latency, args.transcript_minutes)
+    uvicorn.run(create_app(settings), host='127.0.0.1', port=args.port, log_level='warning')
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Encoding time and bytes on the wire of the API's JSON responses: jsonable_encoder + json.dumps (FastAPI's default
+path) against the response schemas rendered by orjson, then identity, gzip and brotli sizes of the rendered bodies.
+
+Uses a generated workspace of 50 videos and a page of messages, no database needed.
+
+Usage:
+    python benchmarks/response_encoding.py              # 50 videos, 200 messages
+    python benchmarks/response_encoding.py --messages 500
+"""
+
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.models.schemas import MessageResponse, VideoListResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VIDEOS = 50
+
+WORDS = ("so the thing about this is that we really want to look at how the model behaves when you give it "
+         "more data and you know it turns out that actually it just keeps getting better which is kind of "
+         "surprising if you think about it right").split()
+
+
+def sentence(words):
+    return ' '.join(random.choice(WORDS) for _ in range(words))
+
+
+def generated_videos():
+    return [{"video_id": i, "title": sentence(8), "author": sentence(2), "has_summary": random.random() < 0.6}
+            for i in range(1, VIDEOS + 1)]
+
+
+def generated_messages(count):
+    workspace_id = uuid.uuid4()
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            content = sentence(random.randint(5, 30))
+        else:
+            # assistant turns are lists of content blocks, with tool results that carry summaries
+            content = [{"type": "text", "text": sentence(random.randint(20, 80))},
+                       {"type": "tool_result", "tool_use_id": f"toolu_{i:08d}", "content": sentence(300)}]
+        messages.append({"message_id": i + 1, "workspace_id": workspace_id, "role": "user" if i % 2 == 0 else "assistant",
+                         "content": content, "created_at": datetime(2024, 1, 1, 12, 0, i % 60)})
+    return messages
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def encode_report(name, content, schema):
+    """FastAPI without a response_model: jsonable_encoder then json.dumps.  with one: validate then orjson"""
+    def default():
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def fast():
+        return orjson.dumps(schema.dump_python(schema.validate_python(content), mode='python'))
+
+    default_ms = timed(default)
+    fast_ms = timed(fast)
+    print(f"{name:<10}{default_ms:>16.3f}{fast_ms:>16.3f}{default_ms / fast_ms:>10.1f}x")
+    return fast()
+
+
+def wire_report(name, body):
+    print(f"\n{name}: {len(body):,} bytes")
+    print(f"{'encoding':<12}{'bytes':>12}{'ratio':>9}{'ms':>10}")
+    encodings = [("identity", lambda: body),
+                 ("gzip 6", lambda: gzip(body, 6)),
+                 ("gzip 9", lambda: gzip(body, 9))]
+    if brotli:
+        encodings.append(("br 4", lambda: brotli.compress(body, quality=4)))
+        encodings.append(("br 11", lambda: brotli.compress(body, quality=11)))
+    for encoding, fn in encodings:
+        size = len(fn())
+        print(f"{encoding:<12}{size:>12,}{size / len(body):>9.1%}{timed(fn, 10):>10.3f}")
+    if not brotli:
+        print("(install brotli to include br)")
+
+
+def gzip(body, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+if __name__ == '__main__':
+    count = 200
+    if '--messages' in sys.argv:
+        count = int(sys.argv[sys.argv.index('--messages') + 1])
+
+    videos = {"videos": generated_videos()}
+    messages = generated_messages(count)
+
+    print(f"{'response':<10}{'default ms':>16}{'orjson ms':>16}{'speedup':>11}")
+    videos_body = encode_report("videos", videos, TypeAdapter(VideoListResponse))
+    messages_body = encode_report("messages", messages, TypeAdapter(list[MessageResponse]))
+
+    wire_report(f"videos ({VIDEOS})", videos_body)
+    wire_report(f"messages ({count})", messages_body)
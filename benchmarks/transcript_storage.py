@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Size and read latency of stored transcripts, uncompressed TEXT against the compressed transcript_z column.
+
+Uses the transcripts in the database, or generated ones shaped like YouTube transcripts ([mm:ss] prefixed lines)
+when there are none.  The read benchmark runs against a temporary table and leaves the data alone.
+
+Usage:
+    python benchmarks/transcript_storage.py              # up to 200 transcripts, 20 reads each
+    python benchmarks/transcript_storage.py --reads 50
+"""
+
+import random
+import statistics
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.apply_schema import get_database_url
+from domain.services.transcript_codec import TranscriptCodec, zstandard
+
+SAMPLE_SIZE = 200
+
+WORDS = ("so the thing about this is that we really want to look at how the model behaves when you give it "
+         "more data and you know it turns out that actually it just keeps getting better which is kind of "
+         "surprising if you think about it right").split()
+
+
+def generated_transcript(minutes=20):
+    lines = []
+    for second in range(0, minutes * 60, 4):
+        text = ' '.join(random.choice(WORDS) for _ in range(random.randint(6, 14)))
+        lines.append(f"[{second // 60:02d}:{second % 60:02d}] {text}")
+    return '\n'.join(lines)
+
+
+def load_transcripts(cursor):
+    codec = TranscriptCodec()
+    cursor.execute("SELECT transcript, transcript_z FROM videos LIMIT %s", (SAMPLE_SIZE,))
+    transcripts = [text if z is None else codec.decompress(z) for text, z in cursor.fetchall()]
+    if not transcripts:
+        print("no videos in the database, using generated transcripts")
+        transcripts = [generated_transcript(random.randint(5, 60)) for _ in range(50)]
+    return transcripts
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def size_report(transcripts):
+    raw = sum(len(t.encode('utf-8')) for t in transcripts)
+    print(f"\n{len(transcripts)} transcripts, {raw:,} bytes uncompressed")
+    print(f"{'codec':<8}{'bytes':>14}{'ratio':>9}{'compress ms':>14}{'decompress ms':>16}")
+
+    codecs = ['zlib'] + (['zstd'] if zstandard else [])
+    for name in codecs:
+        codec = TranscriptCodec(name)
+        compressed = [codec.compress(t) for t in transcripts]
+        size = sum(len(c) for c in compressed)
+        compress_ms = timed(lambda: [codec.compress(t) for t in transcripts], 3) / len(transcripts)
+        decompress_ms = timed(lambda: [codec.decompress(c) for c in compressed], 5) / len(transcripts)
+        print(f"{name:<8}{size:>14,}{size / raw:>9.1%}{compress_ms:>14.3f}{decompress_ms:>16.3f}")
+    if not zstandard:
+        print("(install zstandard to include zstd)")
+
+
+def read_report(cursor, transcripts, reads):
+    codec = TranscriptCodec()
+    cursor.execute("CREATE TEMP TABLE transcript_bench (id SERIAL PRIMARY KEY, transcript TEXT, transcript_z BYTEA)")
+    cursor.execute("ALTER TABLE transcript_bench ALTER COLUMN transcript_z SET STORAGE EXTERNAL")
+    for t in transcripts:
+        cursor.execute("INSERT INTO transcript_bench (transcript, transcript_z) VALUES (%s, %s)",
+                       (t, psycopg2.Binary(codec.compress(t))))
+    cursor.execute("ANALYZE transcript_bench")
+
+    cursor.execute("SELECT sum(pg_column_size(transcript)), sum(pg_column_size(transcript_z)) FROM transcript_bench")
+    text_size, z_size = cursor.fetchone()
+    print(f"\nstored size: TEXT (pglz toast) {text_size:,} bytes, transcript_z ({codec.codec}) {z_size:,} bytes")
+
+    ids = list(range(1, len(transcripts) + 1))
+
+    def read_text():
+        for i in ids:
+            cursor.execute("SELECT transcript FROM transcript_bench WHERE id = %s", (i,))
+            cursor.fetchone()
+
+    def read_compressed():
+        for i in ids:
+            cursor.execute("SELECT transcript_z FROM transcript_bench WHERE id = %s", (i,))
+            codec.decompress(cursor.fetchone()[0])
+
+    text_ms = timed(read_text, reads) / len(ids)
+    z_ms = timed(read_compressed, reads) / len(ids)
+    print(f"read latency per transcript: TEXT {text_ms:.3f} ms, transcript_z + decompress {z_ms:.3f} ms")
+
+
+if __name__ == '__main__':
+    reads = 20
+    if '--reads' in sys.argv:
+        reads = int(sys.argv[sys.argv.index('--reads') + 1])
+
+    conn = psycopg2.connect(get_database_url())
+    try:
+        with conn.cursor() as cursor:
+            transcripts = load_transcripts(cursor)
+            size_report(transcripts)
+            read_report(cursor, transcripts, reads)
+        conn.rollback()
+    finally:
+        conn.close()
@@ -1,25 +1,33 @@
+import inspect
 import json
+import time
 from datetime import datetime
-from typing import Any
-from anthropic.types import Message
+from typing import Any, TYPE_CHECKING
+from components.anthropic.anthropic_service import Claude
 from components.anthropic.chat_message import ChatMessage
-from components.anthropic.chat_session import ChatSession
+from components.anthropic.chat_session import ChatSession, AsyncChatSession
 from components.anthropic.chat_tooluse_content import ToolUseContent
 from components.anthropic.content import Content
 from components.anthropic.role import Role
+from components.services.async_web_chat_application import AsyncWebChatApplication
 from components.services.web_chat_appllcation import WebChatApplication
 from domain.models.agent_event import AgentEvent
 from domain.models.agent_result import AgentResult
-from components.tool_executor import ToolExecutor
+from domain.models.agent_span import AgentSpan
+from components.tool_executor import ToolExecutor, AsyncToolExecutor
+from components.tool_result_cache import ToolResultCache
 from components.tools import TOOLS
-from domain.repositories.video_repository import VideoRepository
+from domain.repositories.video_repository import VideoRepository, AsyncVideoRepository
 from logger_config import getLogger
 
+if TYPE_CHECKING:
+    from anthropic.types import Message
+
 class ChatAgent:
     def __init__(self, context: list[Content] = [], messages: list[ChatMessage]=[], tools:Any =TOOLS, on_event=None, workspace_id:int= 0, video_repository: VideoRepository=None):
 
         self.on_event = on_event
-        self.tools = ToolExecutor(WebChatApplication(on_event=on_event, video_repository=video_repository, workspace_id=workspace_id))
+        self.tools = self.create_tools(on_event, video_repository, workspace_id)
         self.logger = getLogger(__name__)
         self.prompt = """
             # Role
@@ -49,10 +57,30 @@ class ChatAgent:
             
              
         """
-        self.session = ChatSession(self.prompt, tools=tools, context=context, messages=messages)
+        self.session = self.create_session(tools, context, messages)
         self.logger.debug("CHAT AGENT CREATED")
 
-    def print_response(self, response:Message):
+    def create_tools(self, on_event, video_repository: VideoRepository, workspace_id) -> ToolExecutor:
+        # read-only tool results are cached per workspace, only when they come from the database
+        cache = ToolResultCache.for_workspace(workspace_id) if video_repository else None
+        return ToolExecutor(WebChatApplication(on_event=on_event, video_repository=video_repository, workspace_id=workspace_id), cache)
+
+    def create_session(self, tools: Any, context: list[Content], messages: list[ChatMessage]) -> ChatSession:
+        return ChatSession(self.prompt, tools=tools, context=context, messages=messages)
+
+    def rebind(self, on_event, video_repository: VideoRepository):
+        """attaches a cached agent to the event handler and database session of the current request"""
+        self.on_event = on_event
+        self.tools.app.on_event = on_event
+        self.tools.app.video_repostory = video_repository
+
+    def estimated_size(self) -> int:
+        """rough number of bytes held by the conversation, used to bound the agent cache"""
+        system = sum(len(block.get('text', '')) for block in self.session.system)
+        messages = sum(len(str(message['content'])) for message in self.session.messages)
+        return system + messages
+
+    def print_response(self, response:'Message'):
         self.logger.debug(f"\tResponse")
         self.logger.debug(f"\t\tstop reason: {response.stop_reason}")
         self.logger.debug(f"\t\ttype: {response.type}")
@@ -65,15 +93,61 @@ class ChatAgent:
             self.logger.debug(f"\t\t\t{item.to_dict()}")
 
 
+    def send(self, message: ChatMessage, spans: list[AgentSpan]) -> 'Message':
+        """send a message to the LLM and record the round trip as a span"""
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        response = self.session.send(message)
+        self.emit_span(spans, self.llm_span(started_at, start, response))
+        return response
+
+    def execute_tool(self, toolname: str, input: dict[str, Any], spans: list[AgentSpan]) -> str:
+        """execute a tool and record the execution as a span"""
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        result = self.tools.execute_tool(toolname, input)
+        self.emit_span(spans, self.tool_span(started_at, start, toolname, result))
+        return result
+
+    def llm_span(self, started_at: str, start: float, response: 'Message') -> AgentSpan:
+        latency_ms = (time.perf_counter() - start) * 1000
+        model = self.session.claude.model
+        usage = response.usage
+        ratio = Claude.cache_hit_ratio(usage)
+        if ratio is not None:
+            self.logger.debug(f"prompt cache hit ratio {ratio:.2f}")
+        return AgentSpan('llm', model, started_at, latency_ms,
+                         input_tokens=usage.input_tokens,
+                         output_tokens=usage.output_tokens,
+                         cache_creation_input_tokens=usage.cache_creation_input_tokens,
+                         cache_read_input_tokens=usage.cache_read_input_tokens,
+                         cost_usd=Claude.cost(model, usage),
+                         stop_reason=response.stop_reason)
+
+    @staticmethod
+    def tool_span(started_at: str, start: float, toolname: str, result: str) -> AgentSpan:
+        latency_ms = (time.perf_counter() - start) * 1000
+        return AgentSpan('tool', toolname, started_at, latency_ms, result_size=len(str(result)))
+
+    def emit_span(self, spans: list[AgentSpan], span: AgentSpan):
+        self.logger.debug(f"span {span.type} {span.name}: {span.latency_ms:.0f} ms")
+        spans.append(span)
+        if self.on_event:
+            self.on_event(AgentEvent('span', span.started_at, span.to_dict()))
+
+    @staticmethod
+    def response_event(response: 'Message') -> AgentEvent:
+        return AgentEvent(AgentEvent.to_agent_event_type(response.stop_reason), datetime.now().isoformat(), AgentEvent.response_to_dict(response))
+
     def chat(self, user_message:str) -> AgentResult:
         self.logger.info(f"chat({user_message})")
+        spans: list[AgentSpan] = []
         chatMessage = ChatMessage(Role.USER, user_message)
-        response = self.session.send(chatMessage)
+        response = self.send(chatMessage, spans)
         self.print_response(response)
 
         if self.on_event:
-            ae = AgentEvent(AgentEvent.to_agent_event_type(response.stop_reason), datetime.now().isoformat(), AgentEvent.response_to_dict(response))
-            self.on_event(ae)
+            self.on_event(self.response_event(response))
 
         while True:
             if response.stop_reason != 'tool_use': break
@@ -83,14 +157,17 @@ class ChatAgent:
                 toolname = toolblock.name
                 input = toolblock.input
                 tooluse_id = toolblock.id
-                tooluse_result = self.tools.execute_tool(toolname, input)
+                tooluse_result = self.execute_tool(toolname, input, spans)
                 self.logger.debug(f"\tTool Use Result: {tooluse_result}")
                 tooluse_content = ToolUseContent(tooluse_id, tooluse_result)
-                response = self.session.send(ChatMessage(Role.USER, tooluse_content.to_dict()))
+                response = self.send(ChatMessage(Role.USER, tooluse_content.to_dict()), spans)
                 self.print_response(response)
 
                 # ae = AgentEvent('tool_result', datetime.now() ,event_detail)
                 # if self.on_event: self.on_event(ae)
+        return self.result(response, spans)
+
+    def result(self, response: 'Message', spans: list[AgentSpan]) -> AgentResult:
         exit_message = json.dumps(response.model_dump())
         if response.content is None:
             self.logger.debug("response.content is None")
@@ -105,9 +182,81 @@ class ChatAgent:
         self.logger.debug(f"tool exit message: {exit_message}")
 
         # Return AgentResult with all messages and final response
-        return AgentResult(
+        result = AgentResult(
             all_messages=self.session.messages,
-            final_response=exit_message
+            final_response=exit_message,
+            spans=spans
         )
+        self.logger.info(f"turn took {result.latency_ms:.0f} ms in {len(spans)} spans, cost ${result.cost_usd:.4f}")
+        if self.tools.cache:
+            self.logger.info(f"tool cache: {self.tools.cache.stats()}")
+        return result
+
     def is_healthy(self) -> bool:
-        return self.session.is_healthy()
\ No newline at end of file
+        return self.session.is_healthy()
+
+
+class AsyncChatAgent(ChatAgent):
+    """
+    ChatAgent for the async send path.  LLM requests, tools and events are awaited so a single worker can run
+    many turns concurrently.  on_event may be a plain function or a coroutine function.
+
+    With stream_text the responses are streamed and their text is emitted as text_delta events as it is generated.
+    """
+    stream_text = False
+
+    def create_tools(self, on_event, video_repository: AsyncVideoRepository, workspace_id) -> AsyncToolExecutor:
+        cache = ToolResultCache.for_workspace(workspace_id) if video_repository else None
+        return AsyncToolExecutor(AsyncWebChatApplication(on_event=on_event, video_repository=video_repository, workspace_id=workspace_id), cache)
+
+    def create_session(self, tools: Any, context: list[Content], messages: list[ChatMessage]) -> AsyncChatSession:
+        return AsyncChatSession(self.prompt, tools=tools, context=context, messages=messages)
+
+    async def emit(self, event: AgentEvent):
+        if self.on_event:
+            result = self.on_event(event)
+            if inspect.isawaitable(result):
+                await result
+
+    async def send(self, message: ChatMessage, spans: list[AgentSpan]) -> 'Message':
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        response = await self.session.send(message, self.emit_text if self.stream_text else None)
+        await self.emit_span(spans, self.llm_span(started_at, start, response))
+        return response
+
+    async def emit_text(self, text: str):
+        await self.emit(AgentEvent('text_delta', datetime.now().isoformat(), { 'text': text }))
+
+    async def execute_tool(self, toolname: str, input: dict[str, Any], spans: list[AgentSpan]) -> str:
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        result = await self.tools.execute_tool(toolname, input)
+        await self.emit_span(spans, self.tool_span(started_at, start, toolname, result))
+        return result
+
+    async def emit_span(self, spans: list[AgentSpan], span: AgentSpan):
+        self.logger.debug(f"span {span.type} {span.name}: {span.latency_ms:.0f} ms")
+        spans.append(span)
+        await self.emit(AgentEvent('span', span.started_at, span.to_dict()))
+
+    async def chat(self, user_message:str) -> AgentResult:
+        self.logger.info(f"chat({user_message})")
+        spans: list[AgentSpan] = []
+        response = await self.send(ChatMessage(Role.USER, user_message), spans)
+        self.print_response(response)
+        await self.emit(self.response_event(response))
+
+        while response.stop_reason == 'tool_use':
+            self.logger.debug("Tool Use ->")
+            toolblock=next((item for item in response.content if item.type =='tool_use'),None)
+            tooluse_result = await self.execute_tool(toolblock.name, toolblock.input, spans)
+            self.logger.debug(f"\tTool Use Result: {tooluse_result}")
+            tooluse_content = ToolUseContent(toolblock.id, tooluse_result)
+            response = await self.send(ChatMessage(Role.USER, tooluse_content.to_dict()), spans)
+            self.print_response(response)
+
+        return self.result(response, spans)
+
+    async def is_healthy(self) -> bool:
+        return await self.session.is_healthy()
@@ -1,13 +1,17 @@
 import json
 import os
-from typing import Any
-import anthropic
-from anthropic import Anthropic, Stream
-from anthropic.types import RawMessageStreamEvent, Message
+from itertools import accumulate
+from typing import Any, TYPE_CHECKING
 
 from components.anthropic.content import Content
+from infrastructure.metrics import timed, count_tokens, ANTHROPIC_SECONDS, ANTHROPIC_ERRORS
 from logger_config import getLogger
 
+# the anthropic package takes a noticeable part of the API's start up, it is imported when the first client is made
+if TYPE_CHECKING:
+    from anthropic import Anthropic, AsyncAnthropic
+    from anthropic.types import Message, Usage
+
 class Claude:
 
     MODEL_OPUS_4_1 ="claude-opus-4-1-20250805"      # $15   / MTOK
@@ -15,7 +19,19 @@ class Claude:
     MODEL_HAIKU = "claude-3-5-haiku-20241022"       # $0.80 / MTOK
 
     MODEL_DEFAULT = MODEL_HAIKU
-    CACHE_MAX = 4
+    CACHE_MAX = 4                   # cache_control breakpoints per request, the API's limit
+    CACHE_MIN_TOKENS = 2048         # shorter prefixes are not cached (Haiku, 1024 for Sonnet and Opus)
+    # system prompt budget, the rest of the 200k window is left to the conversation, tools and the response
+    CONTEXT_TOKENS = int(os.getenv('CLAUDE_CONTEXT_TOKENS', 120_000))
+    CHARS_PER_TOKEN = 4             # estimate, close enough for English transcripts
+    NOTE, SUMMARY, FULL = 0, 1, 2   # the forms content takes in the system prompt, see create_system_prompt
+
+    # USD / MTOK (input, output). cache writes cost 1.25x input, cache reads 0.1x input
+    PRICING = {
+        MODEL_OPUS_4_1: (15.00, 75.00),
+        MODEL_SONNET_4_5: (3.00, 15.00),
+        MODEL_HAIKU: (0.80, 4.00),
+    }
     def __init__(self, model: str = MODEL_DEFAULT, max_tokens:int=8192, creativity:float = 0):
         """
         Constructor
@@ -40,24 +56,36 @@ class Claude:
         self.model:str = model
         self.max_tokens: int = max_tokens
         self.temperature: float = creativity
-        anthropic_key = os.getenv('ANTHROPIC_API_KEY')
-        self.client: Anthropic = anthropic.Anthropic(api_key=anthropic_key)
+        self._client: 'Anthropic | None' = None
         self.system_prompt: list[dict[str,Any]] | None = None
 
+    @property
+    def client(self) -> 'Anthropic':
+        """created on first use, agents are built for every turn and many never call the API themselves"""
+        if self._client is None:
+            self._client = self.create_client(os.getenv('ANTHROPIC_API_KEY'))
+        return self._client
+
+    def create_client(self, api_key: str) -> 'Anthropic':
+        import anthropic
+        return anthropic.Anthropic(api_key=api_key)
+
     def query(self, system:str, message:str, tools = None) -> str:
 
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            system=system,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"{message}"
-                }
-            ]
-        )
+        with timed(ANTHROPIC_SECONDS, ANTHROPIC_ERRORS, self.model, 'create'):
+            response = self.client.messages.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=system,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"{message}"
+                    }
+                ]
+            )
+        count_tokens(self.model, response.usage)
 
         return response.content[0].text
 
@@ -66,19 +94,34 @@ class Claude:
         response = self.query_adv(system, message, tools)
         return response.content[0].text
 
-    def query_adv(self, system: list[dict[str,Any]], message:list[dict[str,str]], tools: Any| None) -> Message:
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            system=system,
-            messages=message,
-            tools=tools
-        )
+    def query_adv(self, system: list[dict[str,Any]], message:list[dict[str,str]], tools: Any| None) -> 'Message':
+        with timed(ANTHROPIC_SECONDS, ANTHROPIC_ERRORS, self.model, 'create'):
+            response = self.client.messages.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=system,
+                messages=message,
+                tools=tools
+            )
+        count_tokens(self.model, response.usage)
 
         return response
 
+    @staticmethod
+    def cost(model: str, usage: 'Usage') -> float | None:
+        """USD cost of a response, None if the model price is unknown"""
+        if model not in Claude.PRICING: return None
+        price_input, price_output = Claude.PRICING[model]
+        cache_write = usage.cache_creation_input_tokens or 0
+        cache_read = usage.cache_read_input_tokens or 0
+        return (usage.input_tokens * price_input
+                + cache_write * price_input * 1.25
+                + cache_read * price_input * 0.1
+                + usage.output_tokens * price_output) / 1_000_000
+
     def is_healthy(self):
+        import anthropic
         try:
             self.client.models.list()
             self.logging.info("Claude OK")
@@ -87,29 +130,170 @@ class Claude:
             self.logging.error("Claude Error: %s",e)
             return False
 
-    def create_system_prompt(prompt:str, contentlist: list[Content]) -> list[dict[str, Any]]:
+    @staticmethod
+    def cache_hit_ratio(usage: 'Usage') -> float | None:
+        """share of a request's input tokens read from the prompt cache"""
+        cache_read = usage.cache_read_input_tokens or 0
+        total = usage.input_tokens + cache_read + (usage.cache_creation_input_tokens or 0)
+        return cache_read / total if total else None
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // Claude.CHARS_PER_TOKEN + 1
+
+    @staticmethod
+    def create_system_prompt(prompt:str, contentlist: list[Content], budget: int | None = None) -> list[dict[str, Any]]:
+        """
+        The prompt, then one block per content in the order given.  Callers pass the contents oldest first, so the
+        blocks of a conversation only grow at the end and the cached prefix stays valid as content is added.
+
+        Every content gets a block within the token budget (CONTEXT_TOKENS): its full text where it fits, else its
+        summary, else a note that names it so the model can read it with a tool.  Each content is first given its
+        note, then its summary in order while they fit, then its full text in order while it fits.
+        """
+        budget = Claude.CONTEXT_TOKENS if budget is None else budget
         system_blocks = []
         if len(prompt) > 0:
             system_blocks.append({
                 "type":"text",
                 "text": prompt
-                # no caching, prompts are too small and there is no benefit
+                # cached with the content, too small to be worth a breakpoint of its own
             })
+            budget -= Claude.estimate_tokens(prompt)
 
-        for content in contentlist[:Claude.CACHE_MAX]:
-            block = {
+        forms = [Claude.content_forms(content) for content in contentlist]
+        chosen = [Claude.NOTE] * len(forms)
+        remaining = budget - sum(Claude.estimate_tokens(content_forms[Claude.NOTE]) for content_forms in forms)
+        for target in (Claude.SUMMARY, Claude.FULL):
+            for i, content_forms in enumerate(forms):
+                if content_forms[target] is None or chosen[i] >= target:
+                    continue
+                extra = Claude.estimate_tokens(content_forms[target]) - Claude.estimate_tokens(content_forms[chosen[i]])
+                if extra <= remaining:
+                    chosen[i] = target
+                    remaining -= extra
+
+        for content_forms, form in zip(forms, chosen):
+            system_blocks.append({
                 "type":"text",
-                "text":f"""
+                "text": content_forms[form]
+            })
+
+        full = [len(system_blocks) - len(forms) + i for i, form in enumerate(chosen) if form == Claude.FULL]
+        Claude.place_cache_breakpoints(system_blocks, full[-1] if full else None)
+        return system_blocks
+
+    @staticmethod
+    def content_forms(content: Content) -> list[str | None]:
+        """the texts a content can take in the context, by NOTE, SUMMARY (None if it has none) and FULL"""
+        def block(body: str) -> str:
+            return f"""
                     creation date: {content.creation_date}
                     source:{content.source}
                     author:{content.author}
                     title:{content.title}
-                    content:{content.content}
-                """,
-                # using caching because the content is expected to be large, cache is 5 mins.
-               "cache_control":{"type": "ephemeral"}
+                    content:{body}
+                """
+        return [
+            block("left out to fit the context, use the list_videos and get_transcript tools to read it"),
+            block(f"summary, the transcript is left out to fit the context:\n{content.summary}") if content.summary else None,
+            block(content.content)
+        ]
 
-            }
-            system_blocks.append(block)
+    @staticmethod
+    def place_cache_breakpoints(system_blocks: list[dict[str, Any]], last_full: int | None):
+        """
+        Marks up to CACHE_MAX blocks with cache_control.  A request reads the longest cached prefix that ends at one
+        of its breakpoints, so they go where the prefix is most likely to be unchanged next time:
+            the last block          the whole context, the next turn of the conversation reads it all
+            the last full text      still valid when notes and summaries at the end change
+            the rest, spread evenly over the full texts by tokens, so when adding content pushes the last full text
+            out of the budget most of the prefix is still read from the cache
+        Prefixes shorter than CACHE_MIN_TOKENS can not be cached and get no breakpoint.
+        """
+        if not system_blocks:
+            return
+        ends = list(accumulate(Claude.estimate_tokens(block["text"]) for block in system_blocks))
+        last = len(system_blocks) - 1
+        section_end = last if last_full is None else last_full
+        breakpoints = {last, section_end}
+        spare = Claude.CACHE_MAX - len(breakpoints)
+        for k in range(1, spare + 1):
+            target = ends[section_end] * k / (spare + 1)
+            breakpoints.add(next(i for i, end in enumerate(ends) if end >= target))
 
-        return system_blocks
+        for i in sorted(breakpoints)[-Claude.CACHE_MAX:]:
+            if ends[i] >= Claude.CACHE_MIN_TOKENS:
+                # cache is 5 mins, refreshed by every read
+                system_blocks[i]["cache_control"] = {"type": "ephemeral"}
+
+
+class AsyncClaude(Claude):
+    """Claude on the AsyncAnthropic client, requests are awaited instead of blocking a thread"""
+
+    def create_client(self, api_key: str) -> 'AsyncAnthropic':
+        import anthropic
+        return anthropic.AsyncAnthropic(api_key=api_key)
+
+    async def query(self, system:str, message:str, tools = None) -> str:
+        with timed(ANTHROPIC_SECONDS, ANTHROPIC_ERRORS, self.model, 'create'):
+            response = await self.client.messages.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=system,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"{message}"
+                    }
+                ]
+            )
+        count_tokens(self.model, response.usage)
+
+        return response.content[0].text
+
+    async def query_basic(self, system: list[dict[str,Any]], message:list[dict[str,Any]], tools: Any| None) -> str:
+        response = await self.query_adv(system, message, tools)
+        return response.content[0].text
+
+    async def query_adv(self, system: list[dict[str,Any]], message:list[dict[str,str]], tools: Any| None) -> 'Message':
+        with timed(ANTHROPIC_SECONDS, ANTHROPIC_ERRORS, self.model, 'create'):
+            response = await self.client.messages.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=system,
+                messages=message,
+                tools=tools
+            )
+        count_tokens(self.model, response.usage)
+
+        return response
+
+    async def query_stream(self, system: list[dict[str,Any]], message:list[dict[str,str]], tools: Any| None, on_text) -> 'Message':
+        """query_adv streamed: on_text is awaited with each text delta as it arrives, the complete message is returned"""
+        with timed(ANTHROPIC_SECONDS, ANTHROPIC_ERRORS, self.model, 'stream'):
+            async with self.client.messages.stream(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                system=system,
+                messages=message,
+                tools=tools
+            ) as stream:
+                async for text in stream.text_stream:
+                    await on_text(text)
+                response = await stream.get_final_message()
+        count_tokens(self.model, response.usage)
+        return response
+
+    async def is_healthy(self):
+        import anthropic
+        try:
+            await self.client.models.list()
+            self.logging.info("Claude OK")
+            return True
+        except anthropic.AnthropicError as e:
+            self.logging.error("Claude Error: %s",e)
+            return False
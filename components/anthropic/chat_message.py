@@ -1,7 +1,10 @@
-from anthropic.types import Message
+from typing import TYPE_CHECKING
 
 from components.anthropic.role import Role
 
+if TYPE_CHECKING:
+    from anthropic.types import Message
+
 class ChatMessage:
     def __init__(self, role: Role, content:str):
         self.role:Role = role
@@ -13,7 +16,7 @@ class ChatMessage:
             "content": self.content
         }
 
-    def response_to_dict(self, response: Message):
+    def response_to_dict(self, response: 'Message'):
         retval = dict()
         retval["role"] = response.role
         retval["content"] = [c.model_dump() for c in response.content]
@@ -1,20 +1,21 @@
-from typing import Any
+from typing import Any, TYPE_CHECKING
 
-from anthropic import Stream
-from anthropic.types import Message, RawMessageStreamEvent, ToolUseBlock
-
-from components.anthropic.anthropic_service import Claude
+from components.anthropic.anthropic_service import Claude, AsyncClaude
 from components.anthropic.chat_message import ChatMessage
 from components.anthropic.content import Content
 from components.anthropic.role import Role
 
+if TYPE_CHECKING:
+    from anthropic import Stream
+    from anthropic.types import Message, RawMessageStreamEvent
+
 """
     Claude chat session.  It collects resources such as the prompt and content, as well as tools, and the message history. 
     The prompt and content can be used as the system prompt and can be collected and cached together.
 """
 class ChatSession:
     def __init__(self, prompt: str, tools:Any =[], context: list[Content] = [], messages: list[ChatMessage]=[]):
-        self.claude:Claude = Claude()
+        self.claude:Claude = self.create_claude()
         self.prompt: str = prompt
         self.context: list[Content] | [] = context
         self.system:  list[dict[str, Any]] = self.update_context(context)
@@ -26,17 +27,35 @@ class ChatSession:
         self.messages: list[dict[str,str]] = messages_primitives
         self.tools: Any = tools
 
+    def create_claude(self) -> Claude:
+        return Claude()
+
     def update_context(self, context:list[Content]):
         self.system  = Claude.create_system_prompt(self.prompt, context)
         return self.system
 
-    def response_to_dict(self, response: Message):
+    def add_context(self, context: list[Content]):
+        """adds content to the system prompt of a live session"""
+        self.context = self.context + context
+        self.update_context(self.context)
+
+    def refresh_context(self, context: list[Content]):
+        """replaces the contents with the same source (a video whose summary changed) and adds the new ones"""
+        updated = {content.source: content for content in context}
+        self.context = [updated.pop(content.source, content) for content in self.context] + list(updated.values())
+        self.update_context(self.context)
+
+    def add_messages(self, messages: list[ChatMessage]):
+        """appends messages written to the history elsewhere, e.g. by another worker"""
+        self.messages.extend(message.to_dict() for message in messages)
+
+    def response_to_dict(self, response: 'Message'):
         retval = dict()
         retval["role"] = response.role
         retval["content"] = [c.model_dump() for c in response.content]
         return retval
 
-    def send(self, message :ChatMessage) -> Message | Stream[RawMessageStreamEvent]:
+    def send(self, message :ChatMessage) -> 'Message | Stream[RawMessageStreamEvent]':
         self.messages.append(message.to_dict())
 
         rawresponse = self.claude.query_adv(self.system, self.messages,tools = self.tools)
@@ -47,4 +66,26 @@ class ChatSession:
 
 
     def is_healthy(self):
-        return self.claude.is_healthy()
\ No newline at end of file
+        return self.claude.is_healthy()
+
+
+class AsyncChatSession(ChatSession):
+    """ChatSession on the AsyncAnthropic client"""
+
+    def create_claude(self) -> AsyncClaude:
+        return AsyncClaude()
+
+    async def send(self, message :ChatMessage, on_text = None) -> 'Message':
+        """on_text, when given, is awaited with the text of the response as it is generated"""
+        self.messages.append(message.to_dict())
+
+        if on_text is None:
+            rawresponse = await self.claude.query_adv(self.system, self.messages,tools = self.tools)
+        else:
+            rawresponse = await self.claude.query_stream(self.system, self.messages, self.tools, on_text)
+        self.messages.append(self.response_to_dict(rawresponse))
+
+        return rawresponse
+
+    async def is_healthy(self):
+        return await self.claude.is_healthy()
@@ -10,3 +10,4 @@ class Content(Protocol):
     author: str
     content: str
     creation_date: datetime
+    summary: str | None         # stands in for content that does not fit the context, None if there is none
@@ -0,0 +1,108 @@
+import asyncio
+import inspect
+import json
+from datetime import datetime
+from typing import Callable
+
+from components.services.summary_prefetcher import SummaryPrefetcher
+from components.services.video_fetcher import VideoFetcher
+from components.services.web_chat_appllcation import WebChatApplication
+from components.services.youtube_summary_bot import AsyncYouTubeSummaryBot
+from components.services.youtube_service import YouTubeService
+from domain.models.agent_event import AgentEvent
+from domain.repositories.video_repository import AsyncVideoRepository, GetVideoArgsUrl, GetVideoArgsWorkspaceVideoId
+from logger_config import getLogger
+
+
+class AsyncWebChatApplication(WebChatApplication):
+    """
+    WebChatApplication for the async send path.  Database calls and Claude requests are awaited, the YouTube client
+    is blocking so it runs on a worker thread.  on_event may be a plain function or a coroutine function.
+    """
+
+    def __init__(self, on_event: Callable=None, video_repository: AsyncVideoRepository = None, workspace_id:str=None):
+        self.youtube: YouTubeService = YouTubeService()
+        self.summary_bot = AsyncYouTubeSummaryBot()
+        self.on_event = on_event
+        self.video_repostory = video_repository
+        self.workspace_id = workspace_id
+        self.summary_prefetcher = SummaryPrefetcher.shared()
+        self.logger = getLogger(__name__)
+
+    async def emit(self, event: AgentEvent):
+        if self.on_event:
+            result = self.on_event(event)
+            if inspect.isawaitable(result):
+                await result
+
+    async def watch_video(self, url) -> str:
+        """returns a id, title of video, author"""
+
+        getVideoArgs = GetVideoArgsUrl(url)
+        record = await self.video_repostory.get_video(getVideoArgs)
+        if record is None:
+            # YouTube bans users who make too many API Calls.  Only call Youtube when necessary!
+            # concurrent watchers of the same video, on any node, share one fetch
+            record = await VideoFetcher.shared().fetch_async(url, lambda: self.video_record(self.youtube.get_video(url)))
+
+        db_id = await self.video_repostory.save_video(self.workspace_id, record)
+        reused = await self.reuse_summary(db_id)
+        if reused is None:
+            self.prefetch_summary(db_id, record["transcript"])
+
+        await self.emit(AgentEvent('video_watched', datetime.now().isoformat(), record))
+
+        return self.watched_message(record, db_id, reused)
+
+    async def reuse_summary(self, video_id: int) -> int | None:
+        """see WebChatApplication.reuse_summary"""
+        video = await self.video_repostory.get_video(GetVideoArgsWorkspaceVideoId(self.workspace_id, video_id))
+        if video["summary"] is not None:
+            return video_id
+
+        duplicates = await self.video_repostory.find_near_duplicates(video_id)
+        candidates = [video_id] + [duplicate["video_id"] for duplicate in duplicates]
+        for candidate in candidates:
+            summary = await self.video_repostory.get_reusable_summary(candidate)
+            if summary is not None:
+                self.logger.info(f"reusing summary of video {candidate} for video {video_id}")
+                await self.video_repostory.save_summary(self.workspace_id, video_id, summary)
+                return candidate
+        return None
+
+    async def list_videos(self) -> str:
+        """returns a json with id, title of video, and author"""
+
+        videos = await self.video_repostory.list_videos(self.workspace_id)
+        if len(videos) == 0:
+            return "no videos have been watched"
+        return json.dumps(videos, separators=(',', ':'))     # compact, the listing is read by the model
+
+    async def get_transcript(self, id:int) -> str:
+        """returns the complete transcript of a video"""
+
+        getVideoArgs = GetVideoArgsWorkspaceVideoId(self.workspace_id, id)
+        video = await self.video_repostory.get_video(getVideoArgs)
+        return video["transcript"]
+
+    async def get_summary(self, id:int) -> str:
+        """returns a summary of the video"""
+
+        getVideoArgs = GetVideoArgsWorkspaceVideoId(self.workspace_id, id)
+        video = await self.video_repostory.get_video(getVideoArgs)
+        if video["summary"] is not None:
+            return video["summary"]
+
+        prefetch = self.summary_prefetcher.get(int(id)) if self.summary_prefetcher else None
+        summary = None
+        if prefetch is not None:
+            # join the background summarization instead of starting over.  shielded, a timeout here must not cancel
+            # the prefetch other workspaces may be waiting on
+            try:
+                summary = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(prefetch)), SummaryPrefetcher.JOIN_SECONDS)
+            except Exception as e:
+                self.logger.warning(f"prefetched summary of video {id} failed, summarizing again: {e!r}")
+        if summary is None:
+            summary = await self.summary_bot.summarize_transcript(video["transcript"])
+        await self.emit(AgentEvent('video_summarized', datetime.now().isoformat(), { 'summary': summary, 'video_id': video["video_id"] } ))
+        return summary
@@ -0,0 +1,141 @@
+import os
+import socket
+import threading
+import traceback
+
+from components.services.video_fetcher import VideoFetcher
+from components.services.web_chat_appllcation import WebChatApplication
+from components.services.youtube_service import YouTubeService
+from components.services.youtube_summary_bot import YouTubeSummaryBot
+from domain.repositories.job_repository import JobRepository
+from domain.repositories.video_repository import VideoRepository, GetVideoArgsUrl, GetVideoArgsWorkspaceVideoId
+from infrastructure.orm_database import SessionLocal
+from logger_config import getLogger
+
+logger = getLogger(__name__)
+
+
+class JobWorker:
+    """
+    Runs the jobs of the jobs table (JobRepository) outside of the HTTP request path.  Each worker thread claims one
+    job at a time, runs it with its own session and records the result, a failure is retried by the queue.
+    Run as many worker processes, on as many nodes, as the load needs: python MainWorker.py
+
+    watch       fetches a video from YouTube, stores it in the workspace and queues its summary
+    summarize   summarizes a video of a workspace and saves the summary
+    insights    insights across the summaries of a workspace, returned as the job result
+    """
+    THREADS = int(os.getenv('JOB_WORKER_THREADS', 2))
+    POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 1))
+    LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 900))    # a job running longer is assumed lost and handed out again
+
+    def __init__(self, threads: int = THREADS, kinds: list[str] = None):
+        self.threads = threads
+        self.kinds = kinds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.youtube = YouTubeService()
+        self.summary_bot = YouTubeSummaryBot()
+        self.handlers = {
+            JobRepository.WATCH: self.watch,
+            JobRepository.SUMMARIZE: self.summarize,
+            JobRepository.INSIGHTS: self.insights
+        }
+
+    def run(self):
+        """runs until stop() is called"""
+        logger.info(f"job worker {self.worker_id} started with {self.threads} threads")
+        workers = [threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True) for i in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        while not self.stopping.wait(self.LEASE_SECONDS / 10):
+            self._requeue_stale()
+        for worker in workers:
+            worker.join()       # the jobs in progress are finished, not abandoned
+        logger.info(f"job worker {self.worker_id} stopped")
+
+    def stop(self):
+        self.stopping.set()
+
+    def run_once(self) -> bool:
+        """claims and runs one job, False when no job is due"""
+        session = SessionLocal()
+        try:
+            jobs = JobRepository(session)
+            job = jobs.claim(self.worker_id, self.kinds)
+            if job is None:
+                return False
+
+            logger.info(f"running job {job['job_id']} {job['kind']}, attempt {job['attempts']}")
+            try:
+                result = self.handlers[job['kind']](session, job)
+            except Exception as e:
+                logger.error(f"job {job['job_id']} {job['kind']} failed: {e}")
+                session.rollback()
+                jobs.fail(job['job_id'], self.worker_id, ''.join(traceback.format_exception_only(e)).strip())
+                return True
+
+            if not jobs.complete(job['job_id'], self.worker_id, result):
+                logger.warning(f"job {job['job_id']} finished after its lease ran out, result discarded")
+            return True
+        finally:
+            session.close()
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            try:
+                if not self.run_once():
+                    self.stopping.wait(self.POLL_SECONDS)
+            except Exception as e:
+                # the database is unreachable, back off and poll again
+                logger.error(f"job worker error: {e}")
+                self.stopping.wait(self.POLL_SECONDS * 10)
+
+    def _requeue_stale(self):
+        session = SessionLocal()
+        try:
+            requeued = JobRepository(session).requeue_stale(self.LEASE_SECONDS)
+            if requeued:
+                logger.warning(f"{requeued} jobs of lost workers handed out again")
+        except Exception as e:
+            logger.error(f"could not requeue stale jobs: {e}")
+        finally:
+            session.close()
+
+    # handlers: run the job, return its result
+
+    def watch(self, session, job: dict) -> dict:
+        workspace_id = job['workspace_id']
+        repository = VideoRepository(session)
+        app = WebChatApplication(video_repository=repository, workspace_id=workspace_id)
+
+        record = repository.get_video(GetVideoArgsUrl(job['payload']['url']))
+        if record is None:
+            url = job['payload']['url']
+            record = VideoFetcher.shared().fetch(url, lambda: app.video_record(self.youtube.get_video(url)))
+        video_id = repository.save_video(workspace_id, record)
+
+        result = { 'video_id': video_id, 'title': record['title'], 'author': record['author'] }
+        reused = app.reuse_summary(video_id)
+        if reused is None:
+            # the summary is a job of its own, a failed summary does not fetch the video again
+            result['summary_job_id'] = JobRepository(session).enqueue_summarize(workspace_id, video_id)['job_id']
+        else:
+            result['summary_from'] = reused
+        return result
+
+    def summarize(self, session, job: dict) -> dict:
+        workspace_id = job['workspace_id']
+        video_id = job['payload']['video_id']
+        repository = VideoRepository(session)
+        video = repository.get_video(GetVideoArgsWorkspaceVideoId(workspace_id, video_id))
+        if video["summary"] is None:
+            repository.save_summary(workspace_id, video_id, self.summary_bot.summarize_transcript(video["transcript"]))
+        return { 'video_id': video_id }
+
+    def insights(self, session, job: dict) -> dict:
+        videos = [video for video in VideoRepository(session).get_videos(job['workspace_id']) if video["summary"]]
+        if not videos:
+            return { 'insights': None, 'videos': 0 }
+        summaries = "\n\n".join(f"Title: {video['title']}\n{video['summary']}" for video in videos)
+        return { 'insights': self.summary_bot.create_insights(summaries), 'videos': len(videos) }
@@ -0,0 +1,94 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+from components.services.youtube_summary_bot import YouTubeSummaryBot
+from domain.repositories.video_repository import VideoRepository
+from logger_config import getLogger
+
+logger = getLogger(__name__)
+
+
+class SummaryPrefetcher:
+    """
+    Summarizes watched videos in the background.  Users nearly always ask for a summary right after watching a
+    video, so the summary is started speculatively and saved to the workspace when it is done.  A later get_summary
+    finds the saved summary, or joins the summarization still in flight instead of starting another.
+
+    Summarizations are deduplicated per video: a second workspace watching the same video joins the same future and
+    gets the summary saved to it as well.
+
+    Set SUMMARY_PREFETCH=off to disable, the speculative summaries cost a Sonnet call even if nobody asks.
+    """
+    MAX_WORKERS = int(os.getenv('SUMMARY_PREFETCH_WORKERS', 2))
+    MAX_PENDING = int(os.getenv('SUMMARY_PREFETCH_MAX_PENDING', 16))   # speculative work is dropped beyond this
+    RETAIN_SECONDS = 900    # finished futures are kept so late joiners do not summarize again
+    JOIN_SECONDS = float(os.getenv('SUMMARY_PREFETCH_JOIN_SECONDS', 120))   # a joiner waits this long, then summarizes itself
+
+    _shared: 'SummaryPrefetcher | None' = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summary-prefetch')
+        self.max_pending = max_pending
+        self.futures: TTLCache = TTLCache(maxsize=1024, ttl=self.RETAIN_SECONDS)
+        self.lock = threading.Lock()
+        self.summary_bot = YouTubeSummaryBot()
+
+    @classmethod
+    def shared(cls) -> 'SummaryPrefetcher | None':
+        """the process wide prefetcher, None when prefetching is disabled"""
+        if os.getenv('SUMMARY_PREFETCH', 'on').lower() in ('off', 'false', '0'):
+            return None
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def submit(self, workspace_id: str, video_id: int, transcript: str) -> Future | None:
+        """
+        starts summarizing a video unless it is already in flight.  the summary is saved to the workspace when done.
+        returns None when too much speculative work is pending
+        """
+        with self.lock:
+            future = self.futures.get(video_id)
+            if future is None:
+                pending = sum(1 for f in self.futures.values() if not f.done())
+                if pending >= self.max_pending:
+                    logger.info(f"summary prefetch queue full, not prefetching video {video_id}")
+                    return None
+                logger.debug(f"prefetching summary of video {video_id}")
+                future = self.executor.submit(self.summary_bot.summarize_transcript, transcript)
+                future.add_done_callback(lambda f: self._forget_failed(video_id, f))
+                self.futures[video_id] = future
+
+        future.add_done_callback(lambda f: self._store(workspace_id, video_id, f))
+        return future
+
+    def get(self, video_id: int) -> Future | None:
+        """the in-flight or recently finished summarization of a video"""
+        with self.lock:
+            return self.futures.get(video_id)
+
+    def _forget_failed(self, video_id: int, future: Future):
+        if future.cancelled() or future.exception() is not None:
+            logger.error(f"summary prefetch of video {video_id} failed")
+            with self.lock:
+                if self.futures.get(video_id) is future:
+                    del self.futures[video_id]
+
+    @staticmethod
+    def _store(workspace_id: str, video_id: int, future: Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        # imported here, the chat CLI uses the prefetcher without a database
+        from infrastructure.orm_database import SessionLocal
+        session = SessionLocal()
+        try:
+            VideoRepository(session).save_summary(workspace_id, video_id, future.result())
+        except Exception as e:
+            logger.error(f"could not save prefetched summary of video {video_id}: {e}")
+        finally:
+            session.close()
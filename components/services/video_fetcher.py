@@ -0,0 +1,90 @@
+import os
+import threading
+from typing import Callable
+
+from sqlalchemy import select, func, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from domain.repositories.video_repository import VideoRepository, GetVideoArgsYouTubeId
+from domain.services.single_flight import SingleFlight
+from domain.services.youtube_ids import canonical_video_id
+from logger_config import getLogger
+
+logger = getLogger(__name__)
+
+
+class VideoFetcher:
+    """
+    Fetches a video from YouTube once, however many workspaces and workers watch it at the same time.
+
+    Within a process, concurrent watchers of a video (by canonical YouTube id, whatever form the url takes) share one
+    fetch.  Across processes and nodes the fetch runs under a Postgres advisory lock on the YouTube id: the holder
+    checks the videos table again, fetches only if the video is still missing and commits the row before the lock is
+    released, so the watchers that waited for the lock find the stored video.
+
+    The lock is held for the whole fetch, on a connection of the fetch lock pool (FetchLockSessionLocal,
+    DB_FETCH_LOCK_POOL_SIZE connections) rather than the request pool, so fetches in flight never starve the requests.
+    When the lock cannot be had within LOCK_TIMEOUT_SECONDS (the holder is stuck on YouTube), or every connection of
+    that pool is taken, the video is fetched without it: a duplicate fetch is better than a failed watch.
+    """
+    LOCK_TIMEOUT_SECONDS = float(os.getenv('VIDEO_FETCH_LOCK_TIMEOUT_SECONDS', 60))
+
+    _shared: 'VideoFetcher | None' = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, session_factory=None, lock_timeout: float = LOCK_TIMEOUT_SECONDS):
+        if session_factory is None:
+            # imported here, the chat CLI imports the fetcher without a database
+            from infrastructure.orm_database import FetchLockSessionLocal
+            session_factory = FetchLockSessionLocal
+        self.session_factory = session_factory
+        self.lock_timeout = lock_timeout
+        self.flights = SingleFlight()
+
+    @classmethod
+    def shared(cls) -> 'VideoFetcher':
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def fetch(self, url: str, load: Callable[[], dict]) -> dict:
+        """
+        the record of a video that is not in the database under this url.  load fetches it from YouTube and is only
+        called when no other watcher has stored the video.  the record has a video_id when it is stored
+        """
+        youtube_id = canonical_video_id(url)
+        if youtube_id is None:
+            return load()
+        return self.flights.do(youtube_id, lambda: self._fetch_locked(youtube_id, load))
+
+    async def fetch_async(self, url: str, load: Callable[[], dict]) -> dict:
+        """fetch for the event loop, the lock wait and the fetch run on a worker thread"""
+        youtube_id = canonical_video_id(url)
+        if youtube_id is None:
+            return await self.flights.do_async(url, load)
+        return await self.flights.do_async(youtube_id, lambda: self._fetch_locked(youtube_id, load))
+
+    def _fetch_locked(self, youtube_id: str, load: Callable[[], dict]) -> dict:
+        session = self.session_factory()
+        try:
+            try:
+                session.execute(text(f"SET LOCAL lock_timeout = '{int(self.lock_timeout * 1000)}ms'"))
+                session.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(f"youtube:{youtube_id}", 0))))
+            except (OperationalError, PoolTimeoutError) as e:
+                logger.warning(f"fetching video {youtube_id} without the fetch lock: {getattr(e, 'orig', None) or e}")
+                session.rollback()
+                return load()
+
+            repository = VideoRepository(session)
+            record = repository.get_video(GetVideoArgsYouTubeId(youtube_id))
+            if record is not None:
+                # stored by another watcher while this one waited for the lock
+                return record
+
+            record = load()
+            record["video_id"] = repository.store_video(record)
+            session.commit()        # the row is committed before the lock is released
+            return record
+        finally:
+            session.close()
@@ -3,8 +3,10 @@ from datetime import datetime
 from typing import Callable
 
 from components.services.chat_appllcation import ChatApplication
+from components.services.summary_prefetcher import SummaryPrefetcher
+from components.services.video_fetcher import VideoFetcher
 from components.services.youtube_summary_bot import YouTubeSummaryBot
-from components.services.youtube_service import YouTubeService
+from components.services.youtube_service import YouTubeService, YouTubeVideo
 from domain.models.agent_event import AgentEvent
 from domain.repositories.video_repository import VideoRepository, GetVideoArgsUrl, GetVideoArgsWorkspaceVideoId
 from logger_config import getLogger
@@ -18,6 +20,7 @@ class WebChatApplication(ChatApplication):
         self.on_event = on_event
         self.video_repostory = video_repository
         self.workspace_id = workspace_id
+        self.summary_prefetcher = SummaryPrefetcher.shared()
         self.logger = getLogger(__name__)
 
     def watch_video(self, url) -> str:
@@ -32,29 +35,69 @@ class WebChatApplication(ChatApplication):
         record = self.video_repostory.get_video(getVideoArgs)
         if record is None:
             # YouTube bans users who make too many API Calls.  Only call Youtube when necessary!
-            video = self.youtube.get_video(url)
-
-            record = {}
-            record["url"] = video.url
-            record["transcript"] = video.transcript
-            record["title"] = video.title
-            record["author"] = video.author
+            # concurrent watchers of the same video, on any node, share one fetch
+            record = VideoFetcher.shared().fetch(url, lambda: self.video_record(self.youtube.get_video(url)))
 
         db_id = self.video_repostory.save_video(self.workspace_id, record)
+        reused = self.reuse_summary(db_id)
+        if reused is None:
+            self.prefetch_summary(db_id, record["transcript"])
 
         if self.on_event:
             ae = AgentEvent('video_watched', datetime.now().isoformat(), record)
             self.on_event(ae)
 
-        return f"Watched {str(record)}, transcript can be retrieved with the get_transcript tool.  The id is {db_id}"
+        return self.watched_message(record, db_id, reused)
+
+    @staticmethod
+    def video_record(video: YouTubeVideo) -> dict:
+        record = {}
+        record["url"] = video.url
+        record["transcript"] = video.transcript
+        record["title"] = video.title
+        record["author"] = video.author
+        return record
+
+    @staticmethod
+    def watched_message(record: dict, db_id: int, reused: int | None) -> str:
+        retval = f"Watched {str(record)}, transcript can be retrieved with the get_transcript tool.  The id is {db_id}"
+        if reused == db_id:
+            retval += ".  A summary of this video is already available"
+        elif reused is not None:
+            retval += f".  This video is a near duplicate of video {reused}, its summary has been reused"
+        return retval
+
+    def reuse_summary(self, video_id: int) -> int | None:
+        """
+        copies an existing summary of this video, or of a near duplicate (re-upload, mirror), into the workspace
+        so the summary does not have to be generated again.  returns the id of the video the summary came from,
+        video_id itself if the workspace already has a summary, None if no summary is available
+        """
+        video = self.video_repostory.get_video(GetVideoArgsWorkspaceVideoId(self.workspace_id, video_id))
+        if video["summary"] is not None:
+            return video_id
+
+        candidates = [video_id] + [duplicate["video_id"] for duplicate in self.video_repostory.find_near_duplicates(video_id)]
+        for candidate in candidates:
+            summary = self.video_repostory.get_reusable_summary(candidate)
+            if summary is not None:
+                self.logger.info(f"reusing summary of video {candidate} for video {video_id}")
+                self.video_repostory.save_summary(self.workspace_id, video_id, summary)
+                return candidate
+        return None
+
+    def prefetch_summary(self, video_id: int, transcript: str):
+        """starts summarizing in the background, the user is likely to ask for the summary next"""
+        if self.summary_prefetcher:
+            self.summary_prefetcher.submit(self.workspace_id, video_id, transcript)
 
     def list_videos(self) -> str:
         """returns a json with id, title of video, and author"""
 
-        videos = self.video_repostory.get_videos(self.workspace_id)
+        videos = self.video_repostory.list_videos(self.workspace_id)
         if len(videos) == 0:
             return "no videos have been watched"
-        return json.dumps(videos, indent=2)
+        return json.dumps(videos, separators=(',', ':'))     # compact, the listing is read by the model
 
     def get_transcript(self, id:int) -> str:
         """returns the complete transcript of a video"""
@@ -68,7 +111,19 @@ class WebChatApplication(ChatApplication):
 
         getVideoArgs = GetVideoArgsWorkspaceVideoId(self.workspace_id, id)
         video = self.video_repostory.get_video(getVideoArgs)
-        summary = self.summary_bot.summarize_transcript(video["transcript"])
+        if video["summary"] is not None:
+            return video["summary"]
+
+        prefetch = self.summary_prefetcher.get(int(id)) if self.summary_prefetcher else None
+        summary = None
+        if prefetch is not None:
+            # join the background summarization instead of starting over
+            try:
+                summary = prefetch.result(timeout=SummaryPrefetcher.JOIN_SECONDS)
+            except Exception as e:
+                self.logger.warning(f"prefetched summary of video {id} failed, summarizing again: {e!r}")
+        if summary is None:
+            summary = self.summary_bot.summarize_transcript(video["transcript"])
         if self.on_event:
             ae = AgentEvent('video_summarized', datetime.now().isoformat(), { 'summary': summary, 'video_id': video["video_id"] } )
             self.on_event(ae)
@@ -3,17 +3,17 @@ import os
 from pathlib import Path
 from typing import Optional
 
-from googleapiclient.discovery import build
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
-import re
-
 from components.anthropic.anthropic_service import Content
+from domain.services.youtube_ids import canonical_video_id
+from infrastructure.metrics import timed, YOUTUBE_SECONDS, YOUTUBE_ERRORS
 from logger_config import getLogger
+# googleapiclient and youtube_transcript_api are imported where they are used, they are slow to import and only
+# needed when a video is fetched
 
 ### Youtube video, this helps us to interact with a specific single video
 class YouTubeVideo(Content):
     def __init__(self, url: str, transcript: str, title: str, author: str, publish_date: datetime,
-                 video_duration:int):
+                 video_duration:int, summary: str | None = None):
         self.transcript = transcript
         self.title = title
         self.url = url
@@ -27,6 +27,7 @@ class YouTubeVideo(Content):
         self.author: str = self.author
         self.content: str = self.transcript
         self.creation_date: datetime = publish_date
+        self.summary: str | None = summary
 
     def __str__(self) -> str:
         return f"""URL: {self.url}\nTitle: {self.title}\nChannel: {self.author}\nPublish Date: {self.publish_date}"""
@@ -49,8 +50,15 @@ class YouTubeService:
     def __init__(self, mock: Optional[bool] = False):
         self.mock = mock
         self.logger = getLogger(__name__)
-        youtube_key = os.getenv('YOUTUBE_API_KEY')
-        self.youtube = build('youtube', 'v3', developerKey=youtube_key)
+        self._youtube = None
+
+    @property
+    def youtube(self):
+        """the YouTube API client, built on first use"""
+        if self._youtube is None:
+            from googleapiclient.discovery import build
+            self._youtube = build('youtube', 'v3', developerKey=os.getenv('YOUTUBE_API_KEY'))
+        return self._youtube
 
     def get_video(self, url) -> YouTubeVideo:
         self.logger.debug(f"Retrieving video:{url}")
@@ -70,37 +78,29 @@ class YouTubeService:
         self.logger.debug(f"Saved Transcript: {filepath}")
 
     def test(self):
+        # without execute() the request was only built, never sent
         self.youtube.videoCategories().list(
             part="snippet",
             regionCode="US"
-        )
+        ).execute()
         self.logger.info("YouTube OK")
 
 ### Helper functions
 
 def get_video_id(url) -> int:
     """Extract video ID from YouTube URL"""
-    patterns = [
-        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-        r'(?:be\/)([0-9A-Za-z_-]{11}).*'
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            # return video id
-            return match.group(1)
-    # video id not found
-    return None
+    return canonical_video_id(url)
 
 def get_video_metadata(video_id: str) -> tuple[str, str, int, datetime]:
+    from googleapiclient.discovery import build
     YOUTUBE_KEY = os.getenv('YOUTUBE_API_KEY')
     youtube = build('youtube', 'v3', developerKey=YOUTUBE_KEY)
 
-    response = youtube.videos().list(
-        part='snippet,contentDetails',
-        id=video_id
-    ).execute()
+    with timed(YOUTUBE_SECONDS, YOUTUBE_ERRORS, 'metadata'):
+        response = youtube.videos().list(
+            part='snippet,contentDetails',
+            id=video_id
+        ).execute()
 
     video = response['items'][0]
     return (
@@ -117,13 +117,16 @@ def get_video_metadata(video_id: str) -> tuple[str, str, int, datetime]:
     return title, author, duration
 
 def get_video_transcript(video_id: str) -> str:
+    from youtube_transcript_api import YouTubeTranscriptApi
     #transcript = YouTubeTranscriptApi.get_transcript(video_id)
     api = YouTubeTranscriptApi()
-    transcript = api.fetch(video_id)
+    with timed(YOUTUBE_SECONDS, YOUTUBE_ERRORS, 'transcript'):
+        transcript = api.fetch(video_id)
     return transcript
 
 def get_video(url) -> YouTubeVideo:
     """Get video from YouTube url"""
+    from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound
     try:
         video_id = get_video_id(url)
         if not video_id:
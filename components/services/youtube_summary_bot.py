@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from components.anthropic.anthropic_service import Claude
+from components.anthropic.anthropic_service import Claude, AsyncClaude
 from logger_config import getLogger
 
 """
@@ -11,7 +11,7 @@ class YouTubeSummaryBot:
     def __init__(self, mock:bool = False):
         # claude = Claude(model="claude-3-sonnet-20240229", max_tokens=4096, creativity=0)
         self.logging = getLogger(__name__)
-        self.claude = Claude(model="claude-sonnet-4-5-20250929", max_tokens=8192, creativity=0)
+        self.claude = self.create_claude(model="claude-sonnet-4-5-20250929", max_tokens=8192, creativity=0)
 
         self.mock = mock
         self.prompt = "You are an AI assistant that creates summaries of video transcripts."
@@ -84,6 +84,9 @@ class YouTubeSummaryBot:
     
     The audience (AI builders) will decide what's next and how to harness AI to increase productivity and create a better society.
     """
+    def create_claude(self, model: str, max_tokens: int, creativity: float) -> Claude:
+        return Claude(model=model, max_tokens=max_tokens, creativity=creativity)
+
     def summarize_transcript(self, transcript:str, word_count: int=300) -> str:
         """
             creates a summary of a youtube transcript
@@ -156,3 +159,16 @@ class YouTubeSummaryBot:
         except Exception as e:
             print(f"Error: {str(e)}")
             return None
+
+
+class AsyncYouTubeSummaryBot(YouTubeSummaryBot):
+    """YouTubeSummaryBot on the AsyncAnthropic client"""
+
+    def create_claude(self, model: str, max_tokens: int, creativity: float) -> AsyncClaude:
+        return AsyncClaude(model=model, max_tokens=max_tokens, creativity=creativity)
+
+    async def summarize_transcript(self, transcript:str, word_count: int=300) -> str:
+        self.logging.debug("Summarizing Video")
+        if self.mock:
+            return self.mock_summary
+        return await self.claude.query(system=self.prompt, message=transcript)
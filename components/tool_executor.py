@@ -1,14 +1,29 @@
+import inspect
 from typing import Any
 
 from components.services.chat_appllcation import ChatApplication
+from components.tool_result_cache import ToolResultCache
 from components.tools import *
 
 class ToolExecutor:
-    def __init__(self, application: ChatApplication):
+    def __init__(self, application: ChatApplication, cache: ToolResultCache = None):
         self.app = application
+        self.cache = cache
 
     def execute_tool(self, tool_name: str, tool_input:dict[str, Any]) -> str:
-        """execute a tool and return the result as a string"""
+        """execute a tool and return the result as a string, read-only tools are served from the cache when possible"""
+        if self.cache:
+            result = self.cache.get(tool_name, tool_input)
+            if result is not None:
+                return result
+
+        result = self.run_tool(tool_name, tool_input)
+
+        if self.cache:
+            self.cache.record(tool_name, tool_input, result)
+        return result
+
+    def run_tool(self, tool_name: str, tool_input:dict[str, Any]) -> str:
         if tool_name == TOOL_WATCH_VIDEO:
             url = tool_input["url"]
             return self.app.watch_video(url)
@@ -27,3 +42,24 @@ class ToolExecutor:
         if tool_name == TOOL_SUMMARIZE_VIDEO:
             index = tool_input["id"]
             return self.app.get_summary(index)
+
+
+class AsyncToolExecutor(ToolExecutor):
+    """ToolExecutor for an application whose tools are coroutines (AsyncWebChatApplication)"""
+
+    async def execute_tool(self, tool_name: str, tool_input:dict[str, Any]) -> str:
+        if self.cache:
+            result = self.cache.get(tool_name, tool_input)
+            if result is not None:
+                return result
+
+        result = await self.run_tool(tool_name, tool_input)
+
+        if self.cache:
+            self.cache.record(tool_name, tool_input, result)
+        return result
+
+    async def run_tool(self, tool_name: str, tool_input:dict[str, Any]) -> str:
+        # the synchronous dispatch returns the application's coroutine, await it here
+        result = super().run_tool(tool_name, tool_input)
+        return await result if inspect.isawaitable(result) else result
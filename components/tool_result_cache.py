@@ -0,0 +1,167 @@
+import json
+import threading
+from typing import Any
+
+from cachetools import LRUCache, TTLCache
+
+from components.tools import TOOL_LIST_VIDEOS, TOOL_GET_TRANSCRIPT, TOOL_WATCH_VIDEO, TOOL_SUMMARIZE_VIDEO
+from domain.repositories.video_repository import VideoRepository
+from logger_config import getLogger
+
+logger = getLogger(__name__)
+
+
+class ToolResultCache:
+    """
+    Memoizes the results of read-only tools for one workspace.  The cache outlives a single ChatAgent so repeated
+    calls within a turn, and across turns, are served from memory instead of re-querying the database.
+
+    Tools that write to the workspace invalidate only the results they change.  Writes made elsewhere in this
+    process (summary prefetch, jobs, imports) invalidate the list through VideoRepository.on_change, writes made by
+    other processes are caught at the start of each turn by validate().
+    """
+    # read-only tools whose results can be cached
+    CACHEABLE = (TOOL_LIST_VIDEOS, TOOL_GET_TRANSCRIPT)
+
+    # tool -> cached tools whose results it changes
+    #   watch_video adds a video to the list, transcripts of the other videos are unchanged
+    #   summarize_videos saves a summary, which is part of the list
+    INVALIDATES = {
+        TOOL_WATCH_VIDEO: (TOOL_LIST_VIDEOS,),
+        TOOL_SUMMARIZE_VIDEO: (TOOL_LIST_VIDEOS,),
+    }
+
+    # other API workers can write to the same workspace, so results are never served older than this
+    TTL_SECONDS = 300
+    MAX_ENTRIES = 256
+    MAX_WORKSPACES = 1024
+
+    _workspaces: LRUCache = LRUCache(maxsize=MAX_WORKSPACES)
+    _workspaces_lock = threading.Lock()
+
+    # counts of every workspace since the process started, the caches of evicted workspaces included (/metrics)
+    _totals = {'hits': 0, 'misses': 0, 'invalidations': 0}
+    _totals_lock = threading.Lock()
+
+    def __init__(self, workspace_id: str, ttl: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.workspace_id = workspace_id
+        self.entries: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0    # characters of results served from the cache instead of the database
+        self.invalidations = 0  # results dropped because the workspace changed
+        self.video_states: dict[int, str | None] | None = None     # VideoRepository.get_video_states when last validated
+
+    @classmethod
+    def for_workspace(cls, workspace_id: str) -> 'ToolResultCache':
+        """returns the shared cache of a workspace, creating it if needed"""
+        key = str(workspace_id)
+        with cls._workspaces_lock:
+            cache = cls._workspaces.get(key)
+            if cache is None:
+                cache = cls(key)
+                cls._workspaces[key] = cache
+            return cache
+
+    @classmethod
+    def workspace_changed(cls, workspace_id: str):
+        """a video was added to the workspace or a summary saved, the list of videos is out of date"""
+        with cls._workspaces_lock:
+            cache = cls._workspaces.get(str(workspace_id))
+        if cache is not None:
+            cache.invalidate(TOOL_LIST_VIDEOS)
+
+    @classmethod
+    def evict_workspace(cls, workspace_id: str):
+        with cls._workspaces_lock:
+            cls._workspaces.pop(str(workspace_id), None)
+
+    @staticmethod
+    def key(tool_name: str, tool_input: dict[str, Any]) -> tuple[str, str]:
+        return tool_name, json.dumps(tool_input, sort_keys=True, default=str)
+
+    def get(self, tool_name: str, tool_input: dict[str, Any]) -> str | None:
+        if tool_name not in self.CACHEABLE:
+            return None
+
+        with self.lock:
+            result = self.entries.get(self.key(tool_name, tool_input))
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_saved += len(result)
+        self._count('misses' if result is None else 'hits')
+        if result is None:
+            return None
+        logger.debug(f"tool cache hit: {tool_name} {tool_input}")
+        return result
+
+    def record(self, tool_name: str, tool_input: dict[str, Any], result: str):
+        """stores the result of a read-only tool, or invalidates the results a write tool has changed"""
+        if tool_name in self.CACHEABLE:
+            if isinstance(result, str):
+                with self.lock:
+                    self.entries[self.key(tool_name, tool_input)] = result
+        elif tool_name in self.INVALIDATES:
+            self.invalidate(*self.INVALIDATES[tool_name])
+
+    def invalidate(self, *tool_names: str):
+        """drops the cached results of the given tools, or every result when no tool is given"""
+        with self.lock:
+            keys = [key for key in self.entries.keys() if not tool_names or key[0] in tool_names]
+            for key in keys:
+                self.entries.pop(key, None)
+            self.invalidations += len(keys)
+        if keys:
+            self._count('invalidations', len(keys))
+
+    @classmethod
+    def _count(cls, name: str, n: int = 1):
+        with cls._totals_lock:
+            cls._totals[name] += n
+
+    @classmethod
+    def totals(cls) -> dict:
+        """
+        hits, misses and invalidated results of every workspace since the process started, and the results held now
+            { 'hits': 120, 'misses': 40, 'hit_ratio': 0.75, 'invalidations': 12, 'entries': 30 }
+        """
+        with cls._workspaces_lock:
+            caches = list(cls._workspaces.values())
+        entries = sum(len(cache.entries) for cache in caches)
+        with cls._totals_lock:
+            totals = dict(cls._totals)
+        lookups = totals['hits'] + totals['misses']
+        return {**totals, 'hit_ratio': totals['hits'] / lookups if lookups else 0.0, 'entries': entries}
+
+    def validate(self, video_states: dict[int, str | None]):
+        """
+        drops the results that changed since the last turn, given the workspace's current video states.  new videos
+        and summaries change the list, a removed video also the transcripts
+        """
+        with self.lock:
+            previous, self.video_states = self.video_states, dict(video_states)
+        if previous is None or previous == video_states:
+            return
+        if previous.keys() - video_states.keys():
+            self.invalidate()
+        else:
+            self.invalidate(TOOL_LIST_VIDEOS)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'workspace_id': self.workspace_id,
+                'entries': len(self.entries),
+                'hits': self.hits,                  # each hit is a repository query (and serialization) avoided
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'invalidations': self.invalidations
+            }
+
+
+VideoRepository.on_change.append(ToolResultCache.workspace_changed)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Build the full text search segments of videos saved before search existed.  New videos are segmented when saved.
+
+Runs online, one video per transaction.  Apply the schema first (python database/apply_schema.py), it creates the
+transcript_segments table.
+
+Usage:
+    python database/index_segments.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import exists
+
+from api.models import VideoModel, TranscriptSegmentModel
+from domain.repositories.video_repository import VideoRepository
+from infrastructure.orm_database import SessionLocal
+
+
+def index_segments():
+    session = SessionLocal()
+    start = time.perf_counter()
+    try:
+        video_ids = [row.video_id for row in session.query(VideoModel.video_id)
+                     .filter(~exists().where(TranscriptSegmentModel.video_id == VideoModel.video_id))
+                     .order_by(VideoModel.video_id).all()]
+        print(f"{len(video_ids)} videos to index")
+
+        repository = VideoRepository(session)
+        for i, video_id in enumerate(video_ids, 1):
+            repository.index_segments(video_id)
+            session.expunge_all()       # do not keep every transcript in memory
+            if i % 100 == 0:
+                print(f"  {i} videos indexed")
+    finally:
+        session.close()
+
+    print(f"\n✅ {len(video_ids)} videos indexed in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    index_segments()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compress the transcripts of existing videos into videos.transcript_z, and fill in videos.transcript_preview of rows
+compressed before it was added.
+
+Runs online: rows are converted in small batches, each in its own short transaction, and rows locked by someone
+else are skipped (FOR UPDATE SKIP LOCKED) and picked up by a later batch.  Several copies can run at once, and the
+API keeps serving while it runs since reads fall back to the uncompressed column until a row is converted.
+
+Apply the schema first (python database/apply_schema.py), it adds the transcript_z column.
+
+Usage:
+    python database/migrate_transcripts.py                   # convert everything
+    python database/migrate_transcripts.py --batch-size 50   # rows per transaction, default 200
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import execute_batch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.apply_schema import get_database_url
+from api.models import VideoModel
+from domain.services.transcript_codec import transcript_codec
+
+SELECT_BATCH = """
+    SELECT video_id, transcript
+    FROM videos
+    WHERE transcript_z IS NULL AND transcript IS NOT NULL
+    ORDER BY video_id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+# the preview is taken from the old value of transcript
+UPDATE_ROW = "UPDATE videos SET transcript_z = %s, transcript_preview = left(transcript, 100), transcript = NULL WHERE video_id = %s"
+
+SELECT_PREVIEW_BATCH = """
+    SELECT video_id, transcript_z
+    FROM videos
+    WHERE transcript_preview IS NULL AND transcript_z IS NOT NULL
+    ORDER BY video_id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+UPDATE_PREVIEW = "UPDATE videos SET transcript_preview = %s WHERE video_id = %s"
+
+
+def migrate(batch_size=200):
+    conn = psycopg2.connect(get_database_url())
+    converted, bytes_before, bytes_after = 0, 0, 0
+    start = time.perf_counter()
+    print(f"Compressing transcripts with {transcript_codec.codec}, {batch_size} rows per batch")
+
+    try:
+        while True:
+            with conn:      # one transaction per batch, committed on exit
+                with conn.cursor() as cursor:
+                    cursor.execute(SELECT_BATCH, (batch_size,))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+
+                    updates = []
+                    for video_id, transcript in rows:
+                        compressed = transcript_codec.compress(transcript)
+                        bytes_before += len(transcript.encode('utf-8'))
+                        bytes_after += len(compressed)
+                        updates.append((psycopg2.Binary(compressed), video_id))
+                    execute_batch(cursor, UPDATE_ROW, updates)
+
+            converted += len(rows)
+            print(f"  {converted} rows converted")
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✅ {converted} transcripts compressed in {elapsed:.1f}s")
+    if converted:
+        print(f"   {bytes_before:,} bytes -> {bytes_after:,} bytes ({bytes_after / bytes_before:.1%})")
+        print("   run VACUUM videos to reuse the space of the old values")
+
+
+def fill_previews(batch_size=200):
+    """previews of rows that were compressed without one"""
+    conn = psycopg2.connect(get_database_url())
+    filled = 0
+    try:
+        while True:
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(SELECT_PREVIEW_BATCH, (batch_size,))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    execute_batch(cursor, UPDATE_PREVIEW,
+                                  [(transcript_codec.decompress(value)[:VideoModel.PREVIEW_LENGTH], video_id) for video_id, value in rows])
+            filled += len(rows)
+    finally:
+        conn.close()
+    if filled:
+        print(f"✅ {filled} transcript previews filled in")
+
+
+if __name__ == '__main__':
+    batch_size = 200
+    if '--batch-size' in sys.argv:
+        batch_size = int(sys.argv[sys.argv.index('--batch-size') + 1])
+    migrate(batch_size=batch_size)
+    fill_previews(batch_size=batch_size)
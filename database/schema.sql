@@ -10,16 +10,23 @@ CREATE TABLE IF NOT EXISTS workspaces (
     workspace_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
     name VARCHAR(255) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE IF NOT EXISTS videos (
     video_id SERIAL PRIMARY KEY,
-    url TEXT NOT NULL,
-    transcript TEXT NOT NULL,
+    url TEXT NOT NULL UNIQUE,
+    youtube_id VARCHAR(11),
+    transcript TEXT,
+    transcript_z BYTEA,
+    transcript_preview TEXT,
     title VARCHAR(500) NOT NULL,
     channel VARCHAR(255) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    minhash BYTEA,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    search_tsv TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(channel, '')), 'B')) STORED
 );
 
 CREATE TABLE IF NOT EXISTS workspace_videos (
@@ -39,7 +46,139 @@ CREATE TABLE IF NOT EXISTS messages (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Columns added after the initial schema
+ALTER TABLE workspaces ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE workspaces ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS minhash BYTEA;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS transcript_z BYTEA;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS transcript_preview TEXT;
+-- previews of compressed rows are filled in by database/migrate_transcripts.py
+UPDATE videos SET transcript_preview = left(transcript, 100) WHERE transcript_preview IS NULL AND transcript IS NOT NULL;
+ALTER TABLE videos ALTER COLUMN transcript DROP NOT NULL;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS youtube_id VARCHAR(11);
+-- same pattern as domain/services/youtube_ids.py
+UPDATE videos SET youtube_id = substring(url from '(?:v=|/)([0-9A-Za-z_-]{11})') WHERE youtube_id IS NULL;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(channel, '')), 'B')) STORED;
+-- transcript_z is compressed by the application, keep it out of line without a second pglz pass
+ALTER TABLE videos ALTER COLUMN transcript_z SET STORAGE EXTERNAL;
+
+CREATE TABLE IF NOT EXISTS video_lsh_buckets (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    video_id INTEGER NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, video_id)
+);
+
+CREATE TABLE IF NOT EXISTS transcript_segments (
+    segment_id SERIAL PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+    start_seconds INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', text)) STORED
+);
+
+CREATE TABLE IF NOT EXISTS agent_spans (
+    span_id SERIAL PRIMARY KEY,
+    workspace_id UUID NOT NULL REFERENCES workspaces(workspace_id) ON DELETE CASCADE,
+    message_id INTEGER REFERENCES messages(message_id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    latency_ms DOUBLE PRECISION NOT NULL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    cache_creation_input_tokens INTEGER,
+    cache_read_input_tokens INTEGER,
+    cost_usd DOUBLE PRECISION,
+    stop_reason VARCHAR(50),
+    result_size INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL,
+    workspace_id UUID REFERENCES workspaces(workspace_id) ON DELETE CASCADE,
+    payload JSONB NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    priority SMALLINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    idempotency_key VARCHAR(255) UNIQUE,
+    run_after TIMESTAMP NOT NULL DEFAULT now(),
+    locked_by VARCHAR(64),
+    locked_at TIMESTAMP,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at TIMESTAMP
+);
+
+-- version of the list of workspaces (GET /workspaces), one row bumped in the transaction of every insert, update or
+-- delete of workspaces, touches included.  it only increases, and reading it does not scan the workspaces
+CREATE TABLE IF NOT EXISTS workspace_list_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now())
+);
+INSERT INTO workspace_list_version (id) VALUES (1) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_workspace_list_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE workspace_list_version SET version = version + 1, updated_at = timezone('utc', now()) WHERE id = 1;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS workspaces_list_version ON workspaces;
+CREATE TRIGGER workspaces_list_version AFTER INSERT OR UPDATE OR DELETE ON workspaces
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_workspace_list_version();
+
 -- Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_messages_workspace_id ON messages(workspace_id);
-CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
-CREATE INDEX IF NOT EXISTS idx_videos_url ON videos(url);
\ No newline at end of file
+DROP INDEX IF EXISTS idx_messages_workspace_id;
+DROP INDEX IF EXISTS idx_messages_created_at;
+CREATE INDEX IF NOT EXISTS idx_messages_workspace_id_message_id ON messages(workspace_id, message_id);
+-- videos are upserted on url (INSERT ... ON CONFLICT (url)), which needs a unique index.  databases created before
+-- url was unique can hold several rows per url: they are merged into the oldest one (lowest video_id) first, its
+-- workspace links, messages, LSH buckets and segments taking over those of the duplicates, which are then deleted
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_indexes WHERE tablename = 'videos' AND indexname = 'videos_url_key') THEN
+        CREATE TEMP TABLE video_duplicates AS
+            SELECT video_id, keep_id
+            FROM (SELECT video_id, min(video_id) OVER (PARTITION BY url) AS keep_id FROM videos) v
+            WHERE video_id <> keep_id;
+
+        INSERT INTO workspace_videos (workspace_id, video_id, added_at, summary)
+            SELECT DISTINCT ON (wv.workspace_id, d.keep_id) wv.workspace_id, d.keep_id, wv.added_at, wv.summary
+            FROM workspace_videos wv JOIN video_duplicates d ON d.video_id = wv.video_id
+            ORDER BY wv.workspace_id, d.keep_id, wv.summary IS NULL, wv.added_at
+            ON CONFLICT (workspace_id, video_id) DO UPDATE SET summary = coalesce(workspace_videos.summary, EXCLUDED.summary);
+        UPDATE messages m SET video_id = d.keep_id FROM video_duplicates d WHERE m.video_id = d.video_id;
+        UPDATE videos k SET minhash = v.minhash
+            FROM video_duplicates d JOIN videos v ON v.video_id = d.video_id
+            WHERE k.video_id = d.keep_id AND k.minhash IS NULL AND v.minhash IS NOT NULL;
+        INSERT INTO video_lsh_buckets (band, bucket, video_id)
+            SELECT b.band, b.bucket, d.keep_id FROM video_lsh_buckets b JOIN video_duplicates d ON d.video_id = b.video_id
+            ON CONFLICT DO NOTHING;
+        -- segments of one duplicate, when the kept row has none
+        UPDATE transcript_segments s SET video_id = d.keep_id
+            FROM video_duplicates d
+            WHERE s.video_id = d.video_id
+              AND NOT EXISTS (SELECT 1 FROM transcript_segments k WHERE k.video_id = d.keep_id)
+              AND d.video_id = (SELECT min(s2.video_id) FROM transcript_segments s2 JOIN video_duplicates d2 ON d2.video_id = s2.video_id
+                                WHERE d2.keep_id = d.keep_id);
+        DELETE FROM videos WHERE video_id IN (SELECT video_id FROM video_duplicates);
+        DROP TABLE video_duplicates;
+    END IF;
+END $$;
+DROP INDEX IF EXISTS idx_videos_url;
+CREATE UNIQUE INDEX IF NOT EXISTS videos_url_key ON videos(url);
+CREATE INDEX IF NOT EXISTS idx_video_lsh_buckets_video_id ON video_lsh_buckets(video_id);
+CREATE INDEX IF NOT EXISTS idx_agent_spans_workspace_id_message_id ON agent_spans(workspace_id, message_id);
+CREATE INDEX IF NOT EXISTS idx_videos_search_tsv ON videos USING GIN (search_tsv);
+CREATE INDEX IF NOT EXISTS idx_transcript_segments_video_id ON transcript_segments(video_id);
+CREATE INDEX IF NOT EXISTS idx_transcript_segments_tsv ON transcript_segments USING GIN (tsv);
+CREATE INDEX IF NOT EXISTS idx_videos_youtube_id ON videos(youtube_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(priority DESC, run_after, job_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running_locked_at ON jobs(locked_at) WHERE status = 'running';
@@ -1,6 +1,11 @@
 -- WARNING: DESTRUCTIVE - Drops all tables and data
 -- Use only during development when you want a fresh start
 
+DROP TABLE IF EXISTS workspace_list_version CASCADE;
+DROP TABLE IF EXISTS jobs CASCADE;
+DROP TABLE IF EXISTS agent_spans CASCADE;
+DROP TABLE IF EXISTS transcript_segments CASCADE;
+DROP TABLE IF EXISTS video_lsh_buckets CASCADE;
 DROP TABLE IF EXISTS messages CASCADE;
 DROP TABLE IF EXISTS workspace_videos CASCADE;
 DROP TABLE IF EXISTS videos CASCADE;
@@ -17,16 +22,23 @@ CREATE TABLE workspaces (
     workspace_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
     name VARCHAR(255) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE videos (
     video_id SERIAL PRIMARY KEY,
-    url TEXT NOT NULL,
-    transcript TEXT NOT NULL,
+    url TEXT NOT NULL UNIQUE,
+    youtube_id VARCHAR(11),
+    transcript TEXT,
+    transcript_z BYTEA,
+    transcript_preview TEXT,
     title VARCHAR(500) NOT NULL,
     channel VARCHAR(255) NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    minhash BYTEA,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    search_tsv TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(channel, '')), 'B')) STORED
 );
 
 CREATE TABLE workspace_videos (
@@ -46,7 +58,87 @@ CREATE TABLE messages (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE TABLE video_lsh_buckets (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    video_id INTEGER NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, video_id)
+);
+
+CREATE TABLE transcript_segments (
+    segment_id SERIAL PRIMARY KEY,
+    video_id INTEGER NOT NULL REFERENCES videos(video_id) ON DELETE CASCADE,
+    start_seconds INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', text)) STORED
+);
+
+CREATE TABLE agent_spans (
+    span_id SERIAL PRIMARY KEY,
+    workspace_id UUID NOT NULL REFERENCES workspaces(workspace_id) ON DELETE CASCADE,
+    message_id INTEGER REFERENCES messages(message_id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    latency_ms DOUBLE PRECISION NOT NULL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    cache_creation_input_tokens INTEGER,
+    cache_read_input_tokens INTEGER,
+    cost_usd DOUBLE PRECISION,
+    stop_reason VARCHAR(50),
+    result_size INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Indexes
-CREATE INDEX idx_messages_workspace_id ON messages(workspace_id);
-CREATE INDEX idx_messages_created_at ON messages(created_at);
-CREATE INDEX idx_videos_url ON videos(url);
\ No newline at end of file
+-- transcript_z is compressed by the application, keep it out of line without a second pglz pass
+ALTER TABLE videos ALTER COLUMN transcript_z SET STORAGE EXTERNAL;
+
+CREATE TABLE jobs (
+    job_id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL,
+    workspace_id UUID REFERENCES workspaces(workspace_id) ON DELETE CASCADE,
+    payload JSONB NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    priority SMALLINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    idempotency_key VARCHAR(255) UNIQUE,
+    run_after TIMESTAMP NOT NULL DEFAULT now(),
+    locked_by VARCHAR(64),
+    locked_at TIMESTAMP,
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at TIMESTAMP
+);
+
+-- version of the list of workspaces (GET /workspaces), one row bumped in the transaction of every insert, update or
+-- delete of workspaces, touches included.  it only increases, and reading it does not scan the workspaces
+CREATE TABLE workspace_list_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT timezone('utc', now())
+);
+INSERT INTO workspace_list_version (id) VALUES (1) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_workspace_list_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE workspace_list_version SET version = version + 1, updated_at = timezone('utc', now()) WHERE id = 1;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER workspaces_list_version AFTER INSERT OR UPDATE OR DELETE ON workspaces
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_workspace_list_version();
+
+CREATE INDEX idx_messages_workspace_id_message_id ON messages(workspace_id, message_id);
+CREATE INDEX idx_video_lsh_buckets_video_id ON video_lsh_buckets(video_id);
+CREATE INDEX idx_agent_spans_workspace_id_message_id ON agent_spans(workspace_id, message_id);
+CREATE INDEX idx_videos_search_tsv ON videos USING GIN (search_tsv);
+CREATE INDEX idx_transcript_segments_video_id ON transcript_segments(video_id);
+CREATE INDEX idx_transcript_segments_tsv ON transcript_segments USING GIN (tsv);
+CREATE INDEX idx_videos_youtube_id ON videos(youtube_id);
+CREATE INDEX idx_jobs_queued ON jobs(priority DESC, run_after, job_id) WHERE status = 'queued';
+CREATE INDEX idx_jobs_running_locked_at ON jobs(locked_at) WHERE status = 'running';
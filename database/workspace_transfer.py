@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Export a workspace to a JSON lines file, or import one, to move workspaces between environments.  Files ending in .gz
+are written gzipped, gzipped files are detected on import.
+
+Videos already stored in the target database are matched on their YouTube id and linked instead of copied.  Import
+commits in batches: if it is interrupted, delete the partial workspace and run it again.
+
+Usage:
+    python database/workspace_transfer.py export <workspace_id> <file[.gz]>
+    python database/workspace_transfer.py import <file> --user-id <user_id>
+    python database/workspace_transfer.py import <file> --workspace-id <workspace_id>
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from domain.services.workspace_transfer import WorkspaceTransfer, gzip_lines, read_lines
+from infrastructure.orm_database import SessionLocal
+
+
+def export_workspace(workspace_id: str, path: str):
+    session = SessionLocal()
+    start = time.perf_counter()
+    try:
+        lines = WorkspaceTransfer(session).export_lines(workspace_id)
+        with open(path, 'wb') as file:
+            if path.endswith('.gz'):
+                for chunk in gzip_lines(lines):
+                    file.write(chunk)
+            else:
+                for line in lines:
+                    file.write(line.encode('utf-8'))
+    finally:
+        session.close()
+    print(f"✅ workspace {workspace_id} exported to {path} in {time.perf_counter() - start:.1f}s")
+
+
+def import_workspace(path: str, user_id: int = None, workspace_id: str = None):
+    session = SessionLocal()
+    start = time.perf_counter()
+    try:
+        with open(path, 'rb') as file:
+            result = WorkspaceTransfer(session).import_lines(read_lines(file), user_id=user_id, workspace_id=workspace_id)
+    finally:
+        session.close()
+    print(f"✅ imported into workspace {result['workspace_id']} in {time.perf_counter() - start:.1f}s")
+    print(f"   {result['videos']} videos stored, {result['videos_reused']} already stored, {result['messages']} messages")
+
+
+def option(name: str) -> str | None:
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return None
+
+
+if __name__ == '__main__':
+    if len(sys.argv) >= 4 and sys.argv[1] == 'export':
+        export_workspace(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'import':
+        user_id = option('--user-id')
+        import_workspace(sys.argv[2], user_id=int(user_id) if user_id else None, workspace_id=option('--workspace-id'))
+    else:
+        print(__doc__)
+        sys.exit(1)
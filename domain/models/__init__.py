@@ -1,3 +1,4 @@
 from .agent_result import AgentResult
+from .agent_span import AgentSpan
 
-__all__ = ['AgentResult']
+__all__ = ['AgentResult', 'AgentSpan']
@@ -1,14 +1,16 @@
 from dataclasses import dataclass
-from typing import Literal
+from typing import Literal, TYPE_CHECKING
 
-from anthropic.types import Message
 from logger_config import getLogger
 
+if TYPE_CHECKING:
+    from anthropic.types import Message
+
 logger = getLogger(__name__)
 
 @dataclass
 class AgentEvent:
-    type: Literal['message','tool_use', 'tool_result', 'video_watched', 'video_summarized']
+    type: Literal['message','tool_use', 'tool_result', 'video_watched', 'video_summarized', 'span', 'text_delta', 'done', 'error']
     timestamp: str
 
     """
@@ -29,7 +31,7 @@ class AgentEvent:
                 return stop_reason
 
     @staticmethod
-    def response_to_dict(response: Message):
+    def response_to_dict(response: 'Message'):
         retval = dict()
         retval["role"] = response.role
         retval["content"] = [c.model_dump() for c in response.content]
@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from domain.models.agent_span import AgentSpan
 
 
 @dataclass
@@ -11,3 +13,12 @@ class AgentResult:
     """
     all_messages: list[dict]  # User, assistant, tool_use, tool_result messages
     final_response: str        # The text response shown to user
+    spans: list[AgentSpan] = field(default_factory=list)  # LLM round trips and tool executions, in order
+
+    @property
+    def latency_ms(self) -> float:
+        return sum(span.latency_ms for span in self.spans)
+
+    @property
+    def cost_usd(self) -> float:
+        return sum(span.cost_usd or 0 for span in self.spans)
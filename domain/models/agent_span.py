@@ -0,0 +1,24 @@
+from dataclasses import dataclass, asdict
+from typing import Literal
+
+
+@dataclass
+class AgentSpan:
+    """
+    Timing and cost of one step of an agent turn: an LLM round trip or a tool execution.
+    Token, cost and stop_reason fields are only set for 'llm' spans, result_size only for 'tool' spans.
+    """
+    type: Literal['llm', 'tool']
+    name: str                   # model name for 'llm' spans, tool name for 'tool' spans
+    started_at: str             # iso format
+    latency_ms: float
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    cache_creation_input_tokens: int | None = None
+    cache_read_input_tokens: int | None = None
+    cost_usd: float | None = None
+    stop_reason: str | None = None
+    result_size: int | None = None  # characters in the tool result
+
+    def to_dict(self) -> dict:
+        return asdict(self)
@@ -0,0 +1,131 @@
+import os
+
+from sqlalchemy import select, update, case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api.models import JobModel
+from domain.services.youtube_ids import canonical_video_id
+
+
+class JobRepository:
+    """
+    Postgres backed job queue.  Workers claim the next job with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    worker processes, on any number of nodes, can poll the same table without handing a job out twice.
+
+    A job that fails is retried with an exponential backoff until it has run max_attempts times.  A job whose worker
+    died is handed out again once its lease (locked_at) is older than the lease timeout, see requeue_stale.
+    Jobs with the same idempotency_key are the same job: enqueueing it again returns the existing job, and queues it
+    again only if it failed.
+    """
+    RETRY_BASE_SECONDS = int(os.getenv('JOB_RETRY_BASE_SECONDS', 10))
+
+    # kinds, and their priority: a watch is what the user waits on, insights can wait
+    WATCH = 'watch'
+    SUMMARIZE = 'summarize'
+    INSIGHTS = 'insights'
+    PRIORITIES = {WATCH: 10, SUMMARIZE: 5, INSIGHTS: 0}
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def enqueue(self, kind: str, payload: dict, workspace_id: str = None, priority: int = 0,
+                idempotency_key: str = None, max_attempts: int = 3) -> dict:
+        """queues a job, or returns the job already queued under idempotency_key"""
+        job_id = self.session.execute(
+            insert(JobModel).values(kind=kind, payload=payload, workspace_id=workspace_id, priority=priority,
+                                    idempotency_key=idempotency_key, max_attempts=max_attempts)
+            .on_conflict_do_update(index_elements=['idempotency_key'],
+                                   set_={'status': JobModel.QUEUED, 'attempts': 0, 'error': None, 'run_after': func.now(), 'finished_at': None},
+                                   where=JobModel.status == JobModel.FAILED)
+            .returning(JobModel.job_id)).scalar()
+        if job_id is None:
+            job_id = self.session.execute(select(JobModel.job_id).filter_by(idempotency_key=idempotency_key)).scalar_one()
+        self.session.commit()
+        return self.get_job(job_id)
+
+    def enqueue_watch(self, workspace_id: str, url: str) -> dict:
+        key = f"{self.WATCH}:{workspace_id}:{canonical_video_id(url) or url}"
+        return self.enqueue(self.WATCH, {'url': url}, workspace_id, self.PRIORITIES[self.WATCH], key)
+
+    def enqueue_summarize(self, workspace_id: str, video_id: int) -> dict:
+        key = f"{self.SUMMARIZE}:{workspace_id}:{video_id}"
+        return self.enqueue(self.SUMMARIZE, {'video_id': video_id}, workspace_id, self.PRIORITIES[self.SUMMARIZE], key)
+
+    def enqueue_insights(self, workspace_id: str, idempotency_key: str = None) -> dict:
+        key = f"{self.INSIGHTS}:{workspace_id}:{idempotency_key}" if idempotency_key else None
+        return self.enqueue(self.INSIGHTS, {}, workspace_id, self.PRIORITIES[self.INSIGHTS], key)
+
+    def claim(self, worker_id: str, kinds: list[str] = None) -> dict | None:
+        """hands the next due job to worker_id, highest priority first, None when there is nothing to do"""
+        next_job = select(JobModel.job_id)\
+            .where(JobModel.status == JobModel.QUEUED, JobModel.run_after <= func.now())
+        if kinds:
+            next_job = next_job.where(JobModel.kind.in_(kinds))
+        next_job = next_job.order_by(JobModel.priority.desc(), JobModel.run_after, JobModel.job_id)\
+            .limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+        job = self.session.execute(
+            update(JobModel).where(JobModel.job_id == next_job)
+            .values(status=JobModel.RUNNING, attempts=JobModel.attempts + 1, locked_by=worker_id, locked_at=func.now())
+            .returning(JobModel)
+            .execution_options(synchronize_session=False)).scalars().first()
+        retval = job.to_dict() if job else None
+        self.session.commit()
+        return retval
+
+    def complete(self, job_id: int, worker_id: str, result: dict = None) -> bool:
+        """False when the job is no longer this worker's, its lease ran out and it was handed to another worker"""
+        updated = self.session.execute(
+            update(JobModel).where(JobModel.job_id == job_id, JobModel.status == JobModel.RUNNING, JobModel.locked_by == worker_id)
+            .values(status=JobModel.SUCCEEDED, result=result, error=None, locked_by=None, locked_at=None, finished_at=func.now())
+            .execution_options(synchronize_session=False)).rowcount
+        self.session.commit()
+        return updated == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """queues the job again after a backoff, or marks it failed once it has used all its attempts"""
+        retry = JobModel.attempts < JobModel.max_attempts
+        backoff = func.make_interval(0, 0, 0, 0, 0, 0, self.RETRY_BASE_SECONDS * func.power(2, JobModel.attempts - 1))
+        updated = self.session.execute(
+            update(JobModel).where(JobModel.job_id == job_id, JobModel.status == JobModel.RUNNING, JobModel.locked_by == worker_id)
+            .values(status=case((retry, JobModel.QUEUED), else_=JobModel.FAILED),
+                    run_after=case((retry, func.now() + backoff), else_=JobModel.run_after),
+                    finished_at=case((retry, None), else_=func.now()),
+                    error=error, locked_by=None, locked_at=None)
+            .execution_options(synchronize_session=False)).rowcount
+        self.session.commit()
+        return updated == 1
+
+    def requeue_stale(self, lease_seconds: int) -> int:
+        """hands out again the jobs of workers that died mid job.  returns the number of jobs requeued or failed"""
+        retry = JobModel.attempts < JobModel.max_attempts
+        updated = self.session.execute(
+            update(JobModel).where(JobModel.status == JobModel.RUNNING,
+                                   JobModel.locked_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, lease_seconds))
+            .values(status=case((retry, JobModel.QUEUED), else_=JobModel.FAILED),
+                    finished_at=case((retry, None), else_=func.now()),
+                    error='worker lost', locked_by=None, locked_at=None)
+            .execution_options(synchronize_session=False)).rowcount
+        self.session.commit()
+        return updated
+
+    def get_job(self, job_id: int) -> dict | None:
+        job = self.session.get(JobModel, job_id)
+        if job is None: return None
+        return job.to_dict()
+
+
+class AsyncJobRepository:
+    """JobRepository on an AsyncSession, queries run with run_sync so they do not block the event loop"""
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def enqueue(self, kind: str, payload: dict, workspace_id: str = None, priority: int = 0,
+                      idempotency_key: str = None, max_attempts: int = 3) -> dict:
+        return await self.session.run_sync(lambda s: JobRepository(s).enqueue(kind, payload, workspace_id, priority,
+                                                                              idempotency_key, max_attempts))
+
+    async def get_job(self, job_id: int) -> dict | None:
+        return await self.session.run_sync(lambda s: JobRepository(s).get_job(job_id))
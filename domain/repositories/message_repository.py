@@ -1,18 +1,81 @@
+from typing import Iterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from api.models import MessageModel
+from domain.repositories.message_sink import MessageSink, AsyncMessageSink
+from domain.repositories.workspace_repository import WorkspaceRepository
 
 
 class MessageRepository:
     def __init__(self, session:Session):
         self.session = session
 
+    # rows fetched per round trip when streaming a whole history
+    STREAM_BATCH_SIZE = 1000
+
     def get_messages(self, workspace_id: str):
-        return self.session.query(MessageModel).filter_by(workspace_id=workspace_id).order_by(MessageModel.created_at.asc()).all()
+        return self.session.query(MessageModel).filter_by(workspace_id=workspace_id).order_by(MessageModel.message_id.asc()).all()
+
+    def get_page(self, workspace_id: str, limit: int, before: int = None, after: int = None) -> list[MessageModel]:
+        """
+        a page of at most limit messages in message_id order, seeking on the (workspace_id, message_id) index
+            after:  messages following this message_id
+            before: messages preceding this message_id, the ones closest to it when after is not given
+        """
+        query = self.session.query(MessageModel).filter(MessageModel.workspace_id == workspace_id)
+        if after is not None:
+            query = query.filter(MessageModel.message_id > after)
+        if before is not None:
+            query = query.filter(MessageModel.message_id < before)
+
+        if before is not None and after is None:
+            # read backwards from the cursor, return in chronological order
+            messages = query.order_by(MessageModel.message_id.desc()).limit(limit).all()
+            messages.reverse()
+            return messages
+        return query.order_by(MessageModel.message_id.asc()).limit(limit).all()
+
+    def stream_messages(self, workspace_id: str, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[MessageModel]:
+        """every message of a workspace through a server side cursor, memory stays constant however long the history"""
+        return self.session.query(MessageModel)\
+            .filter(MessageModel.workspace_id == workspace_id)\
+            .order_by(MessageModel.message_id.asc())\
+            .yield_per(batch_size)
+
+    def get_messages_after(self, workspace_id: str, message_id: int):
+        """messages added to a workspace after message_id, used to bring a cached agent up to date"""
+        return (self.session.query(MessageModel)
+                .filter(MessageModel.workspace_id == workspace_id, MessageModel.message_id > message_id)
+                .order_by(MessageModel.message_id.asc())
+                .all())
 
-    def create_message(self, workspace_id:str, role:MessageModel, message:str):
+    def create_message(self, workspace_id:str, role:MessageModel, message:str) -> MessageModel:
         message = MessageModel(workspace_id, role, message)
         self.session.add(message)
+        WorkspaceRepository(self.session).touch(workspace_id)
         self.session.commit()
+        return message
+
+    def create_sink(self) -> MessageSink:
+        """a buffer for the messages of one agent turn, written in a single transaction"""
+        return MessageSink(self.session)
+
+
+class AsyncMessageRepository:
+    """MessageRepository on an AsyncSession, queries run with run_sync so they do not block the event loop"""
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_messages(self, workspace_id: str):
+        return await self.session.run_sync(lambda s: MessageRepository(s).get_messages(workspace_id))
+
+    async def get_messages_after(self, workspace_id: str, message_id: int):
+        return await self.session.run_sync(lambda s: MessageRepository(s).get_messages_after(workspace_id, message_id))
 
+    async def create_message(self, workspace_id: str, role: MessageModel, message: str) -> MessageModel:
+        return await self.session.run_sync(lambda s: MessageRepository(s).create_message(workspace_id, role, message))
 
+    def create_sink(self) -> AsyncMessageSink:
+        return AsyncMessageSink(self.session)
@@ -0,0 +1,65 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api.models import MessageModel
+from domain.models.agent_span import AgentSpan
+from domain.repositories.span_repository import SpanRepository
+from domain.repositories.workspace_repository import WorkspaceRepository
+
+
+class MessageSink:
+    """
+    Unit of work for the messages of one agent turn.  Events are buffered while the agent runs and written with the
+    final response and the spans in a single transaction, so the agent loop never waits on a commit and a turn costs
+    one round trip to the database instead of one per event.
+
+    Durability:
+        - the user message is committed before the turn starts and is never lost
+        - buffered messages are written when the turn ends, also when it raises (flush from a finally block)
+        - the flush is all or nothing, a failed flush rolls back and writes none of the turn's messages
+        - if the process dies during a turn, the messages buffered for that turn are lost
+        - message ids and created_at follow the order the events were added
+    """
+    def __init__(self, session: Session):
+        self.session = session
+        self.messages: list[MessageModel] = []
+        self.spans: list[tuple[str, int | None, list[AgentSpan]]] = []
+
+    def add_message(self, workspace_id: str, role: str, message: str) -> MessageModel:
+        """buffers a message, its message_id is set by the flush"""
+        record = MessageModel(workspace_id, role, message)
+        self.messages.append(record)
+        return record
+
+    def add_spans(self, workspace_id: str, message_id: int | None, spans: list[AgentSpan]):
+        self.spans.append((workspace_id, message_id, spans))
+
+    def flush(self) -> list[MessageModel]:
+        """writes everything buffered in one transaction"""
+        return self.write(self.session)
+
+    def write(self, session: Session) -> list[MessageModel]:
+        if not self.messages and not self.spans:
+            return []
+        messages, spans = self.messages, self.spans
+        self.messages, self.spans = [], []
+        try:
+            session.add_all(messages)
+            for workspace_id, message_id, turn_spans in spans:
+                SpanRepository(session).add_spans(workspace_id, message_id, turn_spans)
+            for workspace_id in {message.workspace_id for message in messages}:
+                WorkspaceRepository(session).touch(workspace_id)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return messages
+
+
+class AsyncMessageSink(MessageSink):
+    """MessageSink on an AsyncSession, the flush runs with run_sync"""
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+
+    async def flush(self) -> list[MessageModel]:
+        return await self.session.run_sync(self.write)
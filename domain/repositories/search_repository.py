@@ -0,0 +1,81 @@
+import os
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from domain.services.transcript_segments import format_timestamp
+
+
+class SearchRepository:
+    """
+    Full text search over every stored video, see the tsvector columns on videos and transcript_segments.
+
+    Matching runs on the GIN indexes.  Ranking is limited to MAX_CANDIDATES matches so a common term does not rank
+    a million segments, and the snippets (ts_headline re-parses the text) are only built for the page returned.
+    """
+    MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 10000))
+    HEADLINE_OPTIONS = 'StartSel=<b>, StopSel=</b>, MaxWords=25, MinWords=10, MaxFragments=2'
+
+    SEARCH_SEGMENTS = text("""
+        WITH q AS (SELECT websearch_to_tsquery('english', :query) AS query),
+        candidates AS (
+            SELECT s.segment_id, s.video_id, s.start_seconds, s.text, s.tsv
+            FROM transcript_segments s, q
+            WHERE s.tsv @@ q.query
+            LIMIT :max_candidates
+        ),
+        hits AS (
+            SELECT c.segment_id, c.video_id, c.start_seconds, c.text,
+                   ts_rank_cd(c.tsv, q.query) + ts_rank(v.search_tsv, q.query) AS rank
+            FROM candidates c JOIN videos v ON v.video_id = c.video_id, q
+            ORDER BY rank DESC, c.segment_id
+            LIMIT :limit OFFSET :offset
+        )
+        SELECT h.video_id, h.start_seconds, h.rank, v.title, v.channel, v.url,
+               ts_headline('english', h.text, q.query, :headline) AS snippet
+        FROM hits h JOIN videos v ON v.video_id = h.video_id, q
+        ORDER BY h.rank DESC, h.segment_id
+    """)
+
+    SEARCH_VIDEOS = text("""
+        SELECT v.video_id, v.title, v.channel, v.url, ts_rank(v.search_tsv, q.query) AS rank
+        FROM videos v, websearch_to_tsquery('english', :query) AS q(query)
+        WHERE v.search_tsv @@ q.query
+        ORDER BY rank DESC, v.video_id
+        LIMIT :limit
+    """)
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def search_segments(self, query: str, limit: int = 20, offset: int = 0) -> list[dict]:
+        """
+        transcript passages matching a web style query ("quoted phrases", -excluded, or), best first
+            [ { 'video_id': 12, 'title': '...', 'author': '...', 'url': '...', 'start_seconds': 95,
+                'timestamp': '01:35', 'snippet': '... <b>match</b> ...', 'rank': 0.42 }, ... ]
+        """
+        rows = self.session.execute(self.SEARCH_SEGMENTS, {
+            'query': query, 'limit': limit, 'offset': offset,
+            'max_candidates': self.MAX_CANDIDATES, 'headline': self.HEADLINE_OPTIONS
+        }).all()
+        return [
+            {
+                'video_id': row.video_id,
+                'title': row.title,
+                'author': row.channel,
+                'url': row.url,
+                'start_seconds': row.start_seconds,
+                'timestamp': format_timestamp(row.start_seconds),
+                'snippet': row.snippet,
+                'rank': round(float(row.rank), 4)
+            }
+            for row in rows
+        ]
+
+    def search_videos(self, query: str, limit: int = 10) -> list[dict]:
+        """videos whose title or channel match, best first"""
+        rows = self.session.execute(self.SEARCH_VIDEOS, {'query': query, 'limit': limit}).all()
+        return [
+            { 'video_id': row.video_id, 'title': row.title, 'author': row.channel, 'url': row.url, 'rank': round(float(row.rank), 4) }
+            for row in rows
+        ]
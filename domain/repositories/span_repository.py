@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api.models import AgentSpanModel
+from domain.models.agent_span import AgentSpan
+
+
+class SpanRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def save_spans(self, workspace_id: str, message_id: int | None, spans: list[AgentSpan]):
+        """saves the spans of one agent turn in a single transaction"""
+        self.add_spans(workspace_id, message_id, spans)
+        self.session.commit()
+
+    def add_spans(self, workspace_id: str, message_id: int | None, spans: list[AgentSpan]):
+        """adds the spans of a turn to the session, the caller commits"""
+        for seq, span in enumerate(spans):
+            record = AgentSpanModel(workspace_id=workspace_id, message_id=message_id, seq=seq, **span.to_dict())
+            record.started_at = datetime.fromisoformat(span.started_at)
+            self.session.add(record)
+
+    def get_spans(self, workspace_id: str, message_id: int) -> list[dict]:
+        records = self.session.query(AgentSpanModel)\
+            .filter_by(workspace_id=workspace_id, message_id=message_id)\
+            .order_by(AgentSpanModel.seq.asc()).all()
+        return [record.to_dict() for record in records]
+
+
+class AsyncSpanRepository:
+    """SpanRepository on an AsyncSession, queries run with run_sync so they do not block the event loop"""
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def save_spans(self, workspace_id: str, message_id: int | None, spans: list[AgentSpan]):
+        await self.session.run_sync(lambda s: SpanRepository(s).save_spans(workspace_id, message_id, spans))
+
+    async def get_spans(self, workspace_id: str, message_id: int) -> list[dict]:
+        return await self.session.run_sync(lambda s: SpanRepository(s).get_spans(workspace_id, message_id))
@@ -1,3 +1,4 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from api.models import VideoModel, WorkspaceVideoModel, UserModel
@@ -18,15 +19,21 @@ class UserRepository:
         self.session.commit()
 
     def get_videos(self, workspace_id):
-        workspace_videos = self.session.query(WorkspaceVideoModel).filter(WorkspaceVideoModel.workspace_id == workspace_id).all()
+        # only the start of the transcript is returned, the stored preview or the first characters of a row that
+        # is not compressed yet.  the compressed transcript is not read
+        preview = func.coalesce(VideoModel.transcript_preview, func.substr(VideoModel.transcript_text, 1, VideoModel.PREVIEW_LENGTH))
+        workspace_videos = self.session.query(VideoModel.url, preview.label('transcript'),
+                                              VideoModel.title, VideoModel.channel, WorkspaceVideoModel.summary)\
+            .join(VideoModel, VideoModel.video_id == WorkspaceVideoModel.video_id)\
+            .filter(WorkspaceVideoModel.workspace_id == workspace_id).all()
 
         result = []
         for record in workspace_videos:
             result.append({
-                'url': record.video.url,
-                'transcript': record.video.transcript[:100],
-                'title': record.video.title,
-                'author': record.video.channel,
+                'url': record.url,
+                'transcript': record.transcript,
+                'title': record.title,
+                'author': record.channel,
                 'summary': record.summary  # From junction table now
             })
         return result
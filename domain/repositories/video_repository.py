@@ -1,6 +1,18 @@
-from typing import Protocol
-from sqlalchemy.orm import Session
-from api.models import VideoModel, WorkspaceVideoModel
+import asyncio
+from typing import Callable, Protocol
+
+import numpy as np
+from sqlalchemy import tuple_, select, update, bindparam, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from api.models import VideoModel, WorkspaceVideoModel, VideoLshBucketModel, TranscriptSegmentModel
+from api.models.base import utcnow
+from domain.repositories.workspace_repository import WorkspaceRepository
+from domain.services.minhash import minhasher
+from domain.services.transcript_codec import transcript_codec
+from domain.services.transcript_segments import segment_transcript
+from domain.services.youtube_ids import canonical_video_id
 from logger_config import getLogger
 
 
@@ -17,6 +29,15 @@ class GetVideoArgsUrl(GetVideoArgs):
         if video is None: return None
         return video.to_dict()
 
+class GetVideoArgsYouTubeId(GetVideoArgs):
+    def __init__(self, youtube_id: str):
+        self.youtube_id = youtube_id
+
+    def execute(self, session: Session) -> dict | None:
+        video = session.query(VideoModel).filter_by(youtube_id=self.youtube_id).order_by(VideoModel.video_id).first()
+        if video is None: return None
+        return video.to_dict()
+
 class GetVideoArgsWorkspaceVideoId(GetVideoArgs):
     def __init__(self, workspace_id:str, video_id:int) -> VideoModel:
         self.workspace_id = workspace_id
@@ -25,51 +46,345 @@ class GetVideoArgsWorkspaceVideoId(GetVideoArgs):
 
     def execute(self, session: Session) -> dict | None:
         self.logger.debug(f"{self.workspace_id} / {self.video_id}")
-        workspace_video = session.query(WorkspaceVideoModel).filter_by(workspace_id=self.workspace_id, video_id=self.video_id).first()
+        workspace_video = session.query(WorkspaceVideoModel)\
+            .options(joinedload(WorkspaceVideoModel.video).defer(VideoModel.minhash))\
+            .filter_by(workspace_id=self.workspace_id, video_id=self.video_id).first()
         return workspace_video.to_dict()
 
 
 class VideoRepository:
+    # estimated Jaccard similarity above which two transcripts are treated as the same content
+    NEAR_DUPLICATE_THRESHOLD = 0.8
+
+    # called with the workspace id once a change to its videos or summaries is committed, in this process.  caches of
+    # data read from the workspace (ToolResultCache) register here
+    on_change: list[Callable[[str], None]] = []
+
     def __init__(self, session: Session):
         self.session = session
     def test(self, arg: GetVideoArgs):
         pass
 
-    def save_video(self, workspace_id:str, video:dict) -> int:
-
-        # get video
-        videomodel = self.session.query(VideoModel).filter_by(url=video["url"]).first()
-        # if video does not exist, create it
-        if not videomodel:
-            videomodel = VideoModel(url=video["url"], transcript=video["transcript"], title=video["title"], channel=video["author"])
-            self.session.add(videomodel)
-            self.session.flush()
-
-        # get workspace_video
-        workspace_video = self.session.query(WorkspaceVideoModel).filter_by(workspace_id=workspace_id, video_id=videomodel.video_id).first()
-        # if does not exist, create it
-        if not workspace_video:
-            wvm = WorkspaceVideoModel(workspace_id=workspace_id, video_id=videomodel.video_id)
-            self.session.add(wvm)
+    def save_video(self, workspace_id:str, video:dict, signatures: dict[str, np.ndarray | None] = None) -> int:
+        """
+        adds a video to a workspace, storing the video first when it is new.  when the record already has a video_id
+        (e.g. it came from get_video) only the workspace link is written.  signatures: MinHash signatures by url
+        computed by the caller, the others are computed here
+        """
+        video_id = video.get("video_id")
+        if video_id is None:
+            video_id = self._upsert_video(video, signatures)
+
+        self.session.execute(insert(WorkspaceVideoModel)
+                             .values(workspace_id=workspace_id, video_id=video_id, added_at=utcnow())
+                             .on_conflict_do_nothing(index_elements=[WorkspaceVideoModel.workspace_id, WorkspaceVideoModel.video_id]))
+        WorkspaceRepository(self.session).touch(workspace_id)
+        self.session.commit()
+        self._changed(workspace_id)
+
+        return video_id
+
+    def store_video(self, video:dict) -> int:
+        """stores a video without adding it to a workspace, returns the id of the new or of the existing row"""
+        return self._upsert_video(video)
+
+    def save_videos(self, workspace_id:str, videos:list[dict], signatures: dict[str, np.ndarray | None] = None) -> list[int]:
+        """
+        bulk save_video for batch ingest, returns the video ids in the order given.  the videos, their indexes and
+        the workspace links are written in a handful of statements however many videos there are
+        """
+        by_url = {video["url"]: video for video in videos}
+        ids = self.find_by_urls(list(by_url))
+
+        new = [video for url, video in by_url.items() if url not in ids]
+        if new:
+            signatures = {video["url"]: self._signature(video, signatures) for video in new}
+            rows = self.session.execute(
+                insert(VideoModel.__table__).on_conflict_do_nothing(index_elements=['url']).returning(VideoModel.url, VideoModel.video_id),
+                [self._video_values(video, signatures[video["url"]]) for video in new]).all()
+            inserted = dict(rows)
+            ids.update(inserted)
+            self._index_signatures([(video_id, signatures[url]) for url, video_id in inserted.items()])
+            self._index_segments([(video_id, by_url[url]["transcript"]) for url, video_id in inserted.items()])
+
+            missing = [url for url in by_url if url not in ids]
+            if missing:
+                # inserted by a concurrent transaction that committed after the insert started
+                ids.update(self.session.execute(select(VideoModel.url, VideoModel.video_id).where(VideoModel.url.in_(missing))).all())
+
+        self._link_videos(workspace_id, set(ids.values()))
+        WorkspaceRepository(self.session).touch(workspace_id)
+        self.session.commit()
+        self._changed(workspace_id)
+
+        return [ids[video["url"]] for video in videos]
+
+    def link_videos(self, workspace_id:str, video_ids:list[int]):
+        """adds stored videos to a workspace in one statement"""
+        self._link_videos(workspace_id, video_ids)
+        WorkspaceRepository(self.session).touch(workspace_id)
+        self.session.commit()
+        self._changed(workspace_id)
+
+    def save_summaries(self, workspace_id:str, summaries:list[tuple[int, str]]):
+        """bulk save_summary, [ (video_id, summary), ... ]"""
+        if not summaries: return
+        table = WorkspaceVideoModel.__table__
+        self.session.execute(
+            update(table).where(table.c.workspace_id == bindparam('w_id'), table.c.video_id == bindparam('v_id')).values(summary=bindparam('s')),
+            [{'w_id': workspace_id, 'v_id': video_id, 's': summary} for video_id, summary in summaries])
+        WorkspaceRepository(self.session).touch(workspace_id)
         self.session.commit()
+        self._changed(workspace_id)
 
-        return videomodel.video_id
+    def find_by_urls(self, urls:list[str]) -> dict[str, int]:
+        """stored videos by url, { url: video_id }"""
+        return dict(self.session.execute(select(VideoModel.url, VideoModel.video_id).where(VideoModel.url.in_(urls))).all())
+
+    def find_by_youtube_ids(self, youtube_ids:list[str]) -> dict[str, int]:
+        """stored videos by canonical YouTube id, { youtube_id: video_id }"""
+        rows = self.session.execute(select(VideoModel.youtube_id, VideoModel.video_id)
+                                    .where(VideoModel.youtube_id.in_(youtube_ids))
+                                    .order_by(VideoModel.video_id)).all()
+        found = {}
+        for youtube_id, video_id in rows:
+            found.setdefault(youtube_id, video_id)
+        return found
+
+    def _link_videos(self, workspace_id:str, video_ids):
+        links = [{'workspace_id': workspace_id, 'video_id': video_id, 'added_at': utcnow()} for video_id in video_ids]
+        if links:
+            self.session.execute(insert(WorkspaceVideoModel.__table__).on_conflict_do_nothing(index_elements=['workspace_id', 'video_id']), links)
+
+    def _upsert_video(self, video: dict, signatures: dict[str, np.ndarray | None] = None) -> int:
+        """
+        the id of the stored video with this url, inserted with INSERT ... ON CONFLICT (url) DO NOTHING when there is
+        none.  the transcript is compressed and signed only once the url is known to be new
+        """
+        video_id = self.session.execute(select(VideoModel.video_id).where(VideoModel.url == video["url"])).scalar()
+        if video_id is not None:
+            return video_id
+
+        signature = self._signature(video, signatures)
+        video_id = self.session.execute(insert(VideoModel.__table__).values(**self._video_values(video, signature))
+                                        .on_conflict_do_nothing(index_elements=['url'])
+                                        .returning(VideoModel.video_id)).scalar()
+        if video_id is None:
+            # inserted by a concurrent transaction after the lookup
+            return self.session.execute(select(VideoModel.video_id).where(VideoModel.url == video["url"])).scalar_one()
+        self._index_signatures([(video_id, signature)])
+        self._index_segments([(video_id, video["transcript"])])
+        return video_id
+
+    @staticmethod
+    def _signature(video: dict, signatures: dict[str, np.ndarray | None] | None) -> np.ndarray | None:
+        if signatures is not None and video["url"] in signatures:
+            return signatures[video["url"]]
+        return minhasher.signature(video["transcript"])
+
+    @staticmethod
+    def _video_values(video: dict, signature: np.ndarray | None) -> dict:
+        return {
+            'url': video["url"],
+            'youtube_id': canonical_video_id(video["url"]),
+            'transcript_z': transcript_codec.compress(video["transcript"]),
+            'transcript_preview': video["transcript"][:VideoModel.PREVIEW_LENGTH],
+            'title': video["title"],
+            'channel': video["author"],
+            'minhash': minhasher.to_bytes(signature) if signature is not None else None,
+            'created_at': utcnow()
+        }
 
     def save_summary(self, workspace_id:str, video_id:int, summary:str):
         workspace_video = self.session.query(WorkspaceVideoModel).filter_by(workspace_id=workspace_id, video_id=video_id).first()
         workspace_video.summary = summary
 
         # add is not needed since this is an existing record
+        WorkspaceRepository(self.session).touch(workspace_id)
         self.session.commit()
+        self._changed(workspace_id)
+
+    @staticmethod
+    def _changed(workspace_id: str):
+        for listener in VideoRepository.on_change:
+            listener(str(workspace_id))
 
-    def get_videos(self, workspace_id):
-        workspace_videos = self.session.query(WorkspaceVideoModel).filter(WorkspaceVideoModel.workspace_id == workspace_id).all()
+    def get_videos(self, workspace_id, video_ids: list[int] = None):
+        """
+        the videos of a workspace with their transcripts, in one joined query.  oldest first, the agent's context is
+        built in this order and a stable order keeps its cached prompt prefix valid from one turn to the next
+        """
+        query = self.session.query(WorkspaceVideoModel)\
+            .options(joinedload(WorkspaceVideoModel.video).defer(VideoModel.minhash))\
+            .filter(WorkspaceVideoModel.workspace_id == workspace_id)
+        if video_ids is not None:
+            query = query.filter(WorkspaceVideoModel.video_id.in_(video_ids))
+        workspace_videos = query.order_by(WorkspaceVideoModel.added_at.asc(), WorkspaceVideoModel.video_id.asc()).all()
 
         result = []
         for record in workspace_videos:
             result.append(record.to_dict())
         return result
 
+    def list_videos(self, workspace_id) -> list[dict]:
+        """
+        lightweight listing of the videos in a workspace, transcripts and summaries are not read
+            [ { 'video_id': 12, 'title': '...', 'author': '...', 'has_summary': True }, ... ]
+        """
+        rows = self.session.query(WorkspaceVideoModel.video_id, VideoModel.title, VideoModel.channel,
+                                  WorkspaceVideoModel.summary.isnot(None).label('has_summary'))\
+            .join(VideoModel, VideoModel.video_id == WorkspaceVideoModel.video_id)\
+            .filter(WorkspaceVideoModel.workspace_id == workspace_id)\
+            .order_by(WorkspaceVideoModel.added_at.asc()).all()
+        return [
+            { 'video_id': row.video_id, 'title': row.title, 'author': row.channel, 'has_summary': row.has_summary }
+            for row in rows
+        ]
+
+    def get_video_states(self, workspace_id) -> dict[int, str | None]:
+        """
+        the videos of a workspace and a hash of their summary (None without one), without loading transcripts or
+        summaries.  tells what changed in the workspace's videos since an agent or a cache last read them
+            { 12: 'e4d909c290d0fb1ca068ffaddf22cbd0', 13: None }
+        """
+        rows = self.session.query(WorkspaceVideoModel.video_id, func.md5(WorkspaceVideoModel.summary).label('summary_md5'))\
+            .filter(WorkspaceVideoModel.workspace_id == workspace_id).all()
+        return {row.video_id: row.summary_md5 for row in rows}
+
     def get_video(self, arg: GetVideoArgs) -> dict:
         return arg.execute(self.session)
 
+    def find_near_duplicates(self, video_id: int, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> list[dict]:
+        """
+        returns the videos whose transcript is a near duplicate of this video, most similar first
+            [ { 'video_id': 12, 'similarity': 0.97 }, ... ]
+        """
+        videomodel = self.session.query(VideoModel).filter_by(video_id=video_id).first()
+        if videomodel is None: return []
+
+        if videomodel.minhash is None:
+            # rows ingested before signatures existed are indexed on first use
+            signature = minhasher.signature(videomodel.transcript)
+            if signature is None:
+                # too short to compare, never a duplicate
+                return []
+            self.store_signature(video_id, signature)
+        else:
+            signature = minhasher.from_bytes(videomodel.minhash)
+            if minhasher.is_empty(signature):
+                return []
+
+        candidates = self.session.query(VideoModel.video_id, VideoModel.minhash)\
+            .join(VideoLshBucketModel, VideoLshBucketModel.video_id == VideoModel.video_id)\
+            .filter(tuple_(VideoLshBucketModel.band, VideoLshBucketModel.bucket).in_(minhasher.buckets(signature)))\
+            .filter(VideoModel.video_id != video_id)\
+            .distinct().all()
+        if len(candidates) == 0: return []
+
+        candidates = [candidate for candidate in candidates if not minhasher.is_empty(minhasher.from_bytes(candidate.minhash))]
+        if len(candidates) == 0: return []
+
+        similarities = minhasher.similarity(signature, np.vstack([minhasher.from_bytes(c.minhash) for c in candidates]))
+        result = [
+            { 'video_id': candidate.video_id, 'similarity': round(float(similarity), 3) }
+            for candidate, similarity in zip(candidates, similarities) if similarity >= threshold
+        ]
+        return sorted(result, key=lambda r: r['similarity'], reverse=True)
+
+    def get_unsigned_transcript(self, video_id: int) -> str | None:
+        """the transcript of a video stored without a MinHash signature, None if it has one (or does not exist)"""
+        videomodel = self.session.query(VideoModel).filter(VideoModel.video_id == video_id, VideoModel.minhash.is_(None)).first()
+        return videomodel.transcript if videomodel is not None else None
+
+    def store_signature(self, video_id: int, signature: np.ndarray | None):
+        """stores and indexes the signature of a video saved without one"""
+        if signature is None:
+            return
+        self.session.execute(update(VideoModel).where(VideoModel.video_id == video_id).values(minhash=minhasher.to_bytes(signature)))
+        self._index_signatures([(video_id, signature)])
+        self.session.commit()
+
+    def get_reusable_summary(self, video_id: int) -> str | None:
+        """returns the most recent summary of this video from any workspace"""
+        record = self.session.query(WorkspaceVideoModel.summary)\
+            .filter(WorkspaceVideoModel.video_id == video_id, WorkspaceVideoModel.summary.isnot(None))\
+            .order_by(WorkspaceVideoModel.added_at.desc()).first()
+        return record.summary if record else None
+
+    def index_segments(self, video_id: int):
+        """splits a stored transcript into search segments, for videos saved before search existed"""
+        videomodel = self.session.query(VideoModel).filter_by(video_id=video_id).first()
+        self.session.query(TranscriptSegmentModel).filter_by(video_id=video_id).delete()
+        self._index_segments([(video_id, videomodel.transcript)])
+        self.session.commit()
+
+    def _index_segments(self, transcripts: list[tuple[int, str]]):
+        # search segments in one multi-row insert, Postgres generates their tsvector
+        segments = [
+            {'video_id': video_id, 'start_seconds': start, 'text': text}
+            for video_id, transcript in transcripts for start, text in segment_transcript(transcript)
+        ]
+        if segments:
+            self.session.execute(insert(TranscriptSegmentModel.__table__), segments)
+
+    def _index_signatures(self, signatures: list[tuple[int, np.ndarray | None]]):
+        # videos without a signature are not indexed, they are never near duplicates
+        buckets = [
+            {'band': band, 'bucket': bucket, 'video_id': video_id}
+            for video_id, signature in signatures if signature is not None for band, bucket in minhasher.buckets(signature)
+        ]
+        if buckets:
+            self.session.execute(insert(VideoLshBucketModel.__table__), buckets)
+
+
+class AsyncVideoRepository:
+    """
+    VideoRepository on an AsyncSession.  run_sync calls the sync repository on the event loop's thread, between
+    awaits on the database, so CPU work (MinHash signatures of transcripts) is done in a worker thread beforehand
+    """
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def save_video(self, workspace_id: str, video: dict) -> int:
+        signatures = await self._signatures([video])
+        return await self.session.run_sync(lambda s: VideoRepository(s).save_video(workspace_id, video, signatures))
+
+    async def save_videos(self, workspace_id: str, videos: list[dict]) -> list[int]:
+        signatures = await self._signatures(videos)
+        return await self.session.run_sync(lambda s: VideoRepository(s).save_videos(workspace_id, videos, signatures))
+
+    async def _signatures(self, videos: list[dict]) -> dict[str, np.ndarray | None]:
+        # only videos whose url is not stored yet are signed, the others keep their row
+        urls = {video["url"] for video in videos if video.get("video_id") is None}
+        if urls:
+            stored = await self.session.run_sync(lambda s: VideoRepository(s).find_by_urls(list(urls)))
+            urls -= stored.keys()
+        if not urls:
+            return {}
+        new = {video["url"]: video["transcript"] for video in videos if video["url"] in urls}
+        return await asyncio.to_thread(lambda: {url: minhasher.signature(transcript) for url, transcript in new.items()})
+
+    async def save_summary(self, workspace_id: str, video_id: int, summary: str):
+        await self.session.run_sync(lambda s: VideoRepository(s).save_summary(workspace_id, video_id, summary))
+
+    async def get_videos(self, workspace_id, video_ids: list[int] = None) -> list[dict]:
+        return await self.session.run_sync(lambda s: VideoRepository(s).get_videos(workspace_id, video_ids))
+
+    async def list_videos(self, workspace_id) -> list[dict]:
+        return await self.session.run_sync(lambda s: VideoRepository(s).list_videos(workspace_id))
+
+    async def get_video_states(self, workspace_id) -> dict[int, str | None]:
+        return await self.session.run_sync(lambda s: VideoRepository(s).get_video_states(workspace_id))
+
+    async def get_video(self, arg: GetVideoArgs) -> dict:
+        return await self.session.run_sync(lambda s: VideoRepository(s).get_video(arg))
+
+    async def find_near_duplicates(self, video_id: int, threshold: float = VideoRepository.NEAR_DUPLICATE_THRESHOLD) -> list[dict]:
+        transcript = await self.session.run_sync(lambda s: VideoRepository(s).get_unsigned_transcript(video_id))
+        if transcript is not None:
+            signature = await asyncio.to_thread(minhasher.signature, transcript)
+            await self.session.run_sync(lambda s: VideoRepository(s).store_signature(video_id, signature))
+        return await self.session.run_sync(lambda s: VideoRepository(s).find_near_duplicates(video_id, threshold))
+
+    async def get_reusable_summary(self, video_id: int) -> str | None:
+        return await self.session.run_sync(lambda s: VideoRepository(s).get_reusable_summary(video_id))
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from sqlalchemy import select, update, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api.models import WorkspaceModel
+from api.models.base import utcnow
+
+
+class WorkspaceRepository:
+    """
+    Workspace versions: every write to a workspace, its messages or its videos bumps the version in the same
+    transaction, so a client can tell a workspace has not changed from one small primary key read.
+    """
+    def __init__(self, session: Session):
+        self.session = session
+
+    def touch(self, workspace_id: str):
+        """bumps the version of a workspace.  runs in the caller's transaction, call it before the commit"""
+        self.session.execute(update(WorkspaceModel).where(WorkspaceModel.workspace_id == workspace_id)
+                             .values(version=WorkspaceModel.version + 1, updated_at=utcnow())
+                             .execution_options(synchronize_session=False))
+
+    def get_version(self, workspace_id: str) -> tuple[int, datetime] | None:
+        """(version, updated_at) of a workspace, None if it does not exist"""
+        row = self.session.execute(select(WorkspaceModel.version, WorkspaceModel.updated_at)
+                                   .where(WorkspaceModel.workspace_id == workspace_id)).first()
+        return tuple(row) if row else None
+
+    def get_user_id(self, workspace_id: str) -> int | None:
+        """the owner of a workspace, None if it does not exist"""
+        return self.session.execute(select(WorkspaceModel.user_id).where(WorkspaceModel.workspace_id == workspace_id)).scalar()
+
+    def get_list_version(self) -> tuple[int, datetime]:
+        """
+        (version, updated_at) of the list of workspaces: bumped when one is added, removed or written to, by a trigger
+        on workspaces (database/schema.sql)
+        """
+        row = self.session.execute(text("SELECT version, updated_at FROM workspace_list_version WHERE id = 1")).one()
+        return tuple(row)
+
+class AsyncWorkspaceRepository:
+    """WorkspaceRepository on an AsyncSession, queries run with run_sync so they do not block the event loop"""
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def touch(self, workspace_id: str):
+        await self.session.run_sync(lambda s: WorkspaceRepository(s).touch(workspace_id))
+
+    async def get_version(self, workspace_id: str) -> tuple[int, datetime] | None:
+        return await self.session.run_sync(lambda s: WorkspaceRepository(s).get_version(workspace_id))
+
+    async def get_user_id(self, workspace_id: str) -> int | None:
+        return await self.session.run_sync(lambda s: WorkspaceRepository(s).get_user_id(workspace_id))
@@ -0,0 +1,241 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from logger_config import getLogger
+
+logger = getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """the turn was not admitted: the queue is full or the turn waited too long.  retry_after is in seconds"""
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class Ticket:
+    """
+    A turn's place in the admission queue.  Enter it to wait until the turn may run, the slot is released on exit:
+
+        async with controller.enqueue(user_id, workspace_id):
+            await ws.send_message(...)
+    """
+    controller: 'AdmissionController'
+    user_id: int
+    workspace_id: str
+    cost: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+
+    async def __aenter__(self) -> 'Ticket':
+        try:
+            await asyncio.wait_for(asyncio.shield(self.future), self.controller.queue_timeout)
+        except BaseException as e:
+            if self.future.done() and not self.future.cancelled():
+                # admitted while the wait was being cancelled, give the slot back
+                self.controller.release(self)
+            else:
+                self.controller.withdraw(self)
+            if isinstance(e, asyncio.TimeoutError):
+                self.controller.timed_out += 1
+                raise AdmissionRejected("the turn waited too long to start", self.controller.retry_after()) from None
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.controller.release(self)
+
+    def cancel(self):
+        """gives up a ticket that will not be entered"""
+        if self.future.done() and not self.future.cancelled():
+            self.controller.release(self)
+        else:
+            self.controller.withdraw(self)
+
+
+class AdmissionController:
+    """
+    Admission for chat turns.  A turn runs once its workspace has no other turn running (two turns would interleave
+    their writes to one history), its user is under MAX_PER_USER running turns and fewer than MAX_IN_FLIGHT turns run
+    in the process, which bounds the load put on Anthropic.
+
+    Waiting turns are queued per user and started in deficit round robin order: every user with a waiting turn earns
+    QUANTUM per round and spends a turn's cost to start it, so a user who sends a burst waits behind their own turns
+    instead of in front of everybody else's.  A user whose turns cannot start (at their cap, or their workspaces are
+    busy) is skipped without earning credit.  When MAX_QUEUED turns wait, or a user has MAX_QUEUED_PER_USER waiting,
+    new turns are rejected so the API can answer 429 right away.
+
+    The limits hold per API process, each worker has its own controller.  Runs on the event loop, not thread safe.
+    """
+    MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 16))
+    MAX_PER_USER = int(os.getenv('ADMISSION_MAX_PER_USER', 2))
+    MAX_QUEUED = int(os.getenv('ADMISSION_MAX_QUEUED', 64))
+    MAX_QUEUED_PER_USER = int(os.getenv('ADMISSION_MAX_QUEUED_PER_USER', 8))
+    QUEUE_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_SECONDS', 60))
+    QUANTUM = 1
+    SLOW_WAIT_SECONDS = 1.0
+    WAIT_SAMPLES = 1000     # recent queue waits kept for the percentiles
+
+    _shared: 'AdmissionController | None' = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_per_user: int = MAX_PER_USER, max_queued: int = MAX_QUEUED,
+                 max_queued_per_user: int = MAX_QUEUED_PER_USER, queue_timeout: float = QUEUE_TIMEOUT_SECONDS, quantum: int = QUANTUM):
+        self.max_in_flight = max_in_flight
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.quantum = quantum
+
+        self.queues: dict[int, deque[Ticket]] = {}     # waiting tickets per user
+        self.active: deque[int] = deque()              # users with waiting tickets, in round robin order
+        self.deficits: dict[int, int] = {}
+        self.serving = False                           # the user at the head of active has earned this round's quantum
+        self.queued = 0
+        self.in_flight = 0
+        self.running_users: dict[int, int] = {}
+        self.running_workspaces: set[str] = set()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.waits: deque[float] = deque(maxlen=self.WAIT_SAMPLES)
+        self.turn_seconds_avg = 0.0     # moving average, for Retry-After
+
+    @classmethod
+    def shared(cls) -> 'AdmissionController':
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def enqueue(self, user_id: int, workspace_id: str, cost: int = 1) -> Ticket:
+        """queues a turn, started right away when it can.  raises AdmissionRejected when the queue is full"""
+        queue = self.queues.get(user_id)
+        if self.queued >= self.max_queued or (queue is not None and len(queue) >= self.max_queued_per_user):
+            self.rejected += 1
+            raise AdmissionRejected("too many turns are waiting", self.retry_after())
+
+        ticket = Ticket(self, user_id, str(workspace_id), cost, asyncio.get_running_loop().create_future())
+        if queue is None:
+            queue = self.queues[user_id] = deque()
+            self.active.append(user_id)
+            self.deficits[user_id] = 0
+        queue.append(ticket)
+        self.queued += 1
+        self._dispatch()
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """a running turn is over"""
+        if ticket.started_at is None:
+            return
+        self.in_flight -= 1
+        self.running_users[ticket.user_id] -= 1
+        if self.running_users[ticket.user_id] == 0:
+            del self.running_users[ticket.user_id]
+        self.running_workspaces.discard(ticket.workspace_id)
+        self.turn_seconds_avg = 0.9 * self.turn_seconds_avg + 0.1 * (time.monotonic() - ticket.started_at)
+        ticket.started_at = None
+        self._dispatch()
+
+    def withdraw(self, ticket: Ticket):
+        """takes a turn that has not started out of the queue"""
+        queue = self.queues.get(ticket.user_id)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        self.queued -= 1
+        if not queue:
+            self._drop_user(ticket.user_id)
+        self._dispatch()
+
+    def _dispatch(self):
+        blocked = 0
+        while self.active and self.in_flight < self.max_in_flight and blocked < len(self.active):
+            user_id = self.active[0]
+            ticket = self._startable(user_id)
+            if ticket is None:
+                blocked += 1
+                self._next_user()
+                continue
+            blocked = 0
+            if not self.serving:
+                self.deficits[user_id] += self.quantum
+                self.serving = True
+            if ticket.cost > self.deficits[user_id]:
+                self._next_user()
+                continue
+            self.deficits[user_id] -= ticket.cost
+            self._start(ticket)
+            if not self.queues[user_id]:
+                self._drop_user(user_id)
+
+    def _startable(self, user_id: int) -> Ticket | None:
+        """the user's oldest waiting turn that may start now"""
+        if self.running_users.get(user_id, 0) >= self.max_per_user:
+            return None
+        for ticket in self.queues[user_id]:
+            if ticket.workspace_id not in self.running_workspaces:
+                return ticket
+        return None
+
+    def _start(self, ticket: Ticket):
+        self.queues[ticket.user_id].remove(ticket)
+        self.queued -= 1
+        self.in_flight += 1
+        self.running_users[ticket.user_id] = self.running_users.get(ticket.user_id, 0) + 1
+        self.running_workspaces.add(ticket.workspace_id)
+        ticket.started_at = time.monotonic()
+        self.record_wait(ticket.started_at - ticket.enqueued_at)
+        self.admitted += 1
+        ticket.future.set_result(None)
+
+    def _next_user(self):
+        self.serving = False
+        self.active.rotate(-1)
+
+    def _drop_user(self, user_id: int):
+        # a user with nothing waiting leaves the round and does not bank credit
+        if self.active and self.active[0] == user_id:
+            self.serving = False
+        self.active.remove(user_id)
+        del self.queues[user_id]
+        del self.deficits[user_id]
+
+    def record_wait(self, seconds: float):
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        self.waits.append(seconds)
+        if seconds > self.SLOW_WAIT_SECONDS:
+            logger.info(f"turn waited {seconds:.2f}s to start, {self.in_flight} running, {self.queued} queued")
+
+    def retry_after(self) -> int:
+        """seconds until the queue has likely moved on, for the Retry-After header"""
+        rounds = (self.queued + 1) / max(self.max_in_flight, 1)
+        return max(1, math.ceil(rounds * max(self.turn_seconds_avg, 1.0)))
+
+    def stats(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'users_waiting': len(self.active),
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'wait_ms_avg': round(self.wait_seconds_total * 1000 / self.admitted, 3) if self.admitted else 0.0,
+            'wait_ms_p95': round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0,
+            'wait_ms_max': round(self.wait_seconds_max * 1000, 3),
+            'turn_seconds_avg': round(self.turn_seconds_avg, 3)
+        }
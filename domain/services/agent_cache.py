@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from logger_config import getLogger
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class AgentCacheEntry:
+    """
+    A live agent for a workspace and what it has already seen, so the next turn only loads what changed.
+    """
+    agent: Any                      # ChatAgent or AsyncChatAgent
+    last_message_id: int            # messages up to this id are in the agent's history
+    seen_message_ids: set[int] = field(default_factory=set)     # later messages already in it, its own last turn
+    # videos in the agent's context and the hash of their summary, see VideoRepository.get_video_states
+    video_states: dict[int, str | None] = field(default_factory=dict)
+    size_bytes: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class AgentCache:
+    """
+    Bounded LRU of live per-workspace agents.  Building an agent reloads every message and transcript and constructs
+    the Claude, YouTube and summary clients, a warm agent skips all of that.
+
+    Entries are checked out for the duration of a turn, so two concurrent turns never share an agent: the second one
+    builds a cold agent and whichever finishes last is kept.  Idle entries are evicted lazily on every checkout and
+    checkin, and the cache is bounded by entry count and by an estimate of the memory held by the agents.
+    """
+    MAX_ENTRIES = int(os.getenv('AGENT_CACHE_SIZE', 64))
+    IDLE_SECONDS = float(os.getenv('AGENT_CACHE_IDLE_SECONDS', 900))
+    MAX_BYTES = int(os.getenv('AGENT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    MAX_ENTRY_BYTES = int(os.getenv('AGENT_CACHE_MAX_ENTRY_BYTES', 32 * 1024 * 1024))
+
+    _shared: 'AgentCache | None' = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, idle_seconds: float = IDLE_SECONDS,
+                 max_bytes: int = MAX_BYTES, max_entry_bytes: int = MAX_ENTRY_BYTES):
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries: OrderedDict[str, AgentCacheEntry] = OrderedDict()   # least recently used first
+        self.size_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def shared(cls) -> 'AgentCache | None':
+        """the process wide cache, None when disabled with AGENT_CACHE_SIZE=0"""
+        if cls.MAX_ENTRIES <= 0:
+            return None
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def checkout(self, workspace_id: str) -> AgentCacheEntry | None:
+        """takes the warm agent of a workspace out of the cache, None if there is none"""
+        with self.lock:
+            self._evict_idle()
+            entry = self.entries.pop(str(workspace_id), None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.size_bytes -= entry.size_bytes
+            self.hits += 1
+            return entry
+
+    def checkin(self, workspace_id: str, entry: AgentCacheEntry):
+        """returns an agent to the cache after a turn"""
+        entry.size_bytes = entry.agent.estimated_size()
+        entry.last_used = time.monotonic()
+        if entry.size_bytes > self.max_entry_bytes:
+            logger.info(f"agent for workspace {workspace_id} holds {entry.size_bytes} bytes, not caching it")
+            return
+
+        with self.lock:
+            previous = self.entries.pop(str(workspace_id), None)
+            if previous is not None:
+                self.size_bytes -= previous.size_bytes
+            self.entries[str(workspace_id)] = entry
+            self.size_bytes += entry.size_bytes
+            self._evict_idle()
+            while len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                self._evict_oldest()
+
+    def evict(self, workspace_id: str):
+        with self.lock:
+            entry = self.entries.pop(str(workspace_id), None)
+            if entry is not None:
+                self.size_bytes -= entry.size_bytes
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self.entries and next(iter(self.entries.values())).last_used < cutoff:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        workspace_id, entry = self.entries.popitem(last=False)
+        self.size_bytes -= entry.size_bytes
+        self.evictions += 1
+        logger.debug(f"evicted agent for workspace {workspace_id}")
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size_bytes': self.size_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,105 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+"""
+MinHash signatures and LSH banding for transcripts.
+
+Two transcripts of the same content (re-uploads, mirrors) share most of their word shingles even when the
+timestamps, the title line or a few words differ.  The Jaccard similarity of the shingle sets is estimated by
+comparing MinHash signatures, and LSH banding lets us find candidate duplicates without comparing every pair.
+"""
+
+# the "Transcript for: {title}" line get_video puts first and [mm:ss] prefixes differ between re-uploads, they
+# are not part of the content
+_HEADER = re.compile(r'\ATranscript for: [^\n]*\n')
+_TIMESTAMP = re.compile(r'\[\d+:\d{2}\]')
+_WORD = re.compile(r'\w+')
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class MinHasher:
+    NUM_PERM = 128
+    SHINGLE_SIZE = 5
+    BANDS = 16      # 16 bands x 8 rows, candidates are pairs with a similarity above ~0.7
+    CHUNK = 4096    # shingles hashed per step, bounds memory at NUM_PERM x CHUNK x 8 bytes
+    MIN_SHINGLES = 20   # fewer says nothing about the content, and every empty transcript would match every other
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle_size: int = SHINGLE_SIZE, bands: int = BANDS, seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        # the permutations must be identical between processes, signatures are persisted.  a and b go up to the
+        # prime, so a * x wraps at 2^64 before the modulo: deliberate, the same as datasketch.  the wrapped product is
+        # still a fixed function of x per permutation, and drawing them below 2^32 would change every stored signature
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """32 bit hashes of the word shingles of a transcript"""
+        words = _WORD.findall(_TIMESTAMP.sub(' ', _HEADER.sub('', text, count=1)).lower())
+        if len(words) == 0:
+            return np.zeros(0, dtype=np.uint64)
+
+        word_hashes = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+        if len(words) < self.shingle_size:
+            window = word_hashes.reshape(1, -1)
+        else:
+            window = np.lib.stride_tricks.sliding_window_view(word_hashes, self.shingle_size)
+
+        # polynomial rolling hash of each window, overflow wraps (uint64) which is fine for hashing
+        powers = np.uint64(1000003) ** np.arange(window.shape[1], dtype=np.uint64)
+        shingles = (window * powers).sum(axis=1, dtype=np.uint64) & _MAX_HASH
+        return np.unique(shingles)
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """MinHash signature of a transcript, one uint32 per permutation.  None when it is too short to have one"""
+        hashes = self.shingle_hashes(text)
+        if len(hashes) < self.MIN_SHINGLES:
+            return None
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), self.CHUNK):
+            chunk = hashes[start:start + self.CHUNK]
+            # uint64 arithmetic wraps, see __init__
+            permuted = (np.outer(self.a, chunk) + self.b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def buckets(self, signature: np.ndarray) -> list[tuple[int, int]]:
+        """LSH (band, bucket) pairs of a signature, bucket is a signed 64 bit int so it fits a BIGINT column"""
+        bands = signature.reshape(self.bands, self.rows)
+        return [
+            (band, int.from_bytes(hashlib.blake2b(rows.tobytes(), digest_size=8).digest(), 'big', signed=True))
+            for band, rows in enumerate(bands)
+        ]
+
+    @staticmethod
+    def is_empty(signature: np.ndarray) -> bool:
+        """signatures stored before MIN_SHINGLES, of transcripts without a single shingle"""
+        return bool((signature == _MAX_HASH).all())
+
+    @staticmethod
+    def similarity(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+        """estimated Jaccard similarity between a signature and each row of others"""
+        return (np.atleast_2d(others) == signature).mean(axis=1)
+
+    @staticmethod
+    def to_bytes(signature: np.ndarray) -> bytes:
+        return signature.astype('<u4').tobytes()
+
+    @staticmethod
+    def from_bytes(data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype='<u4').astype(np.uint32)
+
+
+# shared instance, signatures are only comparable when computed with the same permutations
+minhasher = MinHasher()
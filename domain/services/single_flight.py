@@ -0,0 +1,51 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Runs a call once per key at a time: callers that ask for a key already in flight wait for that call's result
+    instead of making their own.  Nothing is kept once the call is done, the next caller runs it again.
+
+    Works from threads (do) and from the event loop (do_async), the two share the flights of a key.
+    """
+    def __init__(self):
+        self.flights: dict[Hashable, Future] = {}
+        self.lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn)
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """do with fn, a blocking call, run on a worker thread"""
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(None, self._run, key, future, fn)
+        # a cancelled caller stops waiting, the call goes on for the others
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return len(self.flights)
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self.lock:
+            future = self.flights.get(key)
+            if future is not None:
+                return future, False
+            future = self.flights[key] = Future()
+            return future, True
+
+    def _run(self, key: Hashable, future: Future, fn: Callable[[], Any]):
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.flights[key]
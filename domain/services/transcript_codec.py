@@ -0,0 +1,58 @@
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:     # optional, needed only with TRANSCRIPT_CODEC=zstd or to read rows written with it
+    zstandard = None
+
+
+class TranscriptCodec:
+    """
+    Compression of stored transcripts.  Transcripts are repetitive speech with a [mm:ss] prefix on every line and
+    shrink to a fraction of their size, which is what every read of a transcript moves off the database.
+
+    The first byte of the stored value names the codec, so rows written with zlib stay readable after switching to
+    zstd and the other way around.
+        0x01  zlib
+        0x02  zstd
+
+    New transcripts are written with zlib, set TRANSCRIPT_CODEC=zstd (and install zstandard) for zstd.
+    """
+    ZLIB = b'\x01'
+    ZSTD = b'\x02'
+    LEVEL_ZLIB = 9
+    LEVEL_ZSTD = 19     # compression happens once per video, reads are as fast at any level
+
+    CODECS = ('zlib', 'zstd')
+
+    def __init__(self, codec: str = None):
+        codec = codec or os.getenv('TRANSCRIPT_CODEC', 'zlib')
+        if codec not in self.CODECS:
+            raise ValueError(f"unknown transcript codec {codec!r}, expected one of {', '.join(self.CODECS)}")
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError("TRANSCRIPT_CODEC is zstd, install zstandard to use it")
+        self.codec = codec
+        if codec == 'zstd':
+            self.zstd_compressor = zstandard.ZstdCompressor(level=self.LEVEL_ZSTD)
+        self.zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+    def compress(self, text: str) -> bytes:
+        data = text.encode('utf-8')
+        if self.codec == 'zstd':
+            return self.ZSTD + self.zstd_compressor.compress(data)
+        return self.ZLIB + zlib.compress(data, self.LEVEL_ZLIB)
+
+    def decompress(self, value: bytes) -> str:
+        value = bytes(value)
+        codec, payload = value[:1], value[1:]
+        if codec == self.ZLIB:
+            return zlib.decompress(payload).decode('utf-8')
+        if codec == self.ZSTD:
+            if self.zstd_decompressor is None:
+                raise RuntimeError("transcript is compressed with zstd, install zstandard to read it")
+            return self.zstd_decompressor.decompress(payload).decode('utf-8')
+        raise ValueError(f"unknown transcript codec {codec!r}")
+
+
+transcript_codec = TranscriptCodec()
@@ -0,0 +1,38 @@
+import re
+
+# transcripts are formatted one caption per line, "[mm:ss] text", see youtube_service.get_video
+TIMESTAMP_LINE = re.compile(r'^\[(\d+):(\d{2})\]\s*(.*)$')
+
+# captions are grouped into windows of this many seconds, long enough to give a search hit some context,
+# short enough that the timestamp points close to the match
+SEGMENT_SECONDS = 30
+
+
+def segment_transcript(transcript: str, seconds: int = SEGMENT_SECONDS) -> list[tuple[int, str]]:
+    """
+    splits a transcript into windows of captions
+        [ (start_seconds, text), ... ]
+    lines without a timestamp (the "Transcript for:" header) are skipped
+    """
+    segments = []
+    start, lines = None, []
+    for line in transcript.splitlines():
+        match = TIMESTAMP_LINE.match(line.strip())
+        if match is None:
+            continue
+        offset = int(match.group(1)) * 60 + int(match.group(2))
+        if start is not None and offset - start >= seconds:
+            segments.append((start, ' '.join(lines)))
+            start, lines = None, []
+        if start is None:
+            start = offset
+        if match.group(3):
+            lines.append(match.group(3))
+
+    if start is not None and lines:
+        segments.append((start, ' '.join(lines)))
+    return [(start, text) for start, text in segments if text]
+
+
+def format_timestamp(seconds: int) -> str:
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from typing import AsyncIterator
+
+from domain.models.agent_event import AgentEvent
+
+
+class TurnStream:
+    """
+    The events of one agent turn, kept for replay: a client that reconnects with the id of the last event it got
+    receives everything after it, and any number of clients can follow the same turn.
+
+    The turn never waits for its clients.  Clients read the buffer at their own pace, and text deltas nobody has read
+    yet are merged into the last one, so a slow client gets fewer, larger deltas instead of growing a queue.
+    """
+    MAX_EVENTS = int(os.getenv('TURN_STREAM_MAX_EVENTS', 1000))   # oldest events are dropped beyond this
+
+    def __init__(self, turn_id: str, max_events: int = MAX_EVENTS):
+        self.turn_id = turn_id
+        self.max_events = max_events
+        self.events: list[tuple[int, AgentEvent]] = []
+        self.next_id = 0
+        self.delivered = -1     # highest event id any client has received
+        self.done = False
+        self.closed_at: float | None = None
+        self.changed = asyncio.Event()
+        self.task: asyncio.Task | None = None   # the turn, referenced so it is not garbage collected
+
+    def publish(self, event: AgentEvent):
+        if event.type == 'text_delta' and self.events:
+            last_id, last = self.events[-1]
+            if last.type == 'text_delta' and last_id > self.delivered:
+                last.data = {'text': last.data['text'] + event.data['text']}
+                self._notify()
+                return
+        self.events.append((self.next_id, event))
+        self.next_id += 1
+        if len(self.events) > self.max_events:
+            del self.events[0]
+        self._notify()
+
+    def close(self):
+        self.done = True
+        self.closed_at = time.monotonic()
+        self._notify()
+
+    async def subscribe(self, after: int = -1, keepalive_seconds: float = None) -> AsyncIterator[tuple[int, AgentEvent] | None]:
+        """
+        the events after event id after, then each new one as it is published, until the turn is done.
+        yields None when nothing happened for keepalive_seconds
+        """
+        while True:
+            pending = [(event_id, event) for event_id, event in self.events if event_id > after]
+            for event_id, event in pending:
+                self.delivered = max(self.delivered, event_id)
+                yield event_id, event
+                after = event_id
+            if pending:
+                continue
+            if self.done:
+                return
+            changed = self.changed
+            try:
+                await asyncio.wait_for(changed.wait(), keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield None
+
+    def _notify(self):
+        # wake the clients waiting on the current event, later waits use a fresh one
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class TurnStreams:
+    """
+    The turns of this process that clients can follow or reconnect to, kept RETAIN_SECONDS after they end.
+    Streams live in memory: a client reconnecting to another API process gets a 404 and reads the saved
+    messages instead.
+    """
+    RETAIN_SECONDS = int(os.getenv('TURN_STREAM_RETAIN_SECONDS', 300))
+
+    _shared: 'TurnStreams | None' = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, retain_seconds: int = RETAIN_SECONDS):
+        self.retain_seconds = retain_seconds
+        self.streams: dict[str, TurnStream] = {}
+
+    @classmethod
+    def shared(cls) -> 'TurnStreams':
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def create(self) -> TurnStream:
+        self._expire()
+        stream = TurnStream(uuid.uuid4().hex)
+        self.streams[stream.turn_id] = stream
+        return stream
+
+    def get(self, turn_id: str) -> TurnStream | None:
+        return self.streams.get(turn_id)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.retain_seconds
+        for turn_id in [turn_id for turn_id, stream in self.streams.items() if stream.done and stream.closed_at < cutoff]:
+            del self.streams[turn_id]
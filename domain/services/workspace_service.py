@@ -1,14 +1,17 @@
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Optional
 from pydantic import BaseModel
 from components.anthropic.role import Role
 from api.models import MessageModel
-from components.agents.chat_agent import ChatAgent
+from components.agents.chat_agent import ChatAgent, AsyncChatAgent
 from components.anthropic.chat_message import ChatMessage
 from components.services.youtube_service import YouTubeVideo
+from components.tool_result_cache import ToolResultCache
 from domain.models.agent_event import AgentEvent
-from domain.repositories.message_repository import MessageRepository
-from domain.repositories.video_repository import VideoRepository
+from domain.services.agent_cache import AgentCache, AgentCacheEntry
+from domain.repositories.message_repository import MessageRepository, AsyncMessageRepository
+from domain.repositories.span_repository import SpanRepository, AsyncSpanRepository
+from domain.repositories.video_repository import VideoRepository, AsyncVideoRepository
 from logger_config import  getLogger
 
 class CreateWorkspaceRequest(BaseModel):
@@ -25,53 +28,200 @@ class WorkspaceListResponse(BaseModel):
     workspaces: list[WorkspaceResponse]
 
 class WorkspaceService:
-    def __init__(self, message_repository:MessageRepository, video_repository:VideoRepository):
+    def __init__(self, message_repository:MessageRepository, video_repository:VideoRepository, span_repository:SpanRepository = None):
         self.message_repository = message_repository
         self.video_repository = video_repository
+        self.span_repository = span_repository
+        self.agent_cache = AgentCache.shared()
         self.logger = getLogger(__name__)
 
-    def getMessages(self, workspace_id, cursor):
-        return self.message_repository.get_messages(workspace_id)
+    def getMessages(self, workspace_id, limit: int = None, before: int = None, after: int = None):
+        """the whole history without a limit, a page of it otherwise, see MessageRepository.get_page"""
+        if limit is None:
+            return self.message_repository.get_messages(workspace_id)
+        return self.message_repository.get_page(workspace_id, limit, before=before, after=after)
 
     def send_message(self, workspace_id, message:str):
 
         def handle_event(event: AgentEvent):
             self.logger.debug(f"Message\nType:{event.type} \nMessage: {event.data}")
             if event.type in ('message','tool_use', 'tool_result'):
-                self.message_repository.create_message(workspace_id,
-                                                   MessageModel.ROLE_ASSISTANT,
-                                                   event.data)
+                # buffered, written with the rest of the turn
+                sink.add_message(workspace_id, MessageModel.ROLE_ASSISTANT, event.data)
             elif event.type == 'video_watched':
                 video = event.data
                 # we are saving the video in the chatapplication. the chat application and the workspace service are fighting for control
 #                self.video_repository.save_video(workspace_id, video)
 
             elif event.type == 'video_summarized':
+                # saved right away, a summary is expensive to redo and is read back within the turn
                 summary = event.data["summary"]
                 video_id = event.data["video_id"]
                 self.video_repository.save_summary(workspace_id, video_id, summary)
+            elif event.type == 'span':
+                # spans are saved together once the turn is complete
+                pass
             else: # event type is unknown
                 self.logger.info(f'unknown event type{event.type}')
 
-        # create + save message to send
-        self.message_repository.create_message(workspace_id, MessageModel.ROLE_USER, message)
+        # create + save message to send, it is committed before the turn starts
+        user_message = self.message_repository.create_message(workspace_id, MessageModel.ROLE_USER, message)
+        sink = self.message_repository.create_sink()
+
+        try:
+            # Ask Agent to take next step
+            entry = self.prepare_agent(workspace_id, user_message, handle_event)
+            agent_message = entry.agent.chat(message)
+
+            sink.add_message(workspace_id, MessageModel.ROLE_ASSISTANT, agent_message.final_response)
+            if self.span_repository:
+                sink.add_spans(workspace_id, user_message.message_id, agent_message.spans)
+        finally:
+            written = sink.flush()
+        self.checkin(self.agent_cache, workspace_id, entry, user_message.message_id, written)
+
+        return agent_message.final_response
+
+    def prepare_agent(self, workspace_id, user_message: MessageModel, on_event) -> AgentCacheEntry:
+        """the cached agent of the workspace brought up to date, or a new agent built from the database"""
+        video_states = self.video_repository.get_video_states(workspace_id)
+        # other workers and the job worker write to the workspace too
+        ToolResultCache.for_workspace(workspace_id).validate(video_states)
+
+        entry = self.agent_cache.checkout(workspace_id) if self.agent_cache else None
+        if entry is not None and not isinstance(entry.agent, AsyncChatAgent):
+            changed = self.changed_videos(entry, video_states)
+            if changed is not None:
+                messages = self.message_repository.get_messages_after(workspace_id, entry.last_message_id)
+                videos = self.video_repository.get_videos(workspace_id, changed) if changed else []
+                self.apply_delta(entry, messages, videos, video_states, user_message, on_event, self.video_repository)
+                return entry
+            # a video was removed from the workspace, the context has to be rebuilt
 
         # retrieve messages
         messages = self.message_repository.get_messages(workspace_id)
-        agent_messages = [ChatMessage(Role(message.role), message.content) for message in messages]
+        agent_messages = self.agent_messages(self.history(messages, user_message))
 
         # retrieve videos
         videos = self.video_repository.get_videos(workspace_id=workspace_id)
-        agent_context= [YouTubeVideo(url=video["url"], transcript=video["transcript"], title=video["title"], author=video["author"], publish_date="", video_duration=0) for video in videos]
-
-        # Ask Agent to take next step
-        agent = ChatAgent(agent_context, agent_messages, on_event=handle_event, workspace_id=workspace_id, video_repository=self.video_repository)
-        agent_message = agent.chat(message)
-
-        self.message_repository.create_message(workspace_id, MessageModel.ROLE_ASSISTANT, agent_message.final_response)
+        agent_context = self.agent_context(videos)
+
+        agent = ChatAgent(agent_context, agent_messages, on_event=on_event, workspace_id=workspace_id, video_repository=self.video_repository)
+        return AgentCacheEntry(agent, user_message.message_id, video_states=video_states)
+
+    @staticmethod
+    def changed_videos(entry: AgentCacheEntry, video_states: dict[int, str | None]) -> list[int] | None:
+        """the videos added or summarized since the agent's last turn, None when one was removed"""
+        if entry.video_states.keys() - video_states.keys():
+            return None
+        return [video_id for video_id, summary in video_states.items()
+                if video_id not in entry.video_states or entry.video_states[video_id] != summary]
+
+    @staticmethod
+    def apply_delta(entry: AgentCacheEntry, messages: list[MessageModel], videos: list[dict], video_states: dict[int, str | None],
+                    user_message: MessageModel, on_event, video_repository):
+        """adds the messages and videos written since the agent's last turn, e.g. by another worker"""
+        entry.agent.rebind(on_event, video_repository)
+        messages = [message for message in messages if message.message_id not in entry.seen_message_ids]
+        entry.agent.session.add_messages(WorkspaceService.agent_messages(WorkspaceService.history(messages, user_message)))
+        if videos:
+            entry.agent.session.refresh_context(WorkspaceService.agent_context(videos))
+        entry.video_states = video_states
+
+    @staticmethod
+    def checkin(agent_cache: AgentCache, workspace_id, entry: AgentCacheEntry, user_message_id: int, written: list[MessageModel]):
+        """
+        returns the agent to the cache once the turn is saved.  the turn's own messages are already in its history,
+        messages other workers wrote during the turn are not: they come after the user message and are loaded next turn
+        """
+        if agent_cache is None:
+            return
+        entry.last_message_id = user_message_id
+        entry.seen_message_ids = {message.message_id for message in written}
+        entry.agent.rebind(None, None)     # do not hold on to the request's session
+        agent_cache.checkin(workspace_id, entry)
+
+    @staticmethod
+    def history(messages: list[MessageModel], user_message: MessageModel) -> list[MessageModel]:
+        """the stored messages minus the one being sent, the agent adds that itself"""
+        return [message for message in messages if message.message_id != user_message.message_id]
+
+    def get_spans(self, workspace_id, message_id):
+        return self.span_repository.get_spans(workspace_id, message_id)
+
+    @staticmethod
+    def agent_messages(messages: list[MessageModel]) -> list[ChatMessage]:
+        return [ChatMessage(Role(message.role), message.content) for message in messages]
+
+    @staticmethod
+    def agent_context(videos: list[dict]) -> list[YouTubeVideo]:
+        return [YouTubeVideo(url=video["url"], transcript=video["transcript"], title=video["title"], author=video["author"], publish_date="", video_duration=0, summary=video["summary"]) for video in videos]
+
+
+class AsyncWorkspaceService:
+    """
+    WorkspaceService for the async send path.  The whole turn (database, Claude, tools) is awaited, so an API
+    worker does not pin a threadpool thread per conversation.
+    """
+    def __init__(self, message_repository:AsyncMessageRepository, video_repository:AsyncVideoRepository, span_repository:AsyncSpanRepository = None):
+        self.message_repository = message_repository
+        self.video_repository = video_repository
+        self.span_repository = span_repository
+        self.agent_cache = AgentCache.shared()
+        self.logger = getLogger(__name__)
 
-        return agent_message.final_response
+    async def send_message(self, workspace_id, message:str, listener: Callable[[AgentEvent], None] = None):
+        """listener, when given, gets every event of the turn as it happens, text deltas included"""
 
+        async def handle_event(event: AgentEvent):
+            self.logger.debug(f"Message\nType:{event.type} \nMessage: {event.data}")
+            if event.type in ('message','tool_use', 'tool_result'):
+                sink.add_message(workspace_id, MessageModel.ROLE_ASSISTANT, event.data)
+            elif event.type == 'video_summarized':
+                await self.video_repository.save_summary(workspace_id, event.data["video_id"], event.data["summary"])
+            elif event.type in ('video_watched', 'span', 'text_delta'):
+                # videos are saved by the chat application, spans once the turn is complete
+                pass
+            else: # event type is unknown
+                self.logger.info(f'unknown event type{event.type}')
+            if listener:
+                listener(event)
 
+        # create + save message to send
+        user_message = await self.message_repository.create_message(workspace_id, MessageModel.ROLE_USER, message)
+        sink = self.message_repository.create_sink()
+
+        try:
+            # Ask Agent to take next step
+            entry = await self.prepare_agent(workspace_id, user_message, handle_event)
+            entry.agent.stream_text = listener is not None
+            agent_message = await entry.agent.chat(message)
+
+            sink.add_message(workspace_id, MessageModel.ROLE_ASSISTANT, agent_message.final_response)
+            if self.span_repository:
+                sink.add_spans(workspace_id, user_message.message_id, agent_message.spans)
+        finally:
+            written = await sink.flush()
+        WorkspaceService.checkin(self.agent_cache, workspace_id, entry, user_message.message_id, written)
 
+        return agent_message.final_response
 
+    async def prepare_agent(self, workspace_id, user_message: MessageModel, on_event) -> AgentCacheEntry:
+        video_states = await self.video_repository.get_video_states(workspace_id)
+        ToolResultCache.for_workspace(workspace_id).validate(video_states)
+
+        entry = self.agent_cache.checkout(workspace_id) if self.agent_cache else None
+        if entry is not None and isinstance(entry.agent, AsyncChatAgent):
+            changed = WorkspaceService.changed_videos(entry, video_states)
+            if changed is not None:
+                messages = await self.message_repository.get_messages_after(workspace_id, entry.last_message_id)
+                videos = await self.video_repository.get_videos(workspace_id, changed) if changed else []
+                WorkspaceService.apply_delta(entry, messages, videos, video_states, user_message, on_event, self.video_repository)
+                return entry
+
+        messages = await self.message_repository.get_messages(workspace_id)
+        videos = await self.video_repository.get_videos(workspace_id=workspace_id)
+
+        agent = AsyncChatAgent(WorkspaceService.agent_context(videos), WorkspaceService.agent_messages(WorkspaceService.history(messages, user_message)),
+                               on_event=on_event, workspace_id=workspace_id, video_repository=self.video_repository)
+        return AgentCacheEntry(agent, user_message.message_id, video_states=video_states)
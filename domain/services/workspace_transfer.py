@@ -0,0 +1,186 @@
+import csv
+import gzip
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import IO, Iterable, Iterator
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from api.models import MessageModel, VideoModel, WorkspaceModel, WorkspaceVideoModel
+from api.models.base import utcnow
+from domain.repositories.video_repository import VideoRepository
+from domain.repositories.workspace_repository import WorkspaceRepository
+from domain.services.transcript_codec import transcript_codec
+from domain.services.youtube_ids import canonical_video_id
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class WorkspaceTransfer:
+    """
+    Moves a workspace between environments as JSON lines, one record per line:
+
+        {"type": "workspace", "format": 1, "name": ..., "created_at": ...}
+        {"type": "video", "youtube_id": ..., "url": ..., "title": ..., "author": ..., "transcript": ..., "summary": ..., "added_at": ...}
+        {"type": "message", "role": ..., "content": ..., "created_at": ...}
+
+    Export reads from server side cursors and import writes in batches, messages with COPY, so memory stays bounded
+    by the batch size whatever the size of the workspace.  Imported videos already stored, matched on their canonical
+    YouTube id, are linked to the workspace instead of being stored again.
+
+    Import commits batch by batch: an interrupted import leaves a partial workspace behind, delete it and import again.
+    Messages go through COPY, which needs the psycopg2 (sync) engine.
+    """
+    FORMAT = 1
+    YIELD_PER = 100
+    VIDEO_BATCH_SIZE = 200
+    MESSAGE_BATCH_SIZE = 5000
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def export_lines(self, workspace_id: str) -> Iterator[str]:
+        workspace = self.session.get(WorkspaceModel, workspace_id)
+        if workspace is None:
+            raise ValueError(f"workspace {workspace_id} not found")
+        yield self._line({'type': 'workspace', 'format': self.FORMAT, 'name': workspace.name,
+                          'created_at': self._timestamp(workspace.created_at)})
+
+        videos = select(VideoModel.youtube_id, VideoModel.url, VideoModel.title, VideoModel.channel,
+                        VideoModel.transcript_text, VideoModel.transcript_z,
+                        WorkspaceVideoModel.summary, WorkspaceVideoModel.added_at)\
+            .join(WorkspaceVideoModel, WorkspaceVideoModel.video_id == VideoModel.video_id)\
+            .where(WorkspaceVideoModel.workspace_id == workspace_id)\
+            .order_by(WorkspaceVideoModel.added_at, VideoModel.video_id)\
+            .execution_options(yield_per=self.YIELD_PER)
+        for row in self.session.execute(videos):
+            transcript = transcript_codec.decompress(row.transcript_z) if row.transcript_z is not None else row.transcript_text
+            yield self._line({'type': 'video', 'youtube_id': row.youtube_id or canonical_video_id(row.url), 'url': row.url,
+                              'title': row.title, 'author': row.channel, 'transcript': transcript,
+                              'summary': row.summary, 'added_at': self._timestamp(row.added_at)})
+
+        messages = select(MessageModel.role, MessageModel.content, MessageModel.created_at)\
+            .where(MessageModel.workspace_id == workspace_id)\
+            .order_by(MessageModel.message_id)\
+            .execution_options(yield_per=self.MESSAGE_BATCH_SIZE)
+        for row in self.session.execute(messages):
+            # the column is TEXT in the database, psycopg2 hands the JSON back undecoded
+            content = json.loads(row.content) if isinstance(row.content, str) else row.content
+            yield self._line({'type': 'message', 'role': row.role, 'content': content,
+                              'created_at': self._timestamp(row.created_at)})
+
+    def import_lines(self, lines: Iterable[str], user_id: int = None, workspace_id: str = None) -> dict:
+        """
+        imports an export into a new workspace of user_id, or into the existing workspace_id.
+        returns the workspace id and what was imported
+        """
+        counts = {'videos': 0, 'videos_reused': 0, 'messages': 0}
+        videos, messages = [], []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            kind = record.get('type')
+            if kind == 'workspace':
+                if record.get('format') != self.FORMAT:
+                    raise ValueError(f"unsupported export format {record.get('format')}")
+                if workspace_id is None:
+                    workspace_id = self._create_workspace(user_id, record)
+                continue
+            if workspace_id is None:
+                raise ValueError("the export does not start with a workspace record")
+
+            if kind == 'video':
+                videos.append(record)
+                if len(videos) >= self.VIDEO_BATCH_SIZE:
+                    self._import_videos(workspace_id, videos, counts)
+                    videos = []
+            elif kind == 'message':
+                messages.append(record)
+                if len(messages) >= self.MESSAGE_BATCH_SIZE:
+                    self._copy_messages(workspace_id, messages, counts)
+                    messages = []
+            else:
+                raise ValueError(f"unknown record type {kind}")
+
+        if videos:
+            self._import_videos(workspace_id, videos, counts)
+        if messages:
+            self._copy_messages(workspace_id, messages, counts)
+        return {'workspace_id': str(workspace_id), **counts}
+
+    def _create_workspace(self, user_id: int, record: dict) -> str:
+        if user_id is None:
+            raise ValueError("user_id is needed to import into a new workspace")
+        workspace = WorkspaceModel(user_id=user_id, name=record.get('name') or 'Imported workspace')
+        self.session.add(workspace)
+        self.session.commit()
+        return str(workspace.workspace_id)
+
+    def _import_videos(self, workspace_id: str, records: list[dict], counts: dict):
+        repository = VideoRepository(self.session)
+        for record in records:
+            record['youtube_id'] = record.get('youtube_id') or canonical_video_id(record['url'])
+        known = repository.find_by_youtube_ids([record['youtube_id'] for record in records if record['youtube_id']])
+
+        reused = [record for record in records if record['youtube_id'] in known]
+        new = [record for record in records if record['youtube_id'] not in known]
+        video_ids = [known[record['youtube_id']] for record in reused]
+        if video_ids:
+            repository.link_videos(workspace_id, video_ids)
+        if new:
+            video_ids += repository.save_videos(workspace_id, [
+                {'url': record['url'], 'transcript': record.get('transcript') or '',
+                 'title': record.get('title'), 'author': record.get('author')} for record in new])
+
+        repository.save_summaries(workspace_id, [(video_id, record['summary'])
+                                                 for record, video_id in zip(reused + new, video_ids) if record.get('summary')])
+        counts['videos'] += len(new)
+        counts['videos_reused'] += len(reused)
+
+    def _copy_messages(self, workspace_id: str, records: list[dict], counts: dict):
+        now = self._timestamp(utcnow())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in records:
+            writer.writerow([workspace_id, record['role'], json.dumps(record['content']), record.get('created_at') or now])
+        buffer.seek(0)
+
+        cursor = self.session.connection().connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert("COPY messages (workspace_id, role, content, created_at) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        WorkspaceRepository(self.session).touch(workspace_id)
+        self.session.commit()
+        counts['messages'] += len(records)
+
+    @staticmethod
+    def _line(record: dict) -> str:
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    @staticmethod
+    def _timestamp(value: datetime) -> str | None:
+        return value.isoformat() if value else None
+
+
+def gzip_lines(lines: Iterable[str]) -> Iterator[bytes]:
+    """gzip a stream of lines as it is produced"""
+    compressor = zlib.compressobj(wbits=31)     # 31: gzip container
+    for line in lines:
+        chunk = compressor.compress(line.encode('utf-8'))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def read_lines(file: IO[bytes]) -> Iterator[str]:
+    """the lines of an export file, gunzipped when it is gzipped.  the file must be seekable"""
+    gzipped = file.read(2) == GZIP_MAGIC
+    file.seek(0)
+    stream = gzip.GzipFile(fileobj=file, mode='rb') if gzipped else file
+    yield from io.TextIOWrapper(stream, encoding='utf-8')
@@ -0,0 +1,16 @@
+import re
+
+# watch?v=<id>, youtu.be/<id>, /embed/<id>, /shorts/<id>
+VIDEO_ID_PATTERNS = [
+    r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
+    r'(?:be\/)([0-9A-Za-z_-]{11}).*'
+]
+
+
+def canonical_video_id(url: str) -> str | None:
+    """the 11 character YouTube id of a video url, the same video has it whatever form the url takes"""
+    for pattern in VIDEO_ID_PATTERNS:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
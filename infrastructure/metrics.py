@@ -0,0 +1,131 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+from prometheus_client import Counter, Gauge, Histogram, disable_created_metrics
+
+# the Anthropic and YouTube clients record here too, sqlalchemy is only imported by the engines that are instrumented
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+# Process wide Prometheus metrics, exposed by GET /metrics.  Label values are bounded (route templates, statement
+# kinds, model names, exception classes) and histograms have fixed buckets, so observing a value is a dict lookup
+# and a few additions.  Each API or worker process has its own numbers, scrape every process.
+
+disable_created_metrics()       # the *_created series double the output and nobody reads them
+
+REQUEST_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+CALL_BUCKETS = (.05, .1, .25, .5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency, to the end of the response body',
+                                 ['method', 'route', 'status'], buckets=REQUEST_BUCKETS)
+HTTP_REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being served')
+HTTP_REQUEST_QUERIES = Histogram('http_request_db_queries', 'SQL statements executed per HTTP request', ['route'], buckets=COUNT_BUCKETS)
+HTTP_REQUEST_DB_SECONDS = Histogram('http_request_db_seconds', 'time spent in SQL statements per HTTP request', ['route'], buckets=REQUEST_BUCKETS)
+
+DB_QUERY_SECONDS = Histogram('db_query_duration_seconds', 'SQL statement latency', ['statement'], buckets=QUERY_BUCKETS)
+DB_QUERY_ERRORS = Counter('db_query_errors', 'SQL statements that failed', ['statement'])
+
+YOUTUBE_SECONDS = Histogram('youtube_request_duration_seconds', 'YouTube API and transcript request latency', ['operation'], buckets=CALL_BUCKETS)
+YOUTUBE_ERRORS = Counter('youtube_request_errors', 'failed YouTube requests', ['operation', 'error'])
+
+ANTHROPIC_SECONDS = Histogram('anthropic_request_duration_seconds', 'Anthropic messages request latency', ['model', 'operation'], buckets=CALL_BUCKETS)
+ANTHROPIC_ERRORS = Counter('anthropic_request_errors', 'failed Anthropic requests', ['model', 'operation', 'error'])
+ANTHROPIC_TOKENS = Counter('anthropic_tokens', 'tokens used', ['model', 'kind'])
+
+STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'OTHER')
+_query_seconds = {statement: DB_QUERY_SECONDS.labels(statement) for statement in STATEMENTS}
+
+
+class RequestStats:
+    """SQL statements of the current request, filled in by the engine listeners"""
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# set by MetricsMiddleware.  threadpool routes and run_sync get a copy of the context, which refers to the same object
+request_stats: ContextVar[RequestStats | None] = ContextVar('request_stats', default=None)
+
+
+@contextmanager
+def timed(histogram: Histogram, errors: Counter, *labels: str):
+    """observes the duration of the block, and counts it as an error labelled with the exception class if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        errors.labels(*labels, type(e).__name__).inc()
+        raise
+    finally:
+        histogram.labels(*labels).observe(time.perf_counter() - start)
+
+
+def count_tokens(model: str, usage):
+    """adds the usage of an Anthropic response to anthropic_tokens"""
+    if usage is None:
+        return
+    ANTHROPIC_TOKENS.labels(model, 'input').inc(usage.input_tokens or 0)
+    ANTHROPIC_TOKENS.labels(model, 'output').inc(usage.output_tokens or 0)
+    ANTHROPIC_TOKENS.labels(model, 'cache_read').inc(getattr(usage, 'cache_read_input_tokens', None) or 0)
+    ANTHROPIC_TOKENS.labels(model, 'cache_write').inc(getattr(usage, 'cache_creation_input_tokens', None) or 0)
+
+
+def prompt_cache_stats() -> dict:
+    """
+    input tokens of this process's Anthropic requests by how they were billed, per model and in total.  hit_ratio is
+    the share of input tokens read from the prompt cache, None before the first request
+    """
+    models: dict[str, dict] = {}
+    for family in ANTHROPIC_TOKENS.collect():
+        for sample in family.samples:
+            kind = sample.labels['kind']
+            if kind != 'output':
+                models.setdefault(sample.labels['model'], {'input': 0, 'cache_read': 0, 'cache_write': 0})[kind] = int(sample.value)
+
+    def with_ratio(tokens: dict) -> dict:
+        total = tokens['input'] + tokens['cache_read'] + tokens['cache_write']
+        return {**tokens, 'hit_ratio': round(tokens['cache_read'] / total, 4) if total else None}
+
+    total = {kind: sum(tokens[kind] for tokens in models.values()) for kind in ('input', 'cache_read', 'cache_write')}
+    return {**with_ratio(total), 'models': {model: with_ratio(tokens) for model, tokens in models.items()}}
+
+
+def instrument_engine(engine: 'Engine'):
+    """times every statement of an engine, pass async_engine.sync_engine for the async engine"""
+    from sqlalchemy import event
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+
+def _statement(statement: str) -> str:
+    kind = statement[:16].lstrip()[:6].upper()
+    return kind if kind in _query_seconds else 'OTHER'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    _query_seconds[_statement(statement)].observe(seconds)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+
+
+def _handle_error(exception_context):
+    if exception_context.statement is not None:
+        DB_QUERY_ERRORS.labels(_statement(exception_context.statement)).inc()
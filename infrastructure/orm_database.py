@@ -3,17 +3,63 @@ import os
 import sys
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url, URL
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from infrastructure.metrics import instrument_engine
+from infrastructure.pool_metrics import TimedQueuePool, TimedAsyncAdaptedQueuePool, pool_stats
 from logger_config import  getLogger
 
 load_dotenv()
 logger = getLogger(__name__)
 
+# pool and cache settings from the environment.  the pool is shared by every request of a worker, size it for the number of
+# concurrent turns per worker and keep pool_size + max_overflow (plus DB_FETCH_LOCK_POOL_SIZE) times the number of
+# workers under max_connections
+POOL_OPTIONS = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),          # seconds to wait for a connection
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),          # reconnect before proxies drop idle connections
+    'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('true', '1', 'on'),
+}
+# VideoFetcher holds an advisory lock for a whole YouTube fetch.  its connections come from a small pool of their own,
+# a burst of fetches can not take the connections of the requests.  a fetch that gets none within the timeout goes
+# ahead without the lock
+FETCH_LOCK_POOL_OPTIONS = {
+    **POOL_OPTIONS,
+    'pool_size': int(os.getenv('DB_FETCH_LOCK_POOL_SIZE', 4)),
+    'max_overflow': 0,
+    'pool_timeout': float(os.getenv('DB_FETCH_LOCK_POOL_TIMEOUT', 1)),
+}
+# compiled SQL cached by SQLAlchemy, and prepared statements cached per asyncpg connection (set 0 behind pgbouncer
+# in transaction mode)
+QUERY_CACHE_SIZE = int(os.getenv('DB_QUERY_CACHE_SIZE', 500))
+STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+
+def to_async_url(url: str) -> URL:
+    """DATABASE_URL uses the psycopg2 driver, the async engine needs asyncpg"""
+    return make_url(url).set(drivername='postgresql+asyncpg')\
+        .update_query_dict({'prepared_statement_cache_size': str(STATEMENT_CACHE_SIZE)})
+
 try:
-    engine = create_engine(os.getenv('DATABASE_URL'))
+    engine = create_engine(os.getenv('DATABASE_URL'), poolclass=TimedQueuePool, query_cache_size=QUERY_CACHE_SIZE, **POOL_OPTIONS)
     SessionLocal = sessionmaker(bind=engine)
+
+    # async routes share one event loop, queries must not block it
+    async_engine = create_async_engine(to_async_url(os.getenv('DATABASE_URL')), poolclass=TimedAsyncAdaptedQueuePool,
+                                       query_cache_size=QUERY_CACHE_SIZE, **POOL_OPTIONS)
+    # objects stay loaded after commit, expired attributes can not be lazy loaded outside of run_sync
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    fetch_lock_engine = create_engine(os.getenv('DATABASE_URL'), poolclass=TimedQueuePool, query_cache_size=QUERY_CACHE_SIZE,
+                                      **FETCH_LOCK_POOL_OPTIONS)
+    FetchLockSessionLocal = sessionmaker(bind=fetch_lock_engine)
+
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    instrument_engine(fetch_lock_engine)
 except OperationalError as e:
     logger.error("\n❌ ERROR: Cannot connect to database")
     logger.error("Make sure PostgreSQL is running:")
@@ -26,4 +72,18 @@ def get_session():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_session():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_pool_stats() -> dict:
+    """connections in use and time spent waiting for one, per engine"""
+    return {
+        'sync': pool_stats(engine.pool),
+        'async': pool_stats(async_engine.sync_engine.pool),
+        'fetch_lock': pool_stats(fetch_lock_engine.pool)
+    }
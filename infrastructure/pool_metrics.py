@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolWaitStats:
+    """time spent waiting for a connection from the pool, the first sign the pool is too small"""
+    SLOW_SECONDS = 0.1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.slow = 0       # checkouts that waited longer than SLOW_SECONDS
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.checkouts += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if seconds > self.SLOW_SECONDS:
+                self.slow += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_ms_total': round(self.total_seconds * 1000, 3),
+                'wait_ms_avg': round(self.total_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_ms_max': round(self.max_seconds * 1000, 3),
+                'slow_checkouts': self.slow
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats       # keep the numbers across engine.dispose()
+        return pool
+
+
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool for the async engine"""
+
+
+# SQLAlchemy names pool loggers after the pool class, which puts these under the application's whitelisted loggers.
+# keep them as quiet as SQLAlchemy's own pool loggers
+for pool_class in (TimedQueuePool, TimedAsyncAdaptedQueuePool):
+    logging.getLogger(f"{pool_class.__module__}.{pool_class.__name__}").setLevel(logging.WARNING)
+
+
+def pool_stats(pool: QueuePool) -> dict:
+    stats = {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+    }
+    if isinstance(pool, TimedQueuePool):
+        stats.update(pool.wait_stats.snapshot())
+    return stats
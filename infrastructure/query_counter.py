@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """statements executed on an engine while counting, see count_queries"""
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine):
+    """
+    counts the statements sent to the database, to catch N+1 loads in repository read paths
+        with count_queries(engine) as counter:
+            VideoRepository(session).get_videos(workspace_id)
+        assert counter.count == 1
+    pass async_engine.sync_engine for the async engine
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
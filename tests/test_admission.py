@@ -0,0 +1,165 @@
+"""
+admission control of chat turns (domain/services/admission.py): the limits, deficit round robin between users and
+the 429 with Retry-After.  no database needed
+    LOG_LEVEL=INFO python -m pytest tests/test_admission.py
+"""
+import asyncio
+import os
+
+import pytest
+
+from domain.services.admission import AdmissionController, AdmissionRejected
+
+
+def run(test):
+    """runs an async test body, tickets need a running event loop"""
+    return asyncio.run(test())
+
+
+def started(*tickets) -> list[bool]:
+    return [ticket.future.done() for ticket in tickets]
+
+
+def test_turn_starts_right_away():
+    async def test():
+        controller = AdmissionController()
+        ticket = controller.enqueue(1, 'w1')
+        async with ticket:
+            assert controller.in_flight == 1
+        assert controller.in_flight == 0
+        assert controller.stats()['admitted'] == 1
+    run(test)
+
+
+def test_one_turn_per_workspace():
+    async def test():
+        controller = AdmissionController()
+        first, second, other = controller.enqueue(1, 'w1'), controller.enqueue(1, 'w1'), controller.enqueue(1, 'w2')
+        assert started(first, second, other) == [True, False, True]
+        controller.release(first)
+        assert started(second) == [True]
+    run(test)
+
+
+def test_per_user_limit():
+    async def test():
+        controller = AdmissionController(max_per_user=2)
+        tickets = [controller.enqueue(1, f"w{i}") for i in range(3)]
+        other_user = controller.enqueue(2, 'w9')
+        assert started(*tickets, other_user) == [True, True, False, True]
+        controller.release(tickets[0])
+        assert started(tickets[2]) == [True]
+    run(test)
+
+
+def test_global_limit():
+    async def test():
+        controller = AdmissionController(max_in_flight=2)
+        tickets = [controller.enqueue(user_id, f"w{user_id}") for user_id in range(3)]
+        assert started(*tickets) == [True, True, False]
+        assert controller.stats()['queued'] == 1
+        controller.release(tickets[1])
+        assert started(tickets[2]) == [True]
+    run(test)
+
+
+def test_users_take_turns():
+    """a user who sends a burst waits behind their own turns, not in front of everybody else's"""
+    async def test():
+        controller = AdmissionController(max_in_flight=1)
+        burst = [controller.enqueue(1, f"a{i}") for i in range(4)]
+        others = [controller.enqueue(2, f"b{i}") for i in range(2)]
+        names = {ticket: name for name, ticket in zip(['a0', 'a1', 'a2', 'a3', 'b0', 'b1'], burst + others)}
+
+        order = []
+        while len(order) < len(names):
+            running = [ticket for ticket in names if ticket.started_at is not None]
+            assert len(running) == 1
+            order.append(names[running[0]])
+            controller.release(running[0])
+        assert order == ['a0', 'a1', 'b0', 'a2', 'b1', 'a3']
+    run(test)
+
+
+def test_blocked_user_does_not_hold_the_queue():
+    async def test():
+        controller = AdmissionController(max_in_flight=2)
+        busy = controller.enqueue(1, 'w1')
+        waiting = controller.enqueue(1, 'w1')       # same workspace, cannot start
+        other = controller.enqueue(2, 'w2')
+        assert started(busy, waiting, other) == [True, False, True]
+    run(test)
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    async def test():
+        controller = AdmissionController(max_in_flight=1, max_queued=2)
+        controller.enqueue(1, 'w1')
+        controller.enqueue(2, 'w2')
+        controller.enqueue(3, 'w3')
+        with pytest.raises(AdmissionRejected) as rejected:
+            controller.enqueue(4, 'w4')
+        assert rejected.value.retry_after >= 1
+        assert controller.stats()['rejected'] == 1
+    run(test)
+
+
+def test_user_queue_limit():
+    async def test():
+        controller = AdmissionController(max_in_flight=1, max_queued_per_user=2)
+        controller.enqueue(1, 'w0')                 # starts, does not count as waiting
+        controller.enqueue(1, 'w1')
+        controller.enqueue(1, 'w2')
+        with pytest.raises(AdmissionRejected):
+            controller.enqueue(1, 'w3')
+        controller.enqueue(2, 'w4')                 # other users still get in the queue
+    run(test)
+
+
+def test_turn_that_waits_too_long_is_rejected():
+    async def test():
+        controller = AdmissionController(max_in_flight=1, queue_timeout=0.01)
+        running = controller.enqueue(1, 'w1')
+        waiting = controller.enqueue(2, 'w2')
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with waiting:
+                pass
+        assert rejected.value.retry_after >= 1
+        assert controller.stats()['timed_out'] == 1
+        assert controller.queued == 0
+        controller.release(running)
+        assert controller.in_flight == 0
+    run(test)
+
+
+def test_cancelled_ticket_gives_its_place_back():
+    async def test():
+        controller = AdmissionController(max_in_flight=1)
+        running = controller.enqueue(1, 'w1')
+        cancelled = controller.enqueue(2, 'w2')
+        waiting = controller.enqueue(3, 'w3')
+        cancelled.cancel()
+        controller.release(running)
+        assert started(cancelled, waiting) == [False, True]
+        assert controller.queued == 0
+    run(test)
+
+
+def test_retry_after_grows_with_the_queue():
+    async def test():
+        controller = AdmissionController(max_in_flight=1)
+        controller.turn_seconds_avg = 10.0
+        empty = controller.retry_after()
+        for user_id in range(5):
+            controller.enqueue(user_id, f"w{user_id}")
+        assert empty == 10
+        assert controller.retry_after() == 50      # 4 waiting and this one, 10s each
+    run(test)
+
+
+@pytest.mark.skipif(not os.getenv('DATABASE_URL'), reason="api.routes builds the database engines on import")
+def test_rejection_is_a_429_with_retry_after():
+    from api.routes.messages import too_many_turns
+    error = too_many_turns(AdmissionRejected("too many turns are waiting", 7))
+    assert error.status_code == 429
+    assert error.headers == {'Retry-After': '7'}
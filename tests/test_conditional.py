@@ -0,0 +1,65 @@
+"""
+conditional GET (api/conditional.py): ETag and Last-Modified validators and the 304 answers.  no database needed
+    LOG_LEVEL=INFO python -m pytest tests/test_conditional.py
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import Request, Response
+
+from api.conditional import etag, not_modified
+
+TAG = etag("messages", "w1", 3)
+MODIFIED = datetime(2024, 5, 1, 12, 30, 15, 250000)       # naive UTC, as the database stores it
+MODIFIED_HTTP = "Wed, 01 May 2024 12:30:15 GMT"
+
+
+def request(**headers) -> Request:
+    return Request({'type': 'http', 'headers': [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]})
+
+
+def test_etag():
+    assert TAG == 'W/"messages-w1-3"'
+    assert etag("messages", "w1", 3, 100, None, 7) != etag("messages", "w1", 3, 100, 7, None)
+
+
+def test_validators_are_set():
+    response = Response()
+    assert not_modified(request(), response, TAG, MODIFIED) is None
+    assert response.headers['etag'] == TAG
+    assert response.headers['last-modified'] == MODIFIED_HTTP
+    assert response.headers['cache-control'] == 'no-cache'
+
+
+@pytest.mark.parametrize('if_none_match', [TAG, '"messages-w1-3"', f'W/"other", {TAG}', '*'])
+def test_matching_etag_is_not_modified(if_none_match):
+    cached = not_modified(request(if_none_match=if_none_match), Response(), TAG, MODIFIED)
+    assert cached.status_code == 304
+    assert cached.body == b''
+    assert cached.headers['etag'] == TAG
+    assert cached.headers['last-modified'] == MODIFIED_HTTP
+
+
+def test_other_etag_is_sent():
+    assert not_modified(request(if_none_match='W/"messages-w1-2"'), Response(), TAG, MODIFIED) is None
+
+
+def test_etag_takes_precedence_over_date():
+    headers = request(if_none_match='W/"messages-w1-2"', if_modified_since="Thu, 02 May 2024 00:00:00 GMT")
+    assert not_modified(headers, Response(), TAG, MODIFIED) is None
+
+
+@pytest.mark.parametrize('if_modified_since, status', [
+    (MODIFIED_HTTP, 304),                               # microseconds are not part of Last-Modified
+    ("Thu, 02 May 2024 00:00:00 GMT", 304),
+    ("Wed, 01 May 2024 12:30:14 GMT", None),
+    ("not a date", None),
+    ("Wed, 01 May 2024 12:30:15", None),                # no time zone
+])
+def test_if_modified_since(if_modified_since, status):
+    cached = not_modified(request(if_modified_since=if_modified_since), Response(), TAG, MODIFIED)
+    assert (cached.status_code if cached else None) == status
+
+
+def test_if_modified_since_without_last_modified():
+    assert not_modified(request(if_modified_since=MODIFIED_HTTP), Response(), TAG) is None
@@ -0,0 +1,100 @@
+"""
+MinHash signatures and LSH buckets of transcripts (domain/services/minhash.py), no database needed
+    python -m pytest tests/test_minhash.py
+"""
+import random
+
+import numpy as np
+import pytest
+
+from domain.services.minhash import MinHasher, minhasher
+
+VOCABULARY = [f"word{i}" for i in range(2000)]
+
+
+def transcript(seed: int, words: int = 400) -> str:
+    generator = random.Random(seed)
+    return ' '.join(generator.choice(VOCABULARY) for _ in range(words))
+
+
+def reupload(text: str) -> str:
+    """the same transcript as get_video formats it for another upload: title line and timestamps"""
+    words = text.split()
+    lines = [f"[{i // 60}:{i % 60:02d}] " + ' '.join(words[i:i + 10]) for i in range(0, len(words), 10)]
+    return "Transcript for: another title\n" + '\n'.join(lines)
+
+
+def test_signature_is_deterministic():
+    text = transcript(1)
+    signature = minhasher.signature(text)
+    assert signature.dtype == np.uint32
+    assert signature.shape == (MinHasher.NUM_PERM,)
+    assert np.array_equal(signature, MinHasher().signature(text))
+
+
+def test_signature_ignores_title_line_and_timestamps():
+    text = transcript(2)
+    assert np.array_equal(minhasher.signature(text), minhasher.signature(reupload(text)))
+
+
+def test_signature_of_short_transcript_is_none():
+    assert minhasher.signature('') is None
+    assert minhasher.signature(transcript(3, words=MinHasher.MIN_SHINGLES + MinHasher.SHINGLE_SIZE - 2)) is None
+    assert minhasher.signature(transcript(3, words=MinHasher.MIN_SHINGLES + MinHasher.SHINGLE_SIZE - 1)) is not None
+
+
+def test_signature_spans_chunks():
+    """transcripts with more shingles than CHUNK are hashed in several steps, with the same result"""
+    text = transcript(4)
+    chunked = MinHasher()
+    chunked.CHUNK = 64
+    assert np.array_equal(chunked.signature(text), minhasher.signature(text))
+
+
+def test_similarity():
+    text = transcript(5)
+    words = text.split()
+    edited = ' '.join(words[:-20] + ['edited'] * 20)     # 5% of the words changed
+    unrelated = transcript(6)
+
+    signature = minhasher.signature(text)
+    others = np.vstack([minhasher.signature(text), minhasher.signature(edited), minhasher.signature(unrelated)])
+    same, close, different = minhasher.similarity(signature, others)
+    assert same == 1.0
+    assert close > 0.8
+    assert different < 0.1
+
+
+def test_similarity_of_one_signature():
+    signature = minhasher.signature(transcript(7))
+    assert minhasher.similarity(signature, signature).tolist() == [1.0]
+
+
+def test_buckets():
+    signature = minhasher.signature(transcript(8))
+    buckets = minhasher.buckets(signature)
+    assert [band for band, _ in buckets] == list(range(MinHasher.BANDS))
+    assert all(-(1 << 63) <= bucket < (1 << 63) for _, bucket in buckets)    # fits a BIGINT
+    assert buckets == minhasher.buckets(signature.copy())
+
+
+def test_near_duplicates_share_a_bucket():
+    text = transcript(9)
+    edited = ' '.join(text.split()[:-20] + ['edited'] * 20)
+    unrelated = transcript(10)
+    buckets = set(minhasher.buckets(minhasher.signature(text)))
+    assert buckets & set(minhasher.buckets(minhasher.signature(edited)))
+    assert not buckets & set(minhasher.buckets(minhasher.signature(unrelated)))
+
+
+def test_bytes_round_trip():
+    signature = minhasher.signature(transcript(11))
+    data = minhasher.to_bytes(signature)
+    assert len(data) == 4 * MinHasher.NUM_PERM
+    assert np.array_equal(minhasher.from_bytes(data), signature)
+    assert not minhasher.is_empty(signature)
+
+
+def test_num_perm_must_be_a_multiple_of_bands():
+    with pytest.raises(ValueError):
+        MinHasher(num_perm=100, bands=16)
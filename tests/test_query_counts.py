@@ -0,0 +1,82 @@
+"""
+statements per repository read, which must not grow with the number of videos in the workspace (N+1 loads).
+runs against the database in DATABASE_URL, inside a transaction that is rolled back
+    LOG_LEVEL=INFO python -m pytest tests
+"""
+import os
+
+import pytest
+
+if not os.getenv('DATABASE_URL'):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy.orm import Session
+
+from api.models import UserModel, WorkspaceModel
+from domain.repositories.user_repository import UserRepository
+from domain.repositories.video_repository import VideoRepository, GetVideoArgsWorkspaceVideoId
+from infrastructure.orm_database import engine
+from infrastructure.query_counter import count_queries
+
+SIZES = [1, 12]
+
+
+@pytest.fixture
+def session():
+    """a session whose commits are savepoints of one transaction, rolled back after the test"""
+    connection = engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode='create_savepoint')
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+def workspace_with_videos(session: Session, count: int) -> tuple[str, list[int]]:
+    """a new workspace with count videos, every other one summarized"""
+    user = UserModel()
+    session.add(user)
+    session.commit()
+    workspace = WorkspaceModel(user.user_id, 'query counts')
+    session.add(workspace)
+    session.commit()
+
+    workspace_id = str(workspace.workspace_id)
+    repository = VideoRepository(session)
+    videos = [{'url': f"https://www.youtube.com/watch?v=qc{workspace_id[:8]}{i}", 'transcript': f"transcript {i} " * 50,
+               'title': f"video {i}", 'author': 'author'} for i in range(count)]
+    video_ids = repository.save_videos(workspace_id, videos)
+    repository.save_summaries(workspace_id, [(video_id, f"summary {video_id}") for video_id in video_ids[::2]])
+    session.expunge_all()   # reads below must load from the database
+    return workspace_id, video_ids
+
+
+def statements(session: Session, count: int, read) -> int:
+    """statements sent by read, less the savepoint the test's transaction opens"""
+    workspace_id, video_ids = workspace_with_videos(session, count)
+    with count_queries(engine) as counter:
+        read(workspace_id, video_ids)
+    return len([statement for statement in counter.statements if not statement.startswith('SAVEPOINT')])
+
+
+@pytest.mark.parametrize('read', [
+    lambda session: lambda workspace_id, video_ids: VideoRepository(session).get_videos(workspace_id),
+    lambda session: lambda workspace_id, video_ids: VideoRepository(session).get_videos(workspace_id, video_ids),
+    lambda session: lambda workspace_id, video_ids: VideoRepository(session).list_videos(workspace_id),
+    lambda session: lambda workspace_id, video_ids: UserRepository(session).get_videos(workspace_id),
+], ids=['get_videos', 'get_videos_by_id', 'list_videos', 'user_get_videos'])
+def test_workspace_reads_are_one_statement(session, read):
+    counts = [statements(session, count, read(session)) for count in SIZES]
+    assert counts == [1] * len(SIZES)
+
+
+def test_get_video_is_one_statement(session):
+    def read(workspace_id, video_ids):
+        for video_id in video_ids:
+            VideoRepository(session).get_video(GetVideoArgsWorkspaceVideoId(workspace_id, video_id))
+
+    counts = [statements(session, count, read) for count in SIZES]
+    assert counts == SIZES
@@ -0,0 +1,112 @@
+"""
+one call per key at a time (domain/services/single_flight.py), from threads and from the event loop.
+no database needed
+    python -m pytest tests/test_single_flight.py
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from domain.services.single_flight import SingleFlight
+
+WAITERS = 8
+
+
+class BlockingCall:
+    """a call that counts its runs and blocks until released, so the other callers join it"""
+    def __init__(self, result='video'):
+        self.result = result
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def wait_for_joiners(call: BlockingCall, pool_futures):
+    """releases the call once it runs, give the other callers a moment to join it first"""
+    assert call.started.wait(5)
+    time.sleep(0.05)
+    call.release.set()
+    return [future.exception() or future.result() for future in pool_futures]
+
+
+def test_concurrent_callers_share_one_call():
+    flights, call = SingleFlight(), BlockingCall()
+    with ThreadPoolExecutor(WAITERS) as pool:
+        futures = [pool.submit(flights.do, 'abc', call) for _ in range(WAITERS)]
+        results = wait_for_joiners(call, futures)
+    assert results == ['video'] * WAITERS
+    assert call.calls == 1
+    assert flights.in_flight() == 0
+
+
+def test_keys_run_separately():
+    flights = SingleFlight()
+    assert [flights.do(key, lambda key=key: key * 2) for key in (1, 2)] == [2, 4]
+
+
+def test_next_caller_runs_again():
+    flights, calls = SingleFlight(), []
+    for _ in range(2):
+        flights.do('abc', lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_error_reaches_every_caller():
+    flights, call = SingleFlight(), BlockingCall(ValueError("video unavailable"))
+    with ThreadPoolExecutor(WAITERS) as pool:
+        futures = [pool.submit(flights.do, 'abc', call) for _ in range(WAITERS)]
+        errors = wait_for_joiners(call, futures)
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert call.calls == 1
+    assert flights.in_flight() == 0
+
+
+def test_async_callers_share_one_call():
+    async def test():
+        flights, call = SingleFlight(), BlockingCall()
+        waiters = [asyncio.create_task(flights.do_async('abc', call)) for _ in range(WAITERS)]
+        await asyncio.to_thread(call.started.wait, 5)
+        await asyncio.sleep(0.05)
+        call.release.set()
+        assert await asyncio.gather(*waiters) == ['video'] * WAITERS
+        assert call.calls == 1
+    asyncio.run(test())
+
+
+def test_threads_join_the_event_loop_call():
+    async def test():
+        flights, call = SingleFlight(), BlockingCall()
+        leader = asyncio.create_task(flights.do_async('abc', call))
+        await asyncio.to_thread(call.started.wait, 5)
+        joined = asyncio.create_task(asyncio.to_thread(flights.do, 'abc', call))
+        await asyncio.sleep(0.05)
+        call.release.set()
+        assert [await leader, await joined] == ['video', 'video']
+        assert call.calls == 1
+    asyncio.run(test())
+
+
+def test_cancelled_caller_does_not_cancel_the_call():
+    async def test():
+        flights, call = SingleFlight(), BlockingCall()
+        cancelled = asyncio.create_task(flights.do_async('abc', call))
+        other = asyncio.create_task(flights.do_async('abc', call))
+        await asyncio.to_thread(call.started.wait, 5)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        call.release.set()
+        assert await other == 'video'
+        assert call.calls == 1
+    asyncio.run(test())
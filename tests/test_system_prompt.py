@@ -0,0 +1,113 @@
+"""
+packing of the system prompt (Claude.create_system_prompt): the form each content takes within the token budget
+and where the cache breakpoints go.  no database or API key needed
+    LOG_LEVEL=INFO python -m pytest tests/test_system_prompt.py
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from components.anthropic.anthropic_service import Claude
+
+PROMPT = "You are a helpful assistant that watches videos."
+
+
+@dataclass
+class Video:
+    title: str
+    content: str
+    summary: str | None = None
+    source: str = "https://www.youtube.com/watch?v=abc"
+    author: str = "channel"
+    creation_date: datetime = datetime(2024, 5, 1)
+
+
+def video(i: int, tokens: int = 1000, summary: bool = True) -> Video:
+    return Video(f"video {i}", f"transcript {i} " * (tokens * Claude.CHARS_PER_TOKEN // 13),
+                 f"summary {i} " * 20 if summary else None)
+
+
+def tokens(content: Video, form: int) -> int:
+    return Claude.estimate_tokens(Claude.content_forms(content)[form])
+
+
+def forms(blocks: list[dict], videos: list[Video]) -> list[int]:
+    """the form each video was given, read back from its block"""
+    return [Claude.content_forms(v).index(block["text"]) for block, v in zip(blocks[1:], videos)]
+
+
+def breakpoints(blocks: list[dict]) -> list[int]:
+    return [i for i, block in enumerate(blocks) if "cache_control" in block]
+
+
+def budget(videos: list[Video], chosen: list[int]) -> int:
+    return Claude.estimate_tokens(PROMPT) + sum(tokens(v, form) for v, form in zip(videos, chosen))
+
+
+def test_everything_fits():
+    videos = [video(i) for i in range(3)]
+    blocks = Claude.create_system_prompt(PROMPT, videos)
+    assert blocks[0]["text"] == PROMPT
+    assert forms(blocks, videos) == [Claude.FULL] * 3
+
+
+def test_summaries_before_full_texts():
+    videos = [video(i) for i in range(3)]
+    blocks = Claude.create_system_prompt(PROMPT, videos, budget(videos, [Claude.FULL, Claude.SUMMARY, Claude.SUMMARY]))
+    assert forms(blocks, videos) == [Claude.FULL, Claude.SUMMARY, Claude.SUMMARY]
+
+
+def test_later_full_text_fills_what_is_left():
+    """a full text that does not fit is skipped, a shorter one after it still gets in"""
+    videos = [video(0, tokens=3000), video(1, tokens=500)]
+    blocks = Claude.create_system_prompt(PROMPT, videos, budget(videos, [Claude.SUMMARY, Claude.FULL]))
+    assert forms(blocks, videos) == [Claude.SUMMARY, Claude.FULL]
+
+
+def test_note_without_summary():
+    videos = [video(0, summary=False), video(1)]
+    blocks = Claude.create_system_prompt(PROMPT, videos, budget(videos, [Claude.NOTE, Claude.SUMMARY]))
+    assert forms(blocks, videos) == [Claude.NOTE, Claude.SUMMARY]
+
+
+def test_every_content_gets_a_block():
+    videos = [video(i) for i in range(3)]
+    blocks = Claude.create_system_prompt(PROMPT, videos, 0)
+    assert forms(blocks, videos) == [Claude.NOTE] * 3
+
+
+def test_no_prompt_block_for_an_empty_prompt():
+    videos = [video(0)]
+    blocks = Claude.create_system_prompt("", videos)
+    assert [block["text"] for block in blocks] == [Claude.content_forms(videos[0])[Claude.FULL]]
+
+
+def test_prefix_is_stable_as_content_is_added():
+    videos = [video(i) for i in range(4)]
+    before = Claude.create_system_prompt(PROMPT, videos[:3])
+    after = Claude.create_system_prompt(PROMPT, videos)
+    assert [block["text"] for block in after[:len(before)]] == [block["text"] for block in before]
+
+
+def test_breakpoints_on_the_last_block_and_spread_over_the_full_texts():
+    videos = [video(i) for i in range(8)]
+    blocks = Claude.create_system_prompt(PROMPT, videos)
+    assert breakpoints(blocks) == [2, 4, 6, 8]
+    assert all(block["cache_control"] == {"type": "ephemeral"} for block in blocks if "cache_control" in block)
+
+
+def test_breakpoint_on_the_last_full_text():
+    """notes and summaries at the end change as videos come and go, the full texts before them are still cached"""
+    videos = [video(i) for i in range(4)]
+    chosen = [Claude.FULL, Claude.FULL, Claude.FULL, Claude.SUMMARY]
+    blocks = Claude.create_system_prompt(PROMPT, videos, budget(videos, chosen))
+    assert forms(blocks, videos) == chosen
+    assert 3 in breakpoints(blocks)
+    assert breakpoints(blocks)[-1] == 4
+    assert len(breakpoints(blocks)) <= Claude.CACHE_MAX
+
+
+def test_no_breakpoint_on_short_prefixes():
+    videos = [video(0, tokens=100), video(1, tokens=Claude.CACHE_MIN_TOKENS)]
+    blocks = Claude.create_system_prompt(PROMPT, videos)
+    assert breakpoints(blocks) == [2]
+    assert breakpoints(Claude.create_system_prompt(PROMPT, [video(0, tokens=100)])) == []
@@ -0,0 +1,100 @@
+"""
+results of read-only tools cached per workspace (components/tool_result_cache.py) and what invalidates them.
+no database needed
+    LOG_LEVEL=INFO python -m pytest tests/test_tool_result_cache.py
+"""
+import time
+import uuid
+
+import pytest
+
+from components.tool_result_cache import ToolResultCache
+from components.tools import TOOL_GET_TRANSCRIPT, TOOL_LIST_VIDEOS, TOOL_SUMMARIZE_VIDEO, TOOL_WATCH_VIDEO
+from domain.repositories.video_repository import VideoRepository
+
+TRANSCRIPT = {'video_id': 1}
+
+
+@pytest.fixture
+def cache():
+    """the shared cache of a new workspace, a list and a transcript cached"""
+    workspace_id = str(uuid.uuid4())
+    cache = ToolResultCache.for_workspace(workspace_id)
+    cache.record(TOOL_LIST_VIDEOS, {}, "videos")
+    cache.record(TOOL_GET_TRANSCRIPT, TRANSCRIPT, "transcript")
+    yield cache
+    ToolResultCache.evict_workspace(workspace_id)
+
+
+def cached(cache: ToolResultCache) -> list[bool]:
+    return [cache.get(TOOL_LIST_VIDEOS, {}) is not None, cache.get(TOOL_GET_TRANSCRIPT, TRANSCRIPT) is not None]
+
+
+def test_hit_and_miss(cache):
+    assert cache.get(TOOL_GET_TRANSCRIPT, TRANSCRIPT) == "transcript"
+    assert cache.get(TOOL_GET_TRANSCRIPT, {'video_id': 2}) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 2)
+    assert stats['bytes_saved'] == len("transcript")
+
+
+def test_key_does_not_depend_on_argument_order():
+    assert ToolResultCache.key(TOOL_GET_TRANSCRIPT, {'a': 1, 'b': 2}) == ToolResultCache.key(TOOL_GET_TRANSCRIPT, {'b': 2, 'a': 1})
+
+
+def test_write_tools_are_not_cached(cache):
+    cache.record(TOOL_WATCH_VIDEO, {'url': 'u'}, "watched")
+    assert cache.get(TOOL_WATCH_VIDEO, {'url': 'u'}) is None
+
+
+@pytest.mark.parametrize('tool', [TOOL_WATCH_VIDEO, TOOL_SUMMARIZE_VIDEO])
+def test_write_tool_invalidates_the_list_only(cache, tool):
+    cache.record(tool, {}, "done")
+    assert cached(cache) == [False, True]
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_invalidate_everything(cache):
+    cache.invalidate()
+    assert cached(cache) == [False, False]
+    assert cache.stats()['invalidations'] == 2
+
+
+def test_change_in_this_process_invalidates_the_list(cache):
+    VideoRepository._changed(cache.workspace_id)
+    assert cached(cache) == [False, True]
+
+
+def test_validate_remembers_the_first_states(cache):
+    cache.validate({1: None})
+    cache.validate({1: None})
+    assert cached(cache) == [True, True]
+
+
+@pytest.mark.parametrize('states', [{1: None, 2: None}, {1: 'e4d909c290d0fb1ca068ffaddf22cbd0'}], ids=['video_added', 'summary_saved'])
+def test_validate_drops_the_list_when_videos_change(cache, states):
+    cache.validate({1: None})
+    cache.validate(states)
+    assert cached(cache) == [False, True]
+
+
+def test_validate_drops_everything_when_a_video_is_removed(cache):
+    cache.validate({1: None, 2: None})
+    cache.validate({2: None})
+    assert cached(cache) == [False, False]
+
+
+def test_results_expire():
+    cache = ToolResultCache(str(uuid.uuid4()), ttl=0.01)
+    cache.record(TOOL_LIST_VIDEOS, {}, "videos")
+    time.sleep(0.02)
+    assert cache.get(TOOL_LIST_VIDEOS, {}) is None
+
+
+def test_totals(cache):
+    before = ToolResultCache.totals()
+    cache.get(TOOL_LIST_VIDEOS, {})
+    cache.get(TOOL_GET_TRANSCRIPT, {'video_id': 2})
+    cache.invalidate()
+    after = ToolResultCache.totals()
+    assert [after[name] - before[name] for name in ('hits', 'misses', 'invalidations', 'entries')] == [1, 1, 2, -2]